@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+
+class ChangeListDeferMixin:
+    """
+    Defers `changelist_deferred_fields` on the admin change list only, so listing thousands of rows
+    doesn't read their large text columns (or those of the select_related parents). The change form
+    still loads every field.
+    """
+    changelist_deferred_fields = ()
+    show_full_result_count = False  # Saves the second COUNT(*) on every filtered change list
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        url_name = getattr(request.resolver_match, 'url_name', '') or ''
+        if url_name.endswith('_changelist') and self.changelist_deferred_fields:
+            queryset = queryset.defer(*self.changelist_deferred_fields)
+        return queryset
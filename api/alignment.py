@@ -0,0 +1,58 @@
+from bisect import bisect_right
+
+
+def speaker_turns(diarization_result):
+    """Returns the speaker turns of a pyannote annotation as `(start, end, speaker)` tuples sorted by start."""
+    return sorted(
+        (turn.start, turn.end, speaker)
+        for turn, _, speaker in diarization_result.itertracks(yield_label=True)
+    )
+
+
+def align_words_with_turns(turns, words):
+    """Attributes Whisper's timed words to diarization turns and groups consecutive words by speaker.
+
+    `turns` are `(start, end, speaker)` tuples sorted by start and `words` are `{'word', 'start', 'end'}`
+    dicts. Each word goes to the turn containing its midpoint, found by binary search, so aligning
+    n words against m turns costs O(n log m). When turns overlap, the most recently started one
+    wins (the interruption); words falling in a gap between turns go to the closest turn.
+    """
+    if not turns:
+        return []
+
+    starts = [start for start, _, _ in turns]
+
+    # For every turn, the turn with the latest end among it and all turns starting before it.
+    # This finds the covering turn when a short turn is nested inside a long one.
+    covering = []
+    best = 0
+    for index, (_, end, _) in enumerate(turns):
+        if end > turns[best][1]:
+            best = index
+        covering.append(best)
+
+    speaker_texts = []
+    for word in words:
+        midpoint = (word['start'] + word['end']) / 2
+        index = bisect_right(starts, midpoint) - 1
+
+        if index < 0:
+            turn = 0  # Before the first turn
+        elif turns[index][1] >= midpoint:
+            turn = index
+        elif turns[covering[index]][1] >= midpoint:
+            turn = covering[index]
+        else:
+            # In a gap: pick whichever of the previous and next turns is closer
+            turn = covering[index]
+            if index + 1 < len(turns) and turns[index + 1][0] - midpoint < midpoint - turns[turn][1]:
+                turn = index + 1
+
+        speaker = turns[turn][2]
+        text = word['word'].strip()
+        if speaker_texts and speaker_texts[-1]['speaker'] == speaker:
+            speaker_texts[-1]['words'].append(text)
+        else:
+            speaker_texts.append({'speaker': speaker, 'words': [text]})
+
+    return [{'speaker': block['speaker'], 'text': " ".join(block['words'])} for block in speaker_texts]
@@ -0,0 +1,335 @@
+"""
+The external services the pipeline calls: speech recognition (ASR), speaker diarization and the LLM
+that fills case briefs. Which implementation is used is configured in PIPELINE_BACKENDS, e.g.
+
+    PIPELINE_BACKENDS = {
+        'asr': {'BACKEND': 'api.backends.FakeASRBackend', 'OPTIONS': {'profile': 'whisper', 'seed': 1}},
+        ...
+    }
+
+An ASR backend has `transcribe(path)` returning {'text', 'words': [{'word', 'start', 'end'}]}, a
+diarization backend `diarize(path)` returning sorted (start, end, speaker) turns, and an LLM backend
+`complete_json(system_prompt, text)` returning a dict. They raise BackendError when a call fails,
+and RateLimited when the provider asks us to slow down; `call_backend` turns both into RetryLater.
+
+The Fake* backends never leave the machine: they answer deterministically (from the audio content,
+the seed and the attempt) after a simulated latency, and fail or rate-limit at configurable rates,
+so throughput and retries can be measured offline.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import wave
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from . import metrics
+from .cache import file_digest
+from .ratelimit import RetryLater, backoff_delay, check_circuit, record_failure, record_success, take_token
+
+
+class BackendError(Exception):
+    """A call to an external backend failed."""
+
+
+class RateLimited(BackendError):
+    """The backend refused the call because of its rate limits; `retry_after` is in seconds, if it said."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(error):
+    """Reads the Retry-After header (in seconds) of an openai error, if there is one."""
+    try:
+        return float((getattr(error, 'headers', None) or {}).get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _openai_call(call, **kwargs):
+    """Calls the openai client, translating its errors into ours."""
+    import openai
+
+    try:
+        return call(api_key=settings.OPENAI_API_KEY, **kwargs)
+    except openai.error.RateLimitError as e:
+        raise RateLimited(str(e), _retry_after(e)) from e
+    except openai.error.OpenAIError as e:
+        raise BackendError(str(e)) from e
+
+
+class WhisperBackend:
+    """OpenAI's hosted Whisper."""
+
+    def __init__(self, model="whisper-1", language="en"):
+        self.model = model
+        self.language = language
+        # What the result depends on besides the audio; part of its cache key
+        self.cache_params = {'model': model, 'language': language, 'format': 'verbose_json/word'}
+
+    def transcribe(self, audio_file_path):
+        import openai
+
+        with open(audio_file_path, 'rb') as audio_file:
+            transcription = _openai_call(
+                openai.Audio.transcribe,
+                model=self.model,
+                file=audio_file,
+                language=self.language,
+                response_format="verbose_json",
+                **{"timestamp_granularities[]": "word"},
+            )
+        if 'error' in transcription:
+            raise BackendError(f"Transcription Error: {transcription['error']}")
+        words = [
+            {'word': word['word'], 'start': word['start'], 'end': word['end']}
+            for word in transcription.get('words', [])
+        ]
+        return {'text': transcription['text'], 'words': words}
+
+
+class PyannoteBackend:
+    """A pyannote.audio pipeline, loaded once per process by `api.model_registry`."""
+
+    def __init__(self):
+        self.cache_params = {'model': settings.DIARIZATION_MODEL}
+
+    def diarize(self, audio_file_path):
+        from .alignment import speaker_turns
+        from .model_registry import get_diarization_pipeline
+
+        return speaker_turns(get_diarization_pipeline()(audio_file_path))
+
+
+class OpenAIChatBackend:
+    """OpenAI chat completions in JSON mode."""
+
+    def __init__(self, model=None):
+        self.model = model or settings.LLM_MODEL
+        self.cache_params = {'model': self.model}
+
+    @property
+    def available(self):
+        """Whether the backend can be called at all (the LLM step is skipped when it can't)."""
+        return bool(settings.OPENAI_API_KEY)
+
+    def complete_json(self, system_prompt, text):
+        import openai
+
+        response = _openai_call(
+            openai.ChatCompletion.create,
+            model=self.model,
+            messages=[{'role': 'system', 'content': system_prompt}, {'role': 'user', 'content': text}],
+            response_format={'type': 'json_object'},
+            temperature=0,
+        )
+        try:
+            result = json.loads(response['choices'][0]['message']['content'])
+        except (KeyError, IndexError, ValueError) as e:
+            raise BackendError(f"Unreadable answer from {self.model}: {e}") from e
+        if not isinstance(result, dict):
+            raise BackendError(f"Expected a JSON object from {self.model}, got {type(result).__name__}")
+        return result
+
+
+# Latency and failure profiles of the fake backends, measured roughly against the real services.
+# latency: median seconds per call, plus latency_per_audio_second for each second of audio;
+# latency_sigma: spread of the lognormal latency distribution; error_rate / rate_limit_rate: share
+# of calls that fail or are rate-limited (told to retry after `retry_after` seconds).
+FAKE_PROFILES = {
+    'instant': {'latency': 0, 'latency_per_audio_second': 0, 'latency_sigma': 0, 'error_rate': 0, 'rate_limit_rate': 0},
+    'whisper': {'latency': 0.8, 'latency_per_audio_second': 0.02, 'latency_sigma': 0.4, 'error_rate': 0.01, 'rate_limit_rate': 0.03},
+    'pyannote-cpu': {'latency': 0.2, 'latency_per_audio_second': 0.05, 'latency_sigma': 0.15, 'error_rate': 0.002, 'rate_limit_rate': 0},
+    'openai-chat': {'latency': 2.0, 'latency_per_audio_second': 0, 'latency_sigma': 0.5, 'error_rate': 0.01, 'rate_limit_rate': 0.05},
+}
+
+FAKE_VOCABULARY = (
+    "the court accused counsel witness evidence honour sentence plea guilty charge robbery section "
+    "prosecution defence record exhibit statement police officer night village victim remorse "
+    "mitigation submit objection sustained adjourn judgment law act penal code years"
+).split()
+
+
+class FakeBackend:
+    """Simulated latency, errors and rate limits shared by the fake backends.
+
+    Every decision is drawn from a random generator seeded with the seed, the input's key and how
+    many times that input has been seen, so a run is reproducible and a retried call can succeed.
+    `time_scale` multiplies every simulated wait (0 answers immediately but still fails as configured).
+    """
+    default_profile = 'instant'
+
+    def __init__(self, profile=None, seed=0, time_scale=1.0, retry_after=1.0, audio_seconds=None, **overrides):
+        self.profile = {**FAKE_PROFILES[profile or self.default_profile], **overrides}
+        self.seed = seed
+        self.time_scale = time_scale
+        self.retry_after = retry_after
+        self.audio_seconds = audio_seconds
+        self.cache_params = {'backend': type(self).__name__, 'seed': seed}
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _random(self, key):
+        with self._lock:
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        return random.Random(f"{self.seed}:{key}:{attempt}")
+
+    def _duration(self, path):
+        """Length of the audio: read from the header of WAV files, else `audio_seconds` or CHUNK_SECONDS."""
+        if self.audio_seconds is None and path.endswith('.wav'):
+            try:
+                with wave.open(path) as audio:
+                    return audio.getnframes() / audio.getframerate()
+            except (wave.Error, EOFError):
+                pass
+        return self.audio_seconds or settings.CHUNK_SECONDS
+
+    def _call(self, rng, audio_seconds=0):
+        """Waits the simulated latency, then fails or is rate-limited as often as the profile says."""
+        profile = self.profile
+        median = profile['latency'] + profile['latency_per_audio_second'] * audio_seconds
+        if median > 0:
+            latency = median * math.exp(rng.gauss(0, profile['latency_sigma'])) if profile['latency_sigma'] else median
+            time.sleep(latency * self.time_scale)
+        draw = rng.random()
+        if draw < profile['rate_limit_rate']:
+            raise RateLimited(f"{type(self).__name__}: rate limit reached", self.retry_after)
+        if draw < profile['rate_limit_rate'] + profile['error_rate']:
+            raise BackendError(f"{type(self).__name__}: simulated failure")
+
+
+class FakeASRBackend(FakeBackend):
+    """Stand-in for Whisper: a few words per second of audio, with word timings."""
+    default_profile = 'whisper'
+
+    def __init__(self, words_per_second=2.5, **options):
+        super().__init__(**options)
+        self.words_per_second = words_per_second
+        self.cache_params['words_per_second'] = words_per_second
+
+    def transcribe(self, audio_file_path):
+        key = file_digest(audio_file_path)
+        duration = self._duration(audio_file_path)
+        rng = self._random(key)
+        self._call(rng, duration)
+
+        text_rng = random.Random(f"{self.seed}:{key}")  # The same audio always reads the same
+        count = max(1, int(duration * self.words_per_second))
+        step = duration / count
+        words = [
+            {'word': text_rng.choice(FAKE_VOCABULARY), 'start': round(i * step, 2), 'end': round((i + 1) * step, 2)}
+            for i in range(count)
+        ]
+        return {'text': " ".join(word['word'] for word in words), 'words': words}
+
+
+class FakeDiarizationBackend(FakeBackend):
+    """Stand-in for pyannote: alternating turns of a few seconds between `speakers` speakers."""
+    default_profile = 'pyannote-cpu'
+
+    def __init__(self, speakers=2, mean_turn_seconds=6.0, **options):
+        super().__init__(**options)
+        self.speakers = max(1, speakers)
+        self.mean_turn_seconds = mean_turn_seconds
+        self.cache_params.update(speakers=self.speakers, mean_turn_seconds=mean_turn_seconds)
+
+    def diarize(self, audio_file_path):
+        key = file_digest(audio_file_path)
+        duration = self._duration(audio_file_path)
+        self._call(self._random(key), duration)
+
+        turn_rng = random.Random(f"{self.seed}:{key}")
+        turns, start, speaker = [], 0.0, 0
+        while start < duration:
+            end = min(duration, start + turn_rng.expovariate(1 / self.mean_turn_seconds) + 0.5)
+            turns.append((round(start, 2), round(end, 2), f"SPEAKER_{speaker:02d}"))
+            if self.speakers > 1:
+                speaker = (speaker + turn_rng.randrange(1, self.speakers)) % self.speakers
+            start = end
+        return turns
+
+
+class FakeLLMBackend(FakeBackend):
+    """Stand-in for the chat model: fills every field the prompt lists with words from the text."""
+    default_profile = 'openai-chat'
+    available = True
+
+    def complete_json(self, system_prompt, text):
+        key = hashlib.sha256(f"{system_prompt}\n{text}".encode()).hexdigest()
+        self._call(self._random(key))
+
+        words = text.split()
+        answer_rng = random.Random(f"{self.seed}:{key}")
+        fields = [line[2:].split(':', 1)[0] for line in system_prompt.splitlines() if line.startswith('- ')]
+        fields += re.findall(r'\{"(\w+)"', system_prompt)  # The single field a merge prompt asks for
+        return {
+            field: " ".join(answer_rng.choice(words) for _ in range(min(len(words), 8))) if words else ""
+            for field in fields
+        }
+
+
+def call_backend(kind, method, *args):
+    """Calls a method of the `kind` backend within its shared rate limit and circuit breaker (see
+    api/ratelimit.py), timing the call and counting its outcome.
+
+    Raises RetryLater when the call can't be made now or the provider failed (BackendError): the job
+    making it is requeued with a jittered backoff, or after the Retry-After the provider asked for.
+    Any other exception is a bug on our side; it propagates as it is and doesn't count against the
+    backend's circuit.
+    """
+    backend = get_backend(kind)
+    failing = check_circuit(kind)
+    taken, wait = take_token(kind, max_wait=settings.RATE_LIMIT_MAX_WAIT_SECONDS)
+    if not taken:
+        metrics.inc('themis_backend_calls_total', backend=kind, outcome='throttled')
+        raise RetryLater(f"Request budget of the {kind} backend used up", wait * random.uniform(1, 1.25), counts=False)
+    if wait:
+        time.sleep(wait)  # A token reserved in the near future: cheaper to wait than to requeue
+
+    try:
+        with metrics.timed(kind):
+            result = getattr(backend, method)(*args)
+    except RateLimited as e:
+        metrics.inc('themis_backend_calls_total', backend=kind, outcome='rate_limited')
+        record_failure(kind, e)
+        raise RetryLater(str(e), backoff_delay(0, e.retry_after), counts=False) from e
+    except BackendError as e:
+        metrics.inc('themis_backend_calls_total', backend=kind, outcome='error')
+        record_failure(kind, e)
+        raise RetryLater(str(e)) from e
+    metrics.inc('themis_backend_calls_total', backend=kind, outcome='ok')
+    if failing:
+        record_success(kind)
+    return result
+
+
+# Backends built by this process, by kind
+_backends = {}
+_lock = threading.Lock()
+
+
+def get_backend(kind):
+    """Returns this process's backend for `kind` ('asr', 'diarization' or 'llm'), built on first use."""
+    backend = _backends.get(kind)
+    if backend is None:
+        with _lock:
+            backend = _backends.get(kind)
+            if backend is None:
+                config = settings.PIPELINE_BACKENDS[kind]
+                backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+                _backends[kind] = backend
+    return backend
+
+
+@receiver(setting_changed)
+def reset_backends(setting, **kwargs):
+    """Builds the backends afresh after PIPELINE_BACKENDS changes (e.g. override_settings in tests)."""
+    if setting in ('PIPELINE_BACKENDS', 'LLM_MODEL', 'DIARIZATION_MODEL'):
+        _backends.clear()
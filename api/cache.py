@@ -0,0 +1,38 @@
+import hashlib
+import json
+from django.core.cache import caches
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_key(kind, digest, params):
+    """Builds the cache key of a `kind` result for audio with the given digest and call parameters."""
+    params_digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{kind}:{digest}:{params_digest}"
+
+
+def cached_result(kind, audio_file_path, params, compute):
+    """Returns the result of `compute()` for this audio content and parameters, from the cache if possible.
+
+    Results are keyed by a hash of the audio bytes rather than the file name, so a retried chunk or a
+    recording uploaded twice is served from the cache. Failed (None) results are not cached.
+    """
+    cache = caches['pipeline']
+    key = result_key(kind, file_digest(audio_file_path), params)
+
+    result = cache.get(key)
+    if result is not None:
+        print(f"Using cached {kind} result for file: {audio_file_path}")
+        return result
+
+    result = compute()
+    if result is not None:
+        cache.set(key, result)
+    return result
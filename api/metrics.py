@@ -0,0 +1,274 @@
+"""
+Pipeline metrics in the Prometheus text format.
+
+Every web and worker process records into its own in-memory registry and writes it every
+METRICS_FLUSH_SECONDS (and on exit) to METRICS_DIR/<host>-<pid>-<token>.json, where the random token
+keeps a later process that reuses the PID from overwriting the file. The /metrics endpoint adds up
+the files of all processes and the current process's live values. Counters and histograms are
+cumulative, so what processes that have exited counted is kept: a scrape folds their files into
+METRICS_DIR/compacted.json. Gauges (queue depths, open circuits) are read from the database when the
+endpoint is scraped.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+
+# Upper bounds (seconds) of the stage duration buckets: from fast DB-bound steps to long API calls
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name: (type, help)
+METRICS = {
+    'themis_stage_duration_seconds': ('histogram', "Time spent in each pipeline stage."),
+    'themis_backend_calls_total': (
+        'counter', "Calls to the external backends, by outcome (ok, error, rate_limited, throttled).",
+    ),
+    'themis_backend_retries_total': ('counter', "Jobs requeued to retry a call to an external backend."),
+    'themis_jobs_total': ('counter', "Pipeline jobs run, by kind and outcome (done, retried, deferred, failed)."),
+    'themis_queue_jobs': ('gauge', "Pipeline jobs in the queue, by kind and status."),
+    'themis_chunks': ('gauge', "Audio chunks still to transcribe, by status."),
+    'themis_circuit_open': ('gauge', "1 while calls to an external backend are paused by its circuit breaker."),
+}
+
+COMPACTED_FILE = 'compacted.json'
+# <host>-<pid>-<token>.json, or <host>-<pid>.json as written before files had a token
+PROCESS_FILE_RE = re.compile(r'^(?P<host>.+?)-(?P<pid>\d+)(?:-[0-9a-f]{32})?\.json$')
+
+_lock = threading.Lock()
+# (name, labels) -> value for counters, or -> [bucket counts..., sum, count] for histograms
+_values = {}
+_flusher = None
+_process_name = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Adds `amount` to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+    _start_flusher()
+
+
+def observe(name, value, buckets=STAGE_BUCKETS, **labels):
+    """Records one observation of a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _values.setdefault(key, [0] * (len(buckets) + 2))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[i] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+    _start_flusher()
+
+
+@contextmanager
+def timed(stage):
+    """Times the block into the stage duration histogram, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('themis_stage_duration_seconds', time.perf_counter() - started, stage=stage)
+
+
+def _process_file():
+    """This process's metrics file, named anew in a forked child."""
+    global _process_name
+    if _process_name is None or _process_name[0] != os.getpid():
+        _process_name = (os.getpid(), f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex}.json")
+    return os.path.join(settings.METRICS_DIR, _process_name[1])
+
+
+def _snapshot():
+    with _lock:
+        return [[name, list(labels), value] for (name, labels), value in _values.items()]
+
+
+def flush():
+    """Writes this process's metrics to its file in METRICS_DIR."""
+    if not _values:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _process_file()
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(_snapshot(), f)
+    os.replace(f"{path}.tmp", path)  # A scrape never reads a half-written file
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+
+
+def _start_flusher():
+    """Starts this process's flush thread on its first metric (a forked worker starts its own)."""
+    global _flusher
+    if _flusher is not None and _flusher[0] == os.getpid():
+        return
+    with _lock:
+        if _flusher is not None and _flusher[0] == os.getpid():
+            return
+        if _flusher is not None:  # Forked: the parent's values are the parent's to report
+            _values.clear()
+        thread = threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True)
+        _flusher = (os.getpid(), thread)
+    thread.start()
+    atexit.register(flush)
+
+
+def _collect_gauges():
+    """Reads the queue depths from the database."""
+    from django.db.models import Count
+    from transcription_chunks.models import AudioChunk, PipelineJob
+    from .ratelimit import open_circuits
+
+    gauges = {}
+    jobs = PipelineJob.objects.filter(status__in=('queued', 'running')).values('kind', 'status').order_by()
+    for row in jobs.annotate(count=Count('id')):
+        gauges[_key('themis_queue_jobs', {'kind': row['kind'], 'status': row['status']})] = row['count']
+    chunks = AudioChunk.objects.filter(status__in=('pending', 'processing')).values('status').order_by()
+    for row in chunks.annotate(count=Count('id')):
+        gauges[_key('themis_chunks', {'status': row['status']})] = row['count']
+    for name in open_circuits():
+        gauges[_key('themis_circuit_open', {'backend': name})] = 1
+    return gauges
+
+
+def _merge(totals, name, labels, value):
+    key = (name, labels)
+    if isinstance(value, list):
+        current = totals.setdefault(key, [0] * len(value))
+        totals[key] = [a + b for a, b in zip(current, value)]
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_dead(path, hostname, now):
+    """Whether the process that wrote `path` has exited: its PID is gone from this host, or it stopped
+    rewriting the file for METRICS_STALE_SECONDS (the only sign for processes of other hosts)."""
+    match = PROCESS_FILE_RE.match(os.path.basename(path))
+    if match is None:
+        return False
+    try:
+        if now - os.path.getmtime(path) > settings.METRICS_STALE_SECONDS:
+            return True
+    except OSError:
+        return False
+    if match.group('host') != hostname:
+        return False
+    try:
+        os.kill(int(match.group('pid')), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:  # Running, but not ours to signal
+        pass
+    return False
+
+
+@contextmanager
+def _files_lock():
+    """Serializes scrapes across processes, so none reads a file while another folds it in."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def compact():
+    """Folds the files of processes that have exited into METRICS_DIR/compacted.json and deletes them,
+    so the directory doesn't grow with every restart. Returns how many files were folded in."""
+    with _files_lock():
+        return _compact()
+
+
+def _compact():
+    own_file, hostname, now = _process_file(), socket.gethostname(), time.time()
+    compacted = os.path.join(settings.METRICS_DIR, COMPACTED_FILE)
+    dead = [
+        path for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json'))
+        if path not in (own_file, compacted) and _is_dead(path, hostname, now)
+    ]
+    if not dead:
+        return 0
+    totals = {}
+    for path in [compacted, *dead]:
+        for name, labels, value in _read(path) or []:
+            _merge(totals, name, tuple(tuple(label) for label in labels), value)
+    with open(f"{compacted}.tmp", 'w') as f:
+        json.dump([[name, list(labels), value] for (name, labels), value in totals.items()], f)
+    os.replace(f"{compacted}.tmp", compacted)
+    for path in dead:
+        os.remove(path)
+    return len(dead)
+
+
+def collect():
+    """Adds up the metrics of every process, plus the gauges; returns {(name, labels): value}."""
+    totals = {}
+    own_file = _process_file()
+    with _files_lock():
+        try:
+            _compact()
+        except OSError as e:
+            print(f"Could not compact metrics: {e}")
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            if path == own_file:
+                continue  # This process's live values are added below
+            for name, labels, value in _read(path) or []:
+                _merge(totals, name, tuple(tuple(label) for label in labels), value)
+    for name, labels, value in _snapshot():
+        _merge(totals, name, tuple(labels), value)
+    totals.update(_collect_gauges())
+    return totals
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+    totals = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in totals.items() if metric == name)
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in series:
+            if kind == 'histogram':
+                for bound, count in zip(STAGE_BUCKETS, value):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,46 @@
+import threading
+import time
+from django.conf import settings
+
+
+# Models loaded by this process, by name. Each worker process holds its own copy.
+_models = {}
+_lock = threading.Lock()
+
+
+def _load_diarization_pipeline():
+    """Loads the pyannote speaker diarization pipeline."""
+    # Imported here so that processes which never diarize don't pay for importing torch
+    from pyannote.audio import Pipeline
+
+    return Pipeline.from_pretrained(settings.DIARIZATION_MODEL, use_auth_token=settings.HF_AUTH_TOKEN)
+
+
+MODEL_LOADERS = {
+    'diarization': _load_diarization_pipeline,
+}
+
+
+def get_model(name):
+    """Returns the named model, loading it on first use in this process."""
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                started = time.monotonic()
+                model = MODEL_LOADERS[name]()
+                _models[name] = model
+                print(f"Loaded {name} model in {time.monotonic() - started:.1f}s")
+    return model
+
+
+def get_diarization_pipeline():
+    """Returns this process's pyannote diarization pipeline."""
+    return get_model('diarization')
+
+
+def warm_up(names=('diarization',)):
+    """Loads the given models now, so the first job doesn't pay for it."""
+    for name in names:
+        get_model(name)
@@ -1,3 +1,29 @@
 from django.db import models
 
-# Create your models here.
+
+class TokenBucket(models.Model):
+    """The request budget of an external backend, shared by every worker process (see api/ratelimit.py)."""
+    name = models.CharField(max_length=50, primary_key=True)  # The backend kind: asr, diarization, llm
+    tokens = models.FloatField(default=0)
+    updated_at = models.DateTimeField()  # When `tokens` was last refilled
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f} tokens"
+
+
+class CircuitBreaker(models.Model):
+    """Whether calls to an external backend are paused because it keeps failing (see api/ratelimit.py)."""
+    STATE_CHOICES = [
+        ('closed', 'Closed'),  # Calls go through
+        ('open', 'Open'),  # Calls, and the jobs that make them, wait until `opened_until`
+        ('half_open', 'Half open'),  # One probe call is in flight; its outcome closes or reopens the circuit
+    ]
+
+    name = models.CharField(max_length=50, primary_key=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='closed')
+    failures = models.PositiveIntegerField(default=0)  # Consecutive failed calls
+    opened_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.name}: {self.state}"
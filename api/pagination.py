@@ -0,0 +1,25 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class TranscriptionCursorPagination(CursorPagination):
+    """Newest transcriptions first. Cursors seek on the primary key, so every page costs the same."""
+    ordering = '-id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class AudioChunkCursorPagination(CursorPagination):
+    """Chunks in the order they were cut, which within a transcription is chunk_index order."""
+    ordering = 'id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class SearchPagination(PageNumberPagination):
+    """Search results are ordered by relevance, which has no stable cursor, so they are paged by number."""
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import CircuitBreaker, TokenBucket
+
+
+class RateLimiter:
+    """Limits calls to `requests_per_minute` and to `max_concurrent` in flight at once.
+
+    Shared by every thread of a process, use it as a context manager around each external call.
+    A limit of 0 disables the corresponding check.
+    """
+
+    def __init__(self, requests_per_minute=0, max_concurrent=0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._semaphore = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait_for_slot(self):
+        """Blocks until the next request may start, spacing requests evenly over the minute."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def __enter__(self):
+        self.wait_for_slot()
+        if self._semaphore:
+            self._semaphore.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._semaphore:
+            self._semaphore.release()
+        return False
+
+
+class RetryLater(Exception):
+    """An external call can't be made now; the job making it is requeued to run again in `delay` seconds
+    (None: the queue's own backoff) instead of a worker thread sleeping through the wait.
+
+    `counts` is False when the backend itself is fine and only asked us to wait (rate limits, an open
+    circuit): such a retry doesn't use up one of the job's PIPELINE_JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, message, delay=None, counts=True):
+        super().__init__(message)
+        self.delay = delay
+        self.counts = counts
+
+
+class CircuitOpen(RetryLater):
+    """The backend failed too often lately; calls to it are paused until its circuit closes again."""
+
+    def __init__(self, message, delay):
+        super().__init__(message, delay, counts=False)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retrying after `attempt` failed attempts.
+
+    "Full jitter" exponential backoff: a random wait up to RETRY_BASE_SECONDS * 2**attempt (capped at
+    RETRY_MAX_SECONDS), so workers that failed together don't all retry together. A provider's
+    Retry-After is a minimum, jittered upwards for the same reason.
+    """
+    delay = random.uniform(0, min(settings.RETRY_MAX_SECONDS, settings.RETRY_BASE_SECONDS * 2 ** max(0, attempt)))
+    if retry_after:
+        delay = max(delay, retry_after * random.uniform(1, 1.25))
+    return delay
+
+
+def take_token(name, max_wait=0):
+    """Takes one request from the `name` backend's token bucket, shared through the database by every
+    worker process: BACKEND_RATE_LIMITS[name] requests per minute, up to `burst` at once.
+
+    Returns `(taken, wait)`. A token that frees up within `max_wait` seconds is reserved, and the caller
+    waits `wait` seconds before calling; otherwise nothing is taken and `wait` says when to try again.
+    """
+    limits = settings.BACKEND_RATE_LIMITS.get(name) or {}
+    per_second = limits.get('per_minute', 0) / 60
+    if not per_second:
+        return True, 0.0
+    capacity = max(1, limits.get('burst', 1))
+
+    with transaction.atomic():  # Row lock (an IMMEDIATE transaction on SQLite): one taker at a time
+        now = timezone.now()
+        bucket = TokenBucket.objects.select_for_update().filter(name=name).first()
+        if bucket is None:
+            bucket, _ = TokenBucket.objects.get_or_create(name=name, defaults={'tokens': capacity, 'updated_at': now})
+        tokens = min(capacity, bucket.tokens + max(0.0, (now - bucket.updated_at).total_seconds()) * per_second)
+        taken = tokens - 1 >= -max_wait * per_second
+        if taken:
+            tokens -= 1
+            wait = max(0.0, -tokens / per_second)
+        else:
+            wait = (1 - tokens) / per_second
+        TokenBucket.objects.filter(name=name).update(tokens=tokens, updated_at=now)
+    return taken, wait
+
+
+def check_circuit(name):
+    """Raises CircuitOpen if calls to the `name` backend are paused; otherwise returns whether the
+    backend failed since its last success (so that only then does a success need recording).
+
+    Once the cooldown of an open circuit is over, the first caller becomes its probe (the circuit is
+    half open) and the others keep waiting until the probe succeeds or fails.
+    """
+    breaker = CircuitBreaker.objects.filter(name=name).values('state', 'failures', 'opened_until').first()
+    if breaker is None or breaker['state'] == 'closed':
+        return bool(breaker and breaker['failures'])
+    now = timezone.now()
+    if breaker['opened_until'] and breaker['opened_until'] > now:
+        wait = (breaker['opened_until'] - now).total_seconds()
+        raise CircuitOpen(f"Calls to the {name} backend are paused", wait * random.uniform(1, 1.25))
+    # Conditional update so that only one caller wins the probe
+    if CircuitBreaker.objects.filter(name=name, state=breaker['state'], opened_until=breaker['opened_until']).update(
+        state='half_open', opened_until=now + timedelta(seconds=settings.CIRCUIT_COOLDOWN_SECONDS),
+    ):
+        print(f"Probing the {name} backend")
+        return True
+    raise CircuitOpen(f"The {name} backend is being probed", backoff_delay(0))
+
+
+def record_success(name):
+    """Closes the `name` backend's circuit, and forgets its failures, after a successful call."""
+    if CircuitBreaker.objects.filter(name=name).exclude(state='closed', failures=0).update(
+        state='closed', failures=0, opened_until=None,
+    ):
+        print(f"Circuit of the {name} backend closed")
+
+
+def record_failure(name, error):
+    """Counts a failed call; CIRCUIT_FAILURE_THRESHOLD failures in a row (or a failed probe) open the
+    circuit for CIRCUIT_COOLDOWN_SECONDS."""
+    with transaction.atomic():
+        breaker = CircuitBreaker.objects.select_for_update().filter(name=name).first()
+        if breaker is None:
+            breaker, _ = CircuitBreaker.objects.get_or_create(name=name)
+        failures = breaker.failures + 1
+        fields = {'failures': failures, 'last_error': str(error)[:1000]}
+        if breaker.state == 'half_open' or failures >= settings.CIRCUIT_FAILURE_THRESHOLD:
+            cooldown = settings.CIRCUIT_COOLDOWN_SECONDS
+            fields.update(state='open', opened_until=timezone.now() + timedelta(seconds=cooldown))
+            print(f"Circuit of the {name} backend opened for {cooldown}s after {failures} failures: {error}")
+        CircuitBreaker.objects.filter(name=name).update(**fields)
+    return fields.get('state') == 'open'
+
+
+def open_circuits():
+    """Names of the backends whose calls are paused right now."""
+    return set(
+        CircuitBreaker.objects.exclude(state='closed').filter(opened_until__gt=timezone.now())
+        .values_list('name', flat=True)
+    )
@@ -3,7 +3,7 @@ from cases.models import Case
 from cases import serializers
 from cases.models import Case
 from rest_framework import serializers
-from transcription.models import Transcription
+from transcription.models import Transcription, TranscriptionUpload
 from diarization.models import DiarizedSegment
 from transcription_chunks.models import AudioChunk
       
@@ -13,14 +13,38 @@ class CaseSerializer(serializers.ModelSerializer):
         model = Case
         fields = ['id', 'title', 'is_transcribed']
 
-class AudioChunkSerializer(serializers.ModelSerializer):
+
+def requested_fields(request):
+    """Returns the set of field names asked for with `?fields=a,b`, or None if all fields are wanted."""
+    if request is None or not request.query_params.get('fields'):
+        return None
+    return {name.strip() for name in request.query_params['fields'].split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Serializes only the fields listed in the request's `?fields=` parameter (`id` is always kept).
+
+    Fields the view names in the `omitted_fields` context (large columns it didn't load) are left out too.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(self.fields) - requested - {'id'}:
+                self.fields.pop(name)
+        for name in self.context.get('omitted_fields', ()):
+            self.fields.pop(name, None)
+
+
+class AudioChunkSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = AudioChunk
-        fields = ['id', 'transcription', 'chunk_file', 'chunk_index', 'transcription_text', 'diarization_data', 'status', 'created_at']
-        read_only_fields = ['id', 'transcription_text', 'diarization_data', 'status', 'created_at']
+        fields = ['id', 'transcription', 'chunk_file', 'chunk_index', 'start_time', 'end_time', 'transcription_text', 'diarization_data', 'status', 'created_at']
+        read_only_fields = ['id', 'start_time', 'end_time', 'transcription_text', 'diarization_data', 'status', 'created_at']
 
 
-class TranscriptionSerializer(serializers.ModelSerializer):
+class TranscriptionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Transcription
         fields = ['id', 'audio_file', 'transcription_text', 'case_name', 'case_number', 'status', 'date_created', 'date_updated']
@@ -29,6 +53,24 @@ class TranscriptionSerializer(serializers.ModelSerializer):
         return Transcription.objects.create(**validated_data)
 
 
+class TranscriptionUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TranscriptionUpload
+        fields = ['id', 'filename', 'total_size', 'sha256', 'case_name', 'case_number', 'received_bytes', 'status', 'transcription', 'date_created']
+        read_only_fields = ['id', 'received_bytes', 'status', 'transcription', 'date_created']
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("The upload must not be empty.")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError("Expected a hex-encoded SHA-256 digest.")
+        return value
+
+
 class DiarizedSegmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = DiarizedSegment
@@ -1,3 +1,510 @@
-from django.test import TestCase
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from api import metrics, model_registry
+from api.backends import BackendError, FakeASRBackend, RateLimited, call_backend
+from api.cache import cached_result
+from api.models import CircuitBreaker
+from api.alignment import align_words_with_turns
+from api.ratelimit import CircuitOpen, RateLimiter, RetryLater, take_token
+from api.utils import diarize_audio_with_retry, format_diarization, transcribe_audio_with_retry
+from case_brief.models import CaseBrief
+from diarization.models import DiarizedSegment
+from transcription.models import Transcription
+from transcription.progress import bump_progress
+from transcription_chunks.models import AudioChunk, PipelineJob
+from transcription_chunks.queue import claim_next_job, run_job
 
-# Create your tests here.
+# Most queries each page may run, whatever the number of rows. Admin pages also pay for loading the
+# session and the logged-in user (2 queries) before the change list's COUNT(*) and SELECT.
+QUERY_BUDGETS = {
+    'transcription-list': 1,
+    'transcription-detail': 1,
+    'transcription-progress': 2,
+    'audio-chunk-list-create': 1,
+    'audio-chunk-detail': 1,
+    'dashboard-stats': 1,
+    'metrics': 3,  # The job and chunk queue depths, and the open circuits
+    'admin:transcription_transcription_changelist': 4,
+    'admin:transcription_chunks_audiochunk_changelist': 5,  # + the status filter's SELECT DISTINCT
+    'admin:transcription_chunks_pipelinejob_changelist': 4,
+    'admin:case_brief_casebrief_changelist': 4,
+    'admin:diarization_diarizedsegment_changelist': 4,
+}
+
+
+class QueryBudgetMixin:
+    """Assertions that a block of code stays within the query budget of an endpoint in QUERY_BUDGETS."""
+
+    @contextmanager
+    def assertQueryBudget(self, name):
+        budget = QUERY_BUDGETS[name]
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        if len(context) > budget:
+            queries = "\n".join(query['sql'] for query in context.captured_queries)
+            self.fail(f"{name} ran {len(context)} queries, over its budget of {budget}:\n{queries}")
+
+    def get_within_budget(self, name, *args, **params):
+        """GETs a named URL, asserting a 200 response within the endpoint's query budget."""
+        url = reverse(name, args=args)
+        with self.assertQueryBudget(name):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """The list and detail pages must not run a query per row (N+1)."""
+    ROWS = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        for i in range(cls.ROWS):
+            transcription = Transcription.objects.create(
+                audio_file=f'audio_files/{i}.mp3', case_name=f'Case {i}', case_number=f'C{i}',
+                status='in_progress', transcription_text='word ' * 1000,
+            )
+            chunk = AudioChunk.objects.create(
+                transcription=transcription, chunk_index=0, chunk_file=f'audio_chunks/{i}_chunk_0.flac',
+                transcription_text='word ' * 100, diarization_data='Speaker 0: word',
+            )
+            CaseBrief.objects.create(transcription=transcription)
+            DiarizedSegment.objects.create(transcription=transcription, diarization_data='Speaker 0: word')
+        cls.transcription, cls.chunk = transcription, chunk
+
+    def test_api_endpoints(self):
+        self.get_within_budget('transcription-list')
+        self.get_within_budget('transcription-list', fields='id,status', status='in_progress')
+        self.get_within_budget('transcription-detail', self.transcription.id)
+        self.get_within_budget('transcription-progress', self.transcription.id)
+        self.get_within_budget('audio-chunk-list-create')
+        self.get_within_budget('audio-chunk-list-create', transcription=self.transcription.id)
+        self.get_within_budget('audio-chunk-detail', self.chunk.id)
+        self.get_within_budget('dashboard-stats')
+
+    def test_admin_change_lists(self):
+        self.assertEqual(PipelineJob.objects.filter(kind='transcribe').count(), self.ROWS)
+        self.client.force_login(self.user)
+        for name in QUERY_BUDGETS:
+            if name.startswith('admin:'):
+                with self.subTest(name):
+                    self.get_within_budget(name)
+
+    def test_str_does_not_query(self):
+        chunk = AudioChunk.objects.get(pk=self.chunk.pk)
+        brief = CaseBrief.objects.filter(transcription=self.transcription).get()
+        segment = DiarizedSegment.objects.get(transcription=self.transcription)
+        with self.assertNumQueries(0):
+            str(chunk), str(brief), str(segment)
+        with self.assertNumQueries(1):
+            chunk = AudioChunk.objects.select_related('transcription').get(pk=self.chunk.pk)
+            self.assertEqual(str(chunk), f"Chunk 0 for {self.transcription.case_name}")
+
+
+def write_wav(path, seconds, rate=16000):
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(b'\0\0' * int(seconds * rate))
+
+
+class ListEndpointTests(TestCase):
+    """Lists are cursor-paginated, and leave out the large text columns unless `?fields=` asks for them."""
+
+    def setUp(self):
+        self.transcriptions = [
+            Transcription.objects.create(
+                audio_file=f'audio_files/{i}.mp3', case_name=f'Case {i}', status='completed', transcription_text=f"text {i}",
+            )
+            for i in range(3)
+        ]
+        AudioChunk.objects.create(
+            transcription=self.transcriptions[0], chunk_index=0, transcription_text="part", diarization_data="Speaker 1: part",
+        )
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response.json()
+
+    def test_cursor_pages(self):
+        url = reverse('transcription-list')
+        first = self.get(url, page_size=2)
+        self.assertEqual([row['id'] for row in first['results']], [t.id for t in self.transcriptions[:0:-1]])  # Newest first
+        self.assertNotIn('transcription_text', first['results'][0])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [self.transcriptions[0].id])
+        self.assertIsNone(second['next'])
+
+    def test_fields(self):
+        url = reverse('transcription-list')
+        rows = self.get(url, fields='id,status,transcription_text', page_size=2)['results']
+        self.assertEqual(rows[0], {'id': self.transcriptions[2].id, 'status': 'completed', 'transcription_text': "text 2"})
+        self.assertEqual(set(self.get(url, fields='case_name')['results'][0]), {'id', 'case_name'})
+
+        chunks = self.get(reverse('audio-chunk-list-create'))['results']
+        self.assertNotIn('transcription_text', chunks[0])
+        self.assertNotIn('diarization_data', chunks[0])
+        chunks = self.get(reverse('audio-chunk-list-create'), fields='diarization_data')['results']
+        self.assertEqual(chunks[0]['diarization_data'], "Speaker 1: part")
+
+        detail = self.get(reverse('transcription-detail', args=[self.transcriptions[0].id]))
+        self.assertEqual(detail['transcription_text'], "text 0")  # A single transcription has it all
+
+
+@override_settings(PIPELINE_BACKENDS={
+    'asr': {'BACKEND': 'api.backends.FakeASRBackend', 'OPTIONS': {'profile': 'instant', 'seed': 7}},
+    'diarization': {'BACKEND': 'api.backends.FakeDiarizationBackend', 'OPTIONS': {'profile': 'instant', 'speakers': 3}},
+    'llm': {'BACKEND': 'api.backends.FakeLLMBackend', 'OPTIONS': {'profile': 'instant'}},
+})
+class FakeBackendTests(TestCase):
+    """The stand-in backends answer deterministically and fail as often as configured."""
+
+    def setUp(self):
+        caches['pipeline'].clear()
+        self.path = os.path.join(tempfile.mkdtemp(), 'chunk.wav')
+        write_wav(self.path, 30)
+
+    def test_pipeline_calls_use_the_configured_backends(self):
+        result = transcribe_audio_with_retry(self.path)
+        self.assertEqual(len(result['words']), 75)  # 2.5 words per second of audio
+        self.assertEqual(result['words'][-1]['end'], 30.0)
+        self.assertEqual(FakeASRBackend(seed=7, profile='instant').transcribe(self.path), result)
+
+        speaker_texts = diarize_audio_with_retry(self.path, result['text'], result['words'])
+        self.assertEqual(" ".join(block['text'] for block in speaker_texts), result['text'])
+        self.assertLessEqual(len({block['speaker'] for block in speaker_texts}), 3)
+
+    def test_diarization_reuses_the_chunk_transcript(self):
+        with mock.patch.object(FakeASRBackend, 'transcribe') as transcribe:
+            speaker_texts = diarize_audio_with_retry(self.path, "the court is in session", None)
+        transcribe.assert_not_called()  # The audio isn't sent for transcription a second time
+        self.assertEqual(" ".join(block['text'] for block in speaker_texts).split(), "the court is in session".split())
+        self.assertIsNone(diarize_audio_with_retry(self.path, "", None))
+
+    def test_failures_and_rate_limits(self):
+        backend = FakeASRBackend(profile='instant', rate_limit_rate=1.0, retry_after=2.5)
+        with self.assertRaises(RateLimited) as raised:
+            backend.transcribe(self.path)
+        self.assertEqual(raised.exception.retry_after, 2.5)
+
+        backend = FakeASRBackend(profile='instant', error_rate=0.5, seed=3)
+        outcomes = []
+        for _ in range(20):
+            try:
+                backend.transcribe(self.path)
+                outcomes.append(True)
+            except BackendError:
+                outcomes.append(False)
+        self.assertIn(True, outcomes)
+        self.assertIn(False, outcomes)
+        replay = FakeASRBackend(profile='instant', error_rate=0.5, seed=3)
+        for outcome in outcomes:  # Same seed, same sequence
+            try:
+                replay.transcribe(self.path)
+                self.assertTrue(outcome)
+            except BackendError:
+                self.assertFalse(outcome)
+
+
+class MetricsTests(QueryBudgetMixin, TestCase):
+    """/metrics adds up the metrics written by every process and reads the queue depths."""
+
+    def setUp(self):
+        metrics_settings = override_settings(METRICS_DIR=tempfile.mkdtemp(), METRICS_TOKEN='scrape-me')
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer scrape-me'
+
+    def test_metrics_need_the_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with self.settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_metrics_of_all_processes(self):
+        transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3')  # Queues a chunk job
+        with open(os.path.join(settings.METRICS_DIR, 'worker-1.json'), 'w') as f:
+            json.dump([
+                ['themis_backend_calls_total', [['backend', 'asr'], ['outcome', 'rate_limited']], 1000],
+                ['themis_stage_duration_seconds', [['stage', 'chunking']], [0] * len(metrics.STAGE_BUCKETS) + [7.5, 1]],
+            ], f)
+        metrics.inc('themis_backend_calls_total', backend='asr', outcome='rate_limited')
+        with metrics.timed('chunking'):
+            pass
+
+        lines = self.get_within_budget('metrics').content.decode().splitlines()
+        self.assertIn('themis_backend_calls_total{backend="asr",outcome="rate_limited"} 1001', lines)
+        self.assertIn('themis_stage_duration_seconds_bucket{stage="chunking",le="0.01"} 1', lines)
+        self.assertIn('themis_stage_duration_seconds_bucket{stage="chunking",le="+Inf"} 2', lines)
+        self.assertIn('themis_queue_jobs{kind="chunk",status="queued"} 1', lines)
+        self.assertIn('# TYPE themis_stage_duration_seconds histogram', lines)
+        self.assertEqual(PipelineJob.objects.get().transcription_id, transcription.id)
+
+    def test_files_of_exited_processes_are_compacted(self):
+        exited = subprocess.Popen(['true'])
+        exited.wait()  # Its PID is no longer running
+        token = '0' * 32
+        entry = [['themis_jobs_total', [['kind', 'chunk'], ['outcome', 'done']], 2]]
+        files = {
+            'exited': f"{socket.gethostname()}-{exited.pid}-{token}.json",
+            'stale': f"other-host-123-{token}.json",
+            'running': f"{socket.gethostname()}-{os.getppid()}-{token}.json",
+        }
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        for name in files.values():
+            with open(os.path.join(settings.METRICS_DIR, name), 'w') as f:
+                json.dump(entry, f)
+        old = time.time() - settings.METRICS_STALE_SECONDS - 1
+        os.utime(os.path.join(settings.METRICS_DIR, files['stale']), (old, old))
+
+        line = 'themis_jobs_total{kind="chunk",outcome="done"} 6'
+        self.assertIn(line, metrics.render().splitlines())
+        self.assertEqual(
+            sorted(os.listdir(settings.METRICS_DIR)), sorted([files['running'], metrics.COMPACTED_FILE, '.lock']),
+        )
+        self.assertIn(line, metrics.render().splitlines())  # Folded in once, not counted again
+
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):  # A forked child writes a file of its own
+            self.assertNotEqual(metrics._process_file(), os.path.join(settings.METRICS_DIR, files['running']))
+
+
+@override_settings(
+    PIPELINE_BACKENDS={'asr': {'BACKEND': 'api.backends.FakeASRBackend', 'OPTIONS': {
+        'profile': 'instant', 'rate_limit_rate': 1.0, 'retry_after': 30,
+    }}},
+    BACKEND_RATE_LIMITS={'asr': {'per_minute': 60, 'burst': 2}},
+    CIRCUIT_FAILURE_THRESHOLD=2,
+)
+class RateLimitTests(TestCase):
+    """External calls share one token bucket per backend, and a failing backend pauses its jobs."""
+
+    def setUp(self):
+        caches['pipeline'].clear()
+        media_root = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'audio_chunks'))
+        write_wav(os.path.join(settings.MEDIA_ROOT, 'audio_chunks', 'chunk.wav'), 5)
+
+    def test_token_bucket(self):
+        self.assertEqual(take_token('asr'), (True, 0.0))
+        self.assertEqual(take_token('asr'), (True, 0.0))
+        taken, wait = take_token('asr')  # Burst used up: the next token is about a second away
+        self.assertFalse(taken)
+        self.assertAlmostEqual(wait, 1.0, delta=0.1)
+        taken, wait = take_token('asr', max_wait=2)  # Reserved, to be waited for
+        self.assertTrue(taken)
+        self.assertAlmostEqual(wait, 1.0, delta=0.1)
+        self.assertEqual(take_token('llm'), (True, 0.0))  # No limit configured
+
+    def test_rate_limited_jobs_are_requeued_and_open_the_circuit(self):
+        transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3', status='in_progress')
+        PipelineJob.objects.all().delete()
+        chunk = AudioChunk.objects.create(
+            transcription=transcription, chunk_index=0, chunk_file='audio_chunks/chunk.wav',
+        )
+
+        job = claim_next_job('test')
+        self.assertEqual(job.kind, 'transcribe')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        chunk.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))  # Only told to wait: the attempt is given back
+        self.assertGreaterEqual((job.available_at - job.finished_at).total_seconds(), 30)  # Retry-After
+        self.assertEqual(chunk.status, 'pending')
+
+        with self.assertRaises(RetryLater) as raised:
+            call_backend('asr', 'transcribe', chunk.chunk_file.path)
+        self.assertFalse(raised.exception.counts)
+        self.assertEqual(CircuitBreaker.objects.get(name='asr').state, 'open')  # Second failure in a row
+        with self.assertRaises(CircuitOpen):
+            call_backend('asr', 'transcribe', chunk.chunk_file.path)
+        PipelineJob.objects.filter(pk=job.pk).update(available_at=job.finished_at)
+        self.assertIsNone(claim_next_job('test'))  # Transcription jobs wait for the circuit to close
+
+    def test_local_errors_do_not_touch_the_circuit(self):
+        path = os.path.join(settings.MEDIA_ROOT, 'audio_chunks', 'chunk.wav')
+        with mock.patch.object(FakeASRBackend, 'transcribe', side_effect=KeyError('words')):
+            for _ in range(2):
+                with self.assertRaises(KeyError):  # A bug of ours, not a provider failure: not retried later
+                    call_backend('asr', 'transcribe', path)
+        self.assertFalse(CircuitBreaker.objects.filter(name='asr', failures__gt=0).exists())
+
+        with mock.patch.object(FakeASRBackend, 'transcribe', side_effect=BackendError("503 from the provider")):
+            with self.assertRaises(RetryLater):
+                call_backend('asr', 'transcribe', path)
+        self.assertEqual(CircuitBreaker.objects.get(name='asr').failures, 1)
+
+
+class RateLimiterTests(SimpleTestCase):
+    """The per-process limiter spaces requests evenly and caps the calls in flight."""
+
+    def test_spacing(self):
+        limiter = RateLimiter(requests_per_minute=1200)  # One request every 50 ms
+        started = time.monotonic()
+        for _ in range(3):
+            with limiter:
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_concurrency(self):
+        limiter = RateLimiter(max_concurrent=2)
+        lock = threading.Lock()
+        in_flight, peak = [0], [0]
+
+        def call():
+            with limiter:
+                with lock:
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                time.sleep(0.02)
+                with lock:
+                    in_flight[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """Models are loaded on first use, once per process, however many threads ask for them at once."""
+
+    def test_loaded_once(self):
+        loader = mock.Mock(side_effect=lambda: time.sleep(0.05) or object())
+        with mock.patch.dict(model_registry.MODEL_LOADERS, {'diarization': loader}), \
+                mock.patch.dict(model_registry._models, clear=True):
+            self.assertEqual(loader.call_count, 0)  # Nothing is loaded at import time
+            threads = [threading.Thread(target=model_registry.get_diarization_pipeline) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertIs(model_registry.get_diarization_pipeline(), model_registry._models['diarization'])
+            model_registry.warm_up()
+        loader.assert_called_once()
+
+
+class AlignmentTests(SimpleTestCase):
+    """Words go to the speaker turn containing their midpoint, and speakers keep one label throughout."""
+
+    @staticmethod
+    def words(*timings):
+        return [{'word': f" w{i}", 'start': start, 'end': end} for i, (start, end) in enumerate(timings)]
+
+    def test_words_follow_their_timestamps(self):
+        turns = [(0.0, 4.0, 'SPEAKER_01'), (4.0, 8.0, 'SPEAKER_00'), (8.0, 12.0, 'SPEAKER_01')]
+        words = self.words((0.5, 1.0), (3.0, 4.4), (5.0, 5.5), (9.0, 9.5), (11.0, 11.5))
+        self.assertEqual(align_words_with_turns(turns, words), [
+            {'speaker': 'SPEAKER_01', 'text': "w0 w1"},
+            {'speaker': 'SPEAKER_00', 'text': "w2"},
+            {'speaker': 'SPEAKER_01', 'text': "w3 w4"},
+        ])
+
+    def test_nested_turns_and_gaps(self):
+        # An interruption inside a long turn, then a gap closer to the last turn
+        turns = [(0.0, 10.0, 'A'), (4.0, 5.0, 'B'), (14.0, 16.0, 'C')]
+        words = self.words((1.0, 2.0), (4.2, 4.6), (6.0, 7.0), (12.5, 13.5), (15.0, 15.5))
+        self.assertEqual(
+            [block['speaker'] for block in align_words_with_turns(turns, words)], ['A', 'B', 'A', 'C'],
+        )
+        self.assertEqual(align_words_with_turns([], words), [])
+
+    def test_speaker_labels(self):
+        formatted = format_diarization([
+            {'speaker': 'SPEAKER_01', 'text': "Please rise."},
+            {'speaker': 'SPEAKER_00', 'text': "Good morning."},
+            {'speaker': 'SPEAKER_01', 'text': "Be seated."},
+        ])
+        self.assertEqual(formatted, "Speaker 1: Please rise.\n\nSpeaker 2: Good morning.\n\nSpeaker 1: Be seated.\n\n")
+
+
+class ResultCacheTests(SimpleTestCase):
+    """Pipeline results are cached by audio content and call parameters, not by file name."""
+
+    def setUp(self):
+        caches['pipeline'].clear()
+        directory = tempfile.mkdtemp()
+        self.first, self.copy = os.path.join(directory, 'a.wav'), os.path.join(directory, 'b.wav')
+        write_wav(self.first, 1)
+        write_wav(self.copy, 1)
+
+    def test_same_audio_is_computed_once(self):
+        compute = mock.Mock(return_value={'text': "hello"})
+        self.assertEqual(cached_result('transcription', self.first, {'model': 'x'}, compute), {'text': "hello"})
+        self.assertEqual(cached_result('transcription', self.copy, {'model': 'x'}, compute), {'text': "hello"})
+        compute.assert_called_once()
+
+        cached_result('transcription', self.first, {'model': 'y'}, compute)  # Other parameters
+        cached_result('diarization', self.first, {'model': 'x'}, compute)  # Another kind of result
+        self.assertEqual(compute.call_count, 3)
+
+    def test_failures_are_not_cached(self):
+        compute = mock.Mock(return_value=None)
+        cached_result('transcription', self.first, {}, compute)
+        cached_result('transcription', self.first, {}, compute)
+        self.assertEqual(compute.call_count, 2)
+
+
+@override_settings(PROGRESS_POLL_INTERVAL=0.01, PROGRESS_LONG_POLL_SECONDS=2)
+class ProgressTests(TestCase):
+    """Long-polls return as soon as the version token changes, and never wait longer than allowed."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3', status='in_progress')
+        self.url = reverse('transcription-progress', args=[self.transcription.id])
+
+    def test_version_token(self):
+        version = self.client.get(self.url).json()['version']
+        started = time.monotonic()
+        response = self.client.get(self.url, {'version': version, 'wait': 0.05})
+        self.assertEqual(response.json()['version'], version)  # Nothing changed
+        self.assertLess(time.monotonic() - started, 1)
+
+        bump_progress(self.transcription.id)
+        started = time.monotonic()
+        response = self.client.get(self.url, {'version': version, 'wait': 2})
+        self.assertNotEqual(response.json()['version'], version)
+        self.assertLess(time.monotonic() - started, 1)  # Didn't wait for the timeout
+
+    def test_wait_is_validated_and_clamped(self):
+        version = self.client.get(self.url).json()['version']
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            with self.subTest(wait):
+                self.assertEqual(self.client.get(self.url, {'version': version, 'wait': wait}).status_code, 400)
+        started = time.monotonic()
+        self.assertEqual(self.client.get(self.url, {'version': version, 'wait': -5}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, {'version': version, 'wait': 1e9}).status_code, 200)
+        self.assertLess(time.monotonic() - started, 4)  # At most PROGRESS_LONG_POLL_SECONDS
+
+    @override_settings(PROGRESS_MAX_WAITERS=0)
+    def test_waiters_are_bounded(self):
+        version = self.client.get(self.url).json()['version']
+        response = self.client.get(self.url, {'version': version, 'wait': 1})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.PROGRESS_BUSY_RETRY_SECONDS))
+        self.assertEqual(self.client.get(self.url, {'version': 'stale', 'wait': 1}).status_code, 200)  # No need to wait
+
+        response = self.client.get(reverse('transcription-progress-stream', args=[self.transcription.id]))
+        self.assertIn(b"event: busy", b"".join(response.streaming_content))
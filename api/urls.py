@@ -4,6 +4,12 @@ from cases.views import transcribed_cases_count
 
 from .views import (
     TranscriptionViewSet,
+    TranscriptionUploadViewSet,
+    transcription_progress_stream,
+    case_brief_pdf,
+    case_briefs_zip,
+    search_transcripts,
+    dashboard_stats,
     # TranscriptionDetailView,
     DiarizedSegmentListCreateView,
     DiarizationDetailView,
@@ -15,6 +21,20 @@ urlpatterns = [
 
         path('transcriptions/', TranscriptionViewSet.as_view({'get': 'list', 'post': 'create'}), name='transcription-list'),
     path('transcription/<int:pk>/', TranscriptionViewSet.as_view({'get': 'retrieve'}), name='transcription-detail'),
+    path('transcription/<int:pk>/text/', TranscriptionViewSet.as_view({'get': 'get_transcription'}), name='transcription-text'),
+    path('transcription/<int:pk>/progress/', TranscriptionViewSet.as_view({'get': 'progress'}), name='transcription-progress'),
+    path('transcription/<int:pk>/progress/stream/', transcription_progress_stream, name='transcription-progress-stream'),
+    path('transcription/<int:pk>/case-brief/', TranscriptionViewSet.as_view({'post': 'case_brief'}), name='transcription-case-brief'),
+    path('transcription/<int:pk>/case-brief/pdf/', case_brief_pdf, name='transcription-case-brief-pdf'),
+    path('case-briefs/pdf.zip', case_briefs_zip, name='case-briefs-zip'),
+
+    path('search/', search_transcripts, name='search'),
+    path('stats/', dashboard_stats, name='dashboard-stats'),
+
+    # Resumable uploads: POST to start, PATCH byte ranges, GET to find the resume offset, then finalize
+    path('uploads/', TranscriptionUploadViewSet.as_view({'post': 'create'}), name='upload-create'),
+    path('uploads/<uuid:pk>/', TranscriptionUploadViewSet.as_view({'get': 'retrieve', 'patch': 'append'}), name='upload-detail'),
+    path('uploads/<uuid:pk>/finalize/', TranscriptionUploadViewSet.as_view({'post': 'finalize'}), name='upload-finalize'),
 
     # Diarization API paths
     path('diarizations/', DiarizedSegmentListCreateView.as_view(), name='diarized-segment-list-create'),
@@ -45,101 +45,113 @@ aai.settings.api_key = settings.AAI_KEY
 
 
 
-import openai
-
-# Set your OpenAI API key
-openai.api_key = settings.OPENAI_API_KEY
-
-def transcribe_audio_with_retry(audio_file_path, retries=5, delay=2):
-    """Transcribes audio using OpenAI Whisper API with retries and exponential backoff."""
-    
-    for attempt in range(retries):
-        try:
-            with open(audio_file_path, 'rb') as audio_file:
-                print(f"Transcribing file: {audio_file_path} (Attempt {attempt+1})")  # Debugging line
-
-                # Use OpenAI's Whisper model for transcription
-                transcription = openai.Audio.transcribe(
-                    model="whisper-1", 
-                    file=audio_file,
-                    language="en"
-                )
-
-                if 'error' in transcription:
-                    print(f"Transcription Error: {transcription['error']}")  # Debugging line
-                    raise ValueError(f"Transcription Error: {transcription['error']}")
-
-                print(f"Transcription completed for file: {audio_file_path}")  # Debugging line
-                return transcription['text']
-
-        except Exception as e:
-            print(f"Error transcribing file {audio_file_path}: {e}")  # Debugging line
-            if attempt < retries - 1:
-                print(f"Retrying in {delay ** attempt} seconds.")  # Debugging line
-                time.sleep(delay ** attempt)
-            else:
-                print(f"All attempts failed for file: {audio_file_path}")
-                return None
-
-
-
-
-from pyannote.audio import Pipeline
-
-# Initialize the diarization pipeline (use your Hugging Face access token if needed)
-pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1",  use_auth_token=settings.HF_AUTH_TOKEN)
-
-def diarize_audio_with_retry(audio_file_path, retries=5, delay=2):
-    """Performs diarization and transcription on the given audio file with retry logic using pyannote.audio and OpenAI."""
-    
-    for attempt in range(retries):
-        try:
-            print(f"Starting diarization for file: {audio_file_path} (Attempt {attempt+1})")
-            
-            # Step 1: Run diarization with pyannote
-            diarization_result = pipeline(audio_file_path)
-            
-            # Step 2: Run transcription with Whisper API (OpenAI)
-            with open(audio_file_path, 'rb') as audio_file:
-                transcription_response = openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="en"
-                )
-                transcription_text = transcription_response.get('text', '')
-
-            if not transcription_text:
-                raise ValueError(f"No transcription found for {audio_file_path}")
-            
-            print(f"Transcription and diarization completed for file: {audio_file_path}")
-
-            # Step 3: Align the transcription with speaker segments (diarization)
-            speaker_texts = align_diarization_with_transcription(diarization_result, transcription_text)
-
-            return speaker_texts  # Return the aligned speaker text
-
-        except Exception as e:
-            print(f"Error during diarization or transcription of file {audio_file_path}: {e}")
-            if attempt < retries - 1:
-                print(f"Retrying in {delay ** attempt} seconds.")
-                time.sleep(delay ** attempt)
-            else:
-                print(f"All attempts failed for diarization of file: {audio_file_path}")
-                return None
-
-
-def align_diarization_with_transcription(diarization_result, transcription_text):
-    """Aligns transcription text with speaker segments based on diarization results."""
+from . import metrics
+from .backends import call_backend, get_backend
+from .cache import cached_result
+from .ratelimit import RateLimiter, RetryLater
+
+# Shared by all worker threads of this process so parallel chunks don't overload the Whisper API; the
+# requests per minute are limited across processes by the backend's token bucket (see api/ratelimit.py)
+whisper_limiter = RateLimiter(max_concurrent=settings.WHISPER_MAX_CONCURRENT_REQUESTS)
+
+
+def transcribe_audio_with_retry(audio_file_path):
+    """Transcribes audio with the configured ASR backend (Whisper by default).
+
+    Returns a dict with the transcript `text` and its `words`, each with `start`/`end` timestamps in
+    seconds (used to attribute words to speakers). Results are cached by audio content, so the same
+    audio is only ever sent to the API once. A failed call raises RetryLater: the job is retried
+    later by the queue, with backoff, rather than by this thread sleeping.
+    """
+    backend = get_backend('asr')
+    return cached_result(
+        'transcription',
+        audio_file_path,
+        backend.cache_params,
+        lambda: _transcribe_audio(audio_file_path),
+    )
+
+
+def _transcribe_audio(audio_file_path):
+    """Calls the ASR backend for `transcribe_audio_with_retry`."""
+    print(f"Transcribing file: {audio_file_path}")  # Debugging line
+    try:
+        with whisper_limiter:
+            transcription = call_backend('asr', 'transcribe', audio_file_path)
+    except RetryLater as e:
+        print(f"Error transcribing file {audio_file_path}: {e}")  # Debugging line
+        raise
+    print(f"Transcription completed for file: {audio_file_path}")  # Debugging line
+    return transcription
+
+
+
+
+from .alignment import align_words_with_turns
+
+# The pyannote pipeline is loaded lazily by `api.model_registry`, the first time a process diarizes
+
+def diarize_audio_with_retry(audio_file_path, transcription_text, transcription_words=None):
+    """Performs diarization on the given audio file with the configured diarization backend
+    (pyannote.audio by default). A failed call raises RetryLater, like `transcribe_audio_with_retry`.
+
+    `transcription_text` and `transcription_words` are the chunk's existing Whisper transcript and
+    word timings, which are aligned with the speaker turns; the audio is never sent to the
+    transcription API a second time. Without word timings, words are spread over the turns
+    in proportion to their duration.
+    """
+    if not transcription_text:
+        print(f"No transcription to diarize for file: {audio_file_path}")
+        return None
+
+    print(f"Starting diarization for file: {audio_file_path}")
+
+    # Step 1: Find the speaker turns
+    # Speaker turns only depend on the audio, so they are cached by its content
+    backend = get_backend('diarization')
+    try:
+        turns = cached_result(
+            'diarization',
+            audio_file_path,
+            backend.cache_params,
+            lambda: call_backend('diarization', 'diarize', audio_file_path),
+        )
+    except RetryLater as e:
+        print(f"Error during diarization of file {audio_file_path}: {e}")
+        raise
+
+    print(f"Diarization completed for file: {audio_file_path}")
+
+    # Step 2: Align the transcription with speaker segments (diarization)
+    with metrics.timed('alignment'):
+        if transcription_words:
+            return align_words_with_turns(turns, transcription_words)
+        return align_diarization_with_transcription(turns, transcription_text)
+
+
+def align_diarization_with_transcription(turns, transcription_text):
+    """Aligns transcription text with speaker turns (sorted `(start, end, speaker)` tuples) by their duration."""
     words = transcription_text.split()  # Split the transcription into words
     word_index = 0
     speaker_texts = []
     current_speaker = None
     current_speaker_text = []
-
-    for turn, _, speaker in diarization_result.itertracks(yield_label=True):
-        # Estimate the number of words for this segment based on its length
-        segment_duration = turn.end - turn.start
-        segment_word_count = int(len(words) * (segment_duration / diarization_result.get_timeline().extent().duration))
+    if not turns:
+        return speaker_texts
+
+    # Total time spanned by the turns, computed once rather than per turn
+    total_duration = max(end for _, end, _ in turns) - turns[0][0]
+
+    elapsed = 0.0
+    for number, (start, end, speaker) in enumerate(turns):
+        # Estimate the words of this segment from its length; the running total is rounded rather than
+        # each segment's share truncated, so no words are lost, and the last segment takes the rest
+        elapsed += end - start
+        if number == len(turns) - 1 or not total_duration:
+            next_index = len(words)
+        else:
+            next_index = min(len(words), round(len(words) * elapsed / total_duration))
+        segment_word_count = max(0, next_index - word_index)
 
         # Get the words for this segment and move the index forward
         segment_words = words[word_index:word_index + segment_word_count]
@@ -173,10 +185,16 @@ def align_diarization_with_transcription(diarization_result, transcription_text)
 
 
 def format_diarization(diarization_data):
-    """Formats diarization data to include simplified speaker labels and their spoken text."""
+    """Formats diarization data to include simplified speaker labels and their spoken text.
+
+    Speakers are numbered in order of first appearance (SPEAKER_03, SPEAKER_01 -> Speaker 1, Speaker 2),
+    so every utterance of a speaker carries the same label.
+    """
+    labels = {}
     formatted_data = []
-    for index, utterance in enumerate(diarization_data):
-        speaker = f"Speaker {index + 1}"  # Simplify speaker label to Speaker 1, Speaker 2, etc.
+    for utterance in diarization_data:
+        # Simplify speaker label to Speaker 1, Speaker 2, etc.
+        speaker = labels.setdefault(utterance['speaker'], f"Speaker {len(labels) + 1}")
         text = utterance['text']  # Get the spoken text
         formatted_data.append(f"{speaker}: {text}\n\n")  # Add extra space for readability
 
@@ -240,6 +258,46 @@ def format_diarization(diarization_data):
 from fpdf import FPDF
 import re
 
+BOLD_RE = re.compile(r'(\[b\].*?\[/b\])')
+
+# Images already parsed by FPDF in this process, by path (see `_add_image`)
+_parsed_images = {}
+
+
+def _add_image(pdf, image_path, **kwargs):
+    """Adds an image to the PDF, parsing the file only once per process.
+
+    FPDF re-reads and decompresses an image for every new document; handing it the parsed image
+    instead makes the logo free after the first brief.
+    """
+    if image_path in _parsed_images:
+        pdf.images[image_path] = dict(_parsed_images[image_path], i=len(pdf.images) + 1)
+    pdf.image(image_path, **kwargs)
+    _parsed_images.setdefault(image_path, {k: v for k, v in pdf.images[image_path].items() if k not in ('i', 'n')})
+
+
+def _add_paragraph(pdf, text, size=12):
+    """Prints a paragraph; plain ones are justified, ones with [b]bold[/b] runs flow inline."""
+    if not text.strip():
+        pdf.ln(10)
+        return
+    if '[b]' not in text:
+        pdf.multi_cell(0, 10, text, align='J')
+        return
+
+    style = None
+    for part in BOLD_RE.split(text):
+        if not part:
+            continue
+        bold = part.startswith('[b]') and part.endswith('[/b]')
+        if style != ('B' if bold else ''):  # Only switch fonts when the style actually changes
+            style = 'B' if bold else ''
+            pdf.set_font("Times", style=style, size=size)
+        pdf.write(10, part[3:-4] if bold else part)
+    pdf.ln(10)
+    pdf.set_font("Times", size=size)
+
+
 def save_as_pdf(case_brief, filename, image_path=None):
     """Saves the given case brief as a PDF file."""
     pdf = FPDF()
@@ -247,7 +305,7 @@ def save_as_pdf(case_brief, filename, image_path=None):
     pdf.add_page()
 
     if image_path:
-        pdf.image(image_path, x=(pdf.w - 40) / 2, y=10, w=40, h=40)
+        _add_image(pdf, image_path, x=(pdf.w - 40) / 2, y=10, w=40, h=40)
     
     pdf.ln(50)
 
@@ -281,18 +339,9 @@ def save_as_pdf(case_brief, filename, image_path=None):
     pdf.set_font("Times", size=12)
     content = ruling.split('DATED, SIGNED AND DELIVERED')[0].strip()
     
-    # Handle bold text
-    def add_text_with_bold(pdf, text):
-        parts = re.split(r'(\[b\].*?\[/b\])', text)
-        for part in parts:
-            if part.startswith('[b]') and part.endswith('[/b]'):
-                pdf.set_font("Times", style='B', size=12)
-                pdf.multi_cell(0, 10, part[3:-4], align='J')
-            else:
-                pdf.set_font("Times", size=12)
-                pdf.multi_cell(0, 10, part, align='J')
-
-    add_text_with_bold(pdf, content)
+    # Print paragraph by paragraph, so [b]bold[/b] runs stay inline instead of each becoming a block
+    for paragraph in content.split('\n'):
+        _add_paragraph(pdf, paragraph)
 
     pdf.ln(10)
 
@@ -1,22 +1,83 @@
+import hmac
+import math
 
 from rest_framework import generics, viewsets, status, mixins
-from .serializers import TranscriptionSerializer, DiarizedSegmentSerializer, AudioChunkSerializer
-from transcription.models import Transcription
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from . import metrics
+from .pagination import AudioChunkCursorPagination, SearchPagination, TranscriptionCursorPagination
+from .serializers import TranscriptionSerializer, DiarizedSegmentSerializer, AudioChunkSerializer, TranscriptionUploadSerializer, requested_fields
+from transcription.assembly import assemble_transcription_prefix
+from transcription.models import Transcription, TranscriptionUpload
+from case_brief.batch import render_case_briefs, zip_case_brief_pdfs
+from case_brief.models import CaseBrief
+from case_brief.generation import is_pdf_current, latest_case_brief, source_digest
+from stats.counters import dashboard
+from search.index import SearchNotSupported, SearchResults
+from transcription.progress import TooManyWaiters, progress_events, progress_snapshot, wait_for_change
+from transcription.uploads import UploadError, UploadOffsetMismatch, append_part, finalize_upload, parse_content_range
 from diarization.models import DiarizedSegment
-from transcription_chunks.models import AudioChunk
-from rest_framework.decorators import action
+from transcription_chunks.models import AudioChunk, PipelineJob
+from transcription_chunks.queue import enqueue
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import NotFound, ValidationError
 
 
-class TranscriptionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+def _split_param(value):
+    """Splits a comma-separated query parameter (`?status=pending,failed`) into a list."""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class SparseFieldsetViewMixin:
+    """
+    Leaves out the large columns in `deferred_fields`: from list responses unless `?fields=` asks for
+    them, and from any response whose `?fields=` doesn't. Left-out columns are neither read from the
+    database nor serialized. Columns in `always_deferred` are never serialized.
+    """
+    deferred_fields = ()
+    always_deferred = ()
+
+    def omitted_fields(self):
+        requested = requested_fields(self.request)
+        if requested is None:
+            return list(self.deferred_fields) if self.action == 'list' else []
+        return [name for name in self.deferred_fields if name not in requested]
+
+    def get_queryset(self):
+        return super().get_queryset().defer(*self.always_deferred, *self.omitted_fields())
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'omitted_fields': self.omitted_fields()}
+
+
+class TranscriptionViewSet(SparseFieldsetViewMixin, mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     """
     This viewset provides `list`, `create`, and `retrieve` actions for Transcriptions.
+
+    The list is cursor-paginated (newest first) and accepts `?fields=`, `?status=` (comma-separated),
+    `?case_number=` and `?case_name=` (substring match).
     """
     queryset = Transcription.objects.all()
     serializer_class = TranscriptionSerializer
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = TranscriptionCursorPagination
+    deferred_fields = ('transcription_text',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        if params.get('status'):
+            queryset = queryset.filter(status__in=_split_param(params['status']))
+        if params.get('case_number'):
+            queryset = queryset.filter(case_number=params['case_number'])
+        if params.get('case_name'):
+            queryset = queryset.filter(case_name__icontains=params['case_name'])
+        return queryset
 
     def create(self, request, *args, **kwargs):
         """
@@ -37,14 +98,173 @@ class TranscriptionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixin
     def get_transcription(self, request, pk=None):
         """
         Return the transcription status and text.
+
+        While chunks are still being transcribed, the text covers the leading chunks that are done
+        (in recording order) and `is_partial` is true.
         """
         transcription = self.get_object()
+        if transcription.status == 'completed':
+            text, is_partial = transcription.transcription_text, False
+        else:
+            text, _ = assemble_transcription_prefix(transcription)
+            is_partial = True
         return Response({
             'id': transcription.id,
             'status': transcription.status,
-            'transcription_text': transcription.transcription_text,
+            'transcription_text': text,
+            'is_partial': is_partial,
         })
 
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """
+        Long-poll for progress: status, per-chunk states and percent complete.
+
+        Pass the `version` from the previous response to wait (up to `wait` seconds) until something
+        changes. Neither the wait nor an unchanged snapshot touches the database.
+        """
+        version = request.query_params.get('version')
+        if version:
+            try:
+                wait = float(request.query_params.get('wait', settings.PROGRESS_LONG_POLL_SECONDS))
+            except ValueError:
+                wait = math.nan
+            if not math.isfinite(wait):
+                return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                wait_for_change(pk, version, max(0.0, min(wait, settings.PROGRESS_LONG_POLL_SECONDS)))
+            except TooManyWaiters as e:
+                return Response(
+                    {'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': str(settings.PROGRESS_BUSY_RETRY_SECONDS)},
+                )
+        snapshot = progress_snapshot(pk)
+        if snapshot is None:
+            raise NotFound({"error": "Transcription not found"})
+        return Response(snapshot)
+
+    @action(detail=True, methods=['post'])
+    def case_brief(self, request, pk=None):
+        """
+        Queue generation of the case brief and its PDF, unless they are already up to date.
+
+        Download the PDF from `case-brief/pdf/` once it is ready.
+        """
+        transcription = self.get_object()
+        if transcription.status != 'completed':
+            return Response({'error': 'The transcription is not completed yet.'}, status=status.HTTP_409_CONFLICT)
+        case_brief = latest_case_brief(transcription.id)
+        if (case_brief and case_brief.source_digest == source_digest(transcription.transcription_text)
+                and is_pdf_current(case_brief)):
+            return Response({'id': case_brief.id, 'status': 'ready'})
+        job = enqueue('brief', transcription.id)
+        return Response({'job_id': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+def transcription_progress_stream(request, pk):
+    """
+    Server-Sent Events stream of a transcription's progress (one `progress` event per change).
+    """
+    if progress_snapshot(pk) is None:
+        raise Http404("Transcription not found")
+    response = StreamingHttpResponse(
+        progress_events(pk, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the events
+    return response
+
+@api_view(['GET'])
+def dashboard_stats(request):
+    """
+    Dashboard statistics: transcribed cases, hours transcribed, transcriptions and chunks by status,
+    pending chunks and failures per day. Read from maintained counters, so the cost doesn't grow
+    with the archive.
+    """
+    return Response(dashboard())
+
+
+@api_view(['GET'])
+def search_transcripts(request):
+    """
+    Full-text search over transcribed and diarized chunks, best matches first.
+
+    `q` takes words (all must match), "quoted phrases" and prefix* terms; `transcription` limits the
+    search to one recording. Each result carries a highlighted snippet and the chunk's time offsets.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    transcription_id = request.query_params.get('transcription')
+    if transcription_id and not transcription_id.isdigit():
+        return Response({'error': 'transcription must be a transcription id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        results = SearchResults(query, int(transcription_id) if transcription_id else None)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(results, request)
+    except SearchNotSupported as e:
+        return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    except DatabaseError as e:
+        return Response({'error': f'Invalid search query: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    return paginator.get_paginated_response(page)
+
+
+class TranscriptionUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable upload of large recordings.
+
+    `create` starts an upload (filename, total_size, sha256, case fields); `append` writes one byte
+    range sent as the raw request body with a `Content-Range` header; `retrieve` reports how many
+    bytes have been received, which is where a client resumes after a dropped connection;
+    `finalize` verifies the checksum and creates the Transcription.
+    """
+    queryset = TranscriptionUpload.objects.all()
+    serializer_class = TranscriptionUploadSerializer
+    parser_classes = [JSONParser, FormParser, MultiPartParser]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if serializer.is_valid():
+            upload = serializer.save()
+            return Response({**self.get_serializer(upload).data, 'part_size': settings.UPLOAD_PART_SIZE}, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def append(self, request, pk=None):
+        """
+        Stream one part to disk. The body is read from `request.stream` and never parsed.
+        """
+        upload = self.get_object()
+        try:
+            start, length = parse_content_range(request.headers.get('Content-Range'))
+            if request.stream is None or int(request.headers.get('Content-Length') or 0) != length:
+                raise UploadError("Content-Length must match the Content-Range.")
+            offset = append_part(upload, request.stream, start, length)
+        except UploadOffsetMismatch as e:
+            return Response({'error': str(e), 'received_bytes': e.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'error': str(e), 'received_bytes': upload.received_bytes}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': upload.id, 'received_bytes': offset, 'total_size': upload.total_size})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """
+        Verify the received file and create its Transcription.
+        """
+        upload = self.get_object()
+        try:
+            transcription = finalize_upload(upload)
+        except UploadOffsetMismatch as e:
+            return Response({'error': str(e), 'received_bytes': e.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'id': transcription.id,
+            'message': 'Upload complete, transcription queued.',
+            'status': transcription.status,
+        }, status=status.HTTP_201_CREATED)
+
 
 class TranscriptionDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -90,12 +310,33 @@ class DiarizationDetailView(generics.RetrieveAPIView):
 
 
 
-class AudioChunkViewSet(viewsets.ModelViewSet):
+class AudioChunkViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     A viewset to handle creating, retrieving, and listing audio chunks.
+
+    The list is cursor-paginated and accepts `?fields=`, `?transcription=`, `?status=`
+    (comma-separated) and `?case_number=`.
     """
     queryset = AudioChunk.objects.all()
     serializer_class = AudioChunkSerializer
+    pagination_class = AudioChunkCursorPagination
+    deferred_fields = ('transcription_text', 'diarization_data')
+    always_deferred = ('transcription_words',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        if params.get('transcription'):
+            if not params['transcription'].isdigit():
+                raise ValidationError({'transcription': 'Expected a transcription id.'})
+            queryset = queryset.filter(transcription_id=params['transcription'])
+        if params.get('status'):
+            queryset = queryset.filter(status__in=_split_param(params['status']))
+        if params.get('case_number'):
+            queryset = queryset.filter(transcription__case_number=params['case_number'])
+        return queryset
 
     def create(self, request, *args, **kwargs):
         """
@@ -106,7 +347,7 @@ class AudioChunkViewSet(viewsets.ModelViewSet):
             audio_chunk = serializer.save()
             return Response({
                 'id': audio_chunk.id,
-                'transcription_id': audio_chunk.transcription.id,
+                'transcription_id': audio_chunk.transcription_id,
                 'chunk_index': audio_chunk.chunk_index,
                 'status': audio_chunk.status,
             }, status=status.HTTP_201_CREATED)
@@ -119,7 +360,7 @@ class AudioChunkViewSet(viewsets.ModelViewSet):
         chunk = self.get_object()
         return Response({
             'id': chunk.id,
-            'transcription_id': chunk.transcription.id,
+            'transcription_id': chunk.transcription_id,
             'chunk_index': chunk.chunk_index,
             'status': chunk.status,
             'transcription_text': chunk.transcription_text,
@@ -128,26 +369,65 @@ class AudioChunkViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         """
-        Return a list of audio chunks.
+        Return a page of audio chunks.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
-from django.shortcuts import render, get_object_or_404, redirect
-from transcription.models import Transcription
-from .casebrief_generation import generate_case_brief_from_transcription
+def case_brief_pdf(request, pk):
+    """
+    Stream the rendered case brief PDF of a transcription, or report where its generation stands.
+    """
+    case_brief = latest_case_brief(pk)
+    if is_pdf_current(case_brief):
+        return FileResponse(
+            case_brief.pdf_file.open('rb'),
+            as_attachment=True,
+            filename=f"case_brief_{case_brief.case_number or pk}.pdf",
+            content_type='application/pdf',
+        )
 
-def generate_case_brief_view(request, transcription_id):
-    transcription = get_object_or_404(Transcription, id=transcription_id)
+    job = PipelineJob.objects.filter(kind='brief', transcription_id=pk).order_by('-id').first()
+    if job and job.status in ('queued', 'running'):
+        return JsonResponse({'job_id': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+    if job and job.status == 'failed':
+        return JsonResponse({'job_id': job.id, 'status': job.status, 'error': job.last_error}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return JsonResponse({'error': 'No up-to-date case brief; POST to case-brief/ to generate it.'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Generate PDF file for the case brief
-    pdf_filename = f"case_brief_{transcription.case_number}.pdf"
-    image_path = "/home/student/Downloads/themis_logo.png"  # Optional: Path to an image if needed
-    
-    # Call the function to generate the case brief and save it as a PDF
-    generate_case_brief_from_transcription(transcription_id, pdf_filename, image_path)
 
-    # Redirect or render a success message (based on your requirement)
-    return redirect('case_brief_success')  # Redirect to a success page
+def case_briefs_zip(request):
+    """
+    Render the PDFs of several case briefs (`?ids=1,2,3`) in parallel and stream them back as a ZIP,
+    each one as soon as it is ready; timings.json at the end records how long each document took.
+    """
+    try:
+        ids = [int(value) for value in _split_param(request.GET.get('ids', ''))]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma-separated list of case brief ids.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not ids:
+        return JsonResponse({'error': 'ids is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > settings.CASE_BRIEF_BATCH_LIMIT:
+        return JsonResponse({'error': f'At most {settings.CASE_BRIEF_BATCH_LIMIT} case briefs per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    case_briefs = list(CaseBrief.objects.filter(id__in=ids).defer('filtered_transcript', 'extracted_fields').order_by('id'))
+    if not case_briefs:
+        return JsonResponse({'error': 'No such case briefs.'}, status=status.HTTP_404_NOT_FOUND)
+    response = StreamingHttpResponse(zip_case_brief_pdfs(render_case_briefs(case_briefs)), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="case_briefs.zip"'
+    return response
+
+
+def metrics_view(request):
+    """
+    Pipeline metrics of every web and worker process, in the Prometheus text format.
+
+    Only served to a scraper presenting METRICS_TOKEN as a bearer token.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404()
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), settings.METRICS_TOKEN.encode()):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
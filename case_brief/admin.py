@@ -1,10 +1,18 @@
 from django.contrib import admin
+from api.admin import ChangeListDeferMixin
 from case_brief.models import CaseBrief
 
 @admin.register(CaseBrief)
-class CaseBriefAdmin(admin.ModelAdmin):
+class CaseBriefAdmin(ChangeListDeferMixin, admin.ModelAdmin):
     # Define the fields to be displayed in the list view
     list_display = ['transcription', 'case_title', 'case_number', 'judge_name', 'created_at']
+    list_select_related = ['transcription']  # Transcription.__str__ is shown on every row
+    raw_id_fields = ['transcription']
+    # The list only shows the short fields; skip the transcript and the long extracted sections
+    changelist_deferred_fields = [
+        'filtered_transcript', 'charges', 'plea', 'verdict', 'sentence', 'mitigating_factors',
+        'aggravating_factors', 'legal_principles', 'precedents_cited', 'extracted_fields', 'transcription__transcription_text',
+    ]
     # Define which fields should be editable in the admin form
     fields = [
         'transcription',
@@ -26,8 +34,10 @@ class CaseBriefAdmin(admin.ModelAdmin):
         'mitigating_factors',
         'aggravating_factors',
         'legal_principles',
-        'precedents_cited'
+        'precedents_cited',
+        'pdf_file',
     ]
+    readonly_fields = ['pdf_file']
 
     # Enable editing fields directly in the list view (optional)
     list_editable = ['case_title', 'case_number', 'judge_name']
@@ -0,0 +1,94 @@
+import json
+import time
+import zipfile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from case_brief.generation import pdf_digest, pdf_name, record_pdf, render_brief_text
+from case_brief.render_pool import new_pool, render, shared_pool
+
+
+def render_case_briefs(case_briefs, processes=None, force=False):
+    """Renders the PDFs of many briefs across a pool of processes, yielding (case_brief, timing) as each is done.
+
+    Briefs whose PDF is already on disk are yielded straight away (unless `force`), and briefs sharing
+    a digest are rendered once. Each timing is {'id', 'pdf', 'rendered', 'seconds', 'error'}; the
+    database is only written from the calling process. Renders go to the process's shared pool,
+    unless `processes` asks for a pool of its own.
+    """
+    by_digest = {}
+    for case_brief in case_briefs:
+        by_digest.setdefault(pdf_digest(case_brief), []).append(case_brief)
+
+    def done(digest, result):
+        for case_brief in by_digest[digest]:
+            if not result['error']:
+                record_pdf(case_brief, digest)
+            yield case_brief, {
+                'id': case_brief.id,
+                'pdf': pdf_name(digest),
+                'rendered': result['rendered'],
+                'seconds': round(result['seconds'], 4),
+                'error': result['error'],
+            }
+
+    tasks = []
+    for digest, briefs in by_digest.items():
+        if not force and default_storage.exists(pdf_name(digest)):
+            yield from done(digest, {'rendered': False, 'seconds': 0.0, 'error': None})
+        else:
+            path = default_storage.path(pdf_name(digest))
+            tasks.append((digest, render_brief_text(briefs[0]), path, settings.CASE_BRIEF_LOGO_PATH or None, force))
+    if not tasks:
+        return
+
+    if not processes:
+        for result in shared_pool().imap_unordered(render, tasks):
+            yield from done(result['digest'], result)
+        return
+    with new_pool(min(processes, len(tasks))) as pool:
+        for result in pool.imap_unordered(render, tasks):
+            yield from done(result['digest'], result)
+
+
+class _ZipStream:
+    """A write-only file object that hands back whatever was written since the last `read_written`."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read_written(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def zip_case_brief_pdfs(rendered):
+    """Streams a ZIP of the PDFs in `rendered` ((case_brief, timing) pairs), each as soon as it's ready.
+
+    A timings.json entry with every document's timing (including failures) closes the archive.
+    """
+    stream = _ZipStream()
+    timings = []
+    started = time.perf_counter()
+    # PDFs are already compressed, so entries are stored; the stream isn't seekable, so sizes go in data descriptors
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for case_brief, timing in rendered:
+            timings.append(timing)
+            if not timing['error']:
+                filename = f"case_brief_{case_brief.case_number or case_brief.id}_{case_brief.id}.pdf"
+                archive.write(default_storage.path(timing['pdf']), filename.replace('/', '-'))
+                yield stream.read_written()
+        archive.writestr('timings.json', json.dumps({
+            'documents': timings,
+            'rendered': sum(timing['rendered'] for timing in timings),
+            'failed': sum(bool(timing['error']) for timing in timings),
+            'seconds': round(time.perf_counter() - started, 4),
+        }, indent=2))
+    yield stream.read_written()
@@ -0,0 +1,222 @@
+import hashlib
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from api.backends import call_backend, get_backend
+from api.cache import result_key
+from api.ratelimit import RateLimiter, RetryLater
+from transcription.assembly import drop_seam_overlap
+from transcription_chunks.models import AudioChunk
+
+# Bump when the prompts change, so cached partial results aren't reused
+PROMPT_VERSION = 1
+
+# Fields with a single value (a name, a place); partial results are merged by majority
+SINGLE_VALUE_FIELDS = {
+    'case_title': "the title of the case, e.g. 'Uganda v. John Okello'",
+    'case_number': "the case number",
+    'judge_name': "the name of the presiding judge",
+    'accused_name': "the name(s) of the accused",
+    'court_type': "the court, e.g. 'High Court of Uganda'",
+    'country': "the country",
+    'court_location': "the town or city the court sits in",
+    'date': "the date of the hearing or ruling",
+    'prosecutor_name': "the name of the prosecutor",
+    'defense_counsel_name': "the name of the defence counsel",
+}
+# Fields written as prose; partial results from several parts of the transcript are summarised together
+NARRATIVE_FIELDS = {
+    'charges': "the charges and the law they are brought under",
+    'plea': "the plea of the accused",
+    'verdict': "the verdict and the court's reasons",
+    'sentence': "the sentence handed down",
+    'mitigating_factors': "the mitigating factors raised",
+    'aggravating_factors': "the aggravating factors raised",
+    'legal_principles': "the legal principles the court applied",
+    'precedents_cited': "the cases and authorities cited",
+}
+EXTRACTED_FIELDS = [*SINGLE_VALUE_FIELDS, *NARRATIVE_FIELDS]
+
+MAP_PROMPT = (
+    "You are a court clerk preparing a case brief. Below is one part of a court transcript ({part} of {parts}). "
+    "Return a JSON object with exactly these keys, filled only from this part; use an empty string for anything "
+    "it does not mention:\n{fields}"
+)
+REDUCE_PROMPT = (
+    "You are a court clerk preparing a case brief. Below are notes on {description}, taken from different "
+    "parts of one court transcript. Merge them into one concise paragraph, without repeating anything. "
+    'Return a JSON object {{"{field}": "..."}}.'
+)
+
+# Shared by all threads of this process so concurrent extractions don't overload the API; the requests
+# per minute are limited across processes by the backend's token bucket (see api/ratelimit.py)
+llm_limiter = RateLimiter(max_concurrent=settings.LLM_MAX_CONCURRENT_REQUESTS)
+
+
+def estimate_tokens(text):
+    """Rough token count of English text (about four characters per token), without a tokenizer."""
+    return len(text) // 4 + 1
+
+
+def transcript_turns(transcription):
+    """Splits a transcript into speaker turns, in order: the diarized turns of each chunk where there
+    are any, its plain transcript otherwise. Text repeated on overlapping chunk seams is dropped."""
+    chunks = (
+        AudioChunk.objects.filter(transcription=transcription)
+        .order_by('chunk_index')
+        .values_list('transcription_text', 'diarization_data')
+    )
+    turns = []
+    for transcription_text, diarization_data in chunks:
+        chunk_turns = [
+            turn.strip() for turn in re.split(r'\n\s*\n', diarization_data or transcription_text or '') if turn.strip()
+        ]
+        if turns and chunk_turns and settings.CHUNK_OVERLAP_SECONDS:
+            max_words = max(5, int(settings.CHUNK_OVERLAP_SECONDS * 4))
+            chunk_turns[0] = drop_seam_overlap(turns[-1], chunk_turns[0], max_words=max_words)
+        turns.extend(turn for turn in chunk_turns if turn)
+    if not turns:  # Not chunked, or chunks already cleaned up: fall back to the assembled transcript
+        turns = [turn.strip() for turn in (transcription.transcription_text or '').split('\n') if turn.strip()]
+    return turns
+
+
+def split_windows(turns, max_tokens):
+    """Packs consecutive turns into windows of at most `max_tokens`; a longer turn is split on words."""
+    windows, current, current_tokens = [], [], 0
+    for turn in turns:
+        pieces = [turn]
+        if estimate_tokens(turn) > max_tokens:
+            words = turn.split()
+            per_piece = max(1, len(words) * max_tokens // estimate_tokens(turn))
+            pieces = [" ".join(words[i:i + per_piece]) for i in range(0, len(words), per_piece)]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                windows.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        windows.append("\n\n".join(current))
+    return windows
+
+
+def _complete_json(system_prompt, text):
+    """Asks the chat model for a JSON object, cached by prompt and text so a retried job isn't billed twice.
+
+    A failed call raises RetryLater: the brief job is requeued, and the windows already answered are
+    served from the cache when it runs again.
+    """
+    backend = get_backend('llm')
+    params = {**backend.cache_params, 'prompt': system_prompt, 'version': PROMPT_VERSION}
+    key = result_key('brief_extraction', hashlib.sha256(text.encode()).hexdigest(), params)
+    cache = caches['pipeline']
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    try:
+        with llm_limiter:
+            result = call_backend('llm', 'complete_json', system_prompt, text)
+    except RetryLater as e:
+        print(f"Error extracting case brief fields: {e}")
+        raise
+    cache.set(key, result)
+    return result
+
+
+def _clean(value):
+    if isinstance(value, list):
+        value = "; ".join(str(item) for item in value if item)
+    return str(value or '').strip()
+
+
+def _in_pool(func):
+    """Wraps `func` to run on a pool thread, closing the database connection it opened there (the rate
+    limiter and circuit breaker query the database); Django never closes a thread's connection by itself.
+    """
+    def run(args):
+        try:
+            return func(args)
+        finally:
+            connection.close()
+    return run
+
+
+def _map_window(args):
+    """Extracts every field from one window of the transcript."""
+    part, parts, window = args
+    fields = "\n".join(
+        f"- {name}: {description}" for name, description in {**SINGLE_VALUE_FIELDS, **NARRATIVE_FIELDS}.items()
+    )
+    result = _complete_json(MAP_PROMPT.format(part=part, parts=parts, fields=fields), window)
+    return {name: _clean(result.get(name)) for name in EXTRACTED_FIELDS}
+
+
+def _reduce_field(args):
+    """Merges the notes taken on a narrative field from several windows into one paragraph.
+
+    Notes that don't fit in one call are merged in groups first, and the group summaries merged again.
+    If the summaries stop fitting in fewer calls than the round before, they are joined as they are.
+    """
+    field, notes = args
+    prompt = REDUCE_PROMPT.format(description=NARRATIVE_FIELDS[field], field=field)
+    previous_groups = None
+    while True:
+        groups = split_windows(notes, settings.LLM_WINDOW_TOKENS)
+        if previous_groups is not None and len(groups) >= previous_groups:
+            return "\n\n".join(notes)  # Merging again wouldn't get any closer to one call
+        merged = [_clean(_complete_json(prompt, group).get(field)) for group in groups]
+        merged = [note for note in merged if note]
+        if len(groups) == 1 or len(merged) <= 1:
+            return merged[0] if merged else ''
+        notes, previous_groups = merged, len(groups)
+
+
+def extract_fields(transcription):
+    """Extracts the brief fields from a transcript of any length with map-reduce.
+
+    map: the transcript is split into windows of whole speaker turns that fit LLM_WINDOW_TOKENS, and
+    every window is asked for every field, at most LLM_MAX_CONCURRENT_REQUESTS at once.
+    reduce: single-value fields take the value most windows agree on; prose fields mentioned in several
+    windows are merged by one more call each, run concurrently too.
+
+    Returns `(fields, timings)`; fields nothing was found for are left out.
+    """
+    timings = {}
+    started = time.perf_counter()
+    windows = split_windows(transcript_turns(transcription), settings.LLM_WINDOW_TOKENS)
+    timings['split'] = time.perf_counter() - started
+    if not windows:
+        return {}, timings
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.LLM_MAX_CONCURRENT_REQUESTS)) as executor:
+        started = time.perf_counter()
+        partials = list(executor.map(_in_pool(_map_window), [(i + 1, len(windows), window) for i, window in enumerate(windows)]))
+        timings['map'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        fields = {}
+        for name in SINGLE_VALUE_FIELDS:
+            values = Counter(partial[name] for partial in partials if partial[name])
+            if values:
+                fields[name] = values.most_common(1)[0][0]  # Ties go to the earliest value
+        to_reduce = []
+        for name in NARRATIVE_FIELDS:
+            notes = list(dict.fromkeys(partial[name] for partial in partials if partial[name]))
+            if len(notes) == 1:
+                fields[name] = notes[0]
+            elif notes:
+                to_reduce.append((name, notes))
+        for (name, _), value in zip(to_reduce, executor.map(_in_pool(_reduce_field), to_reduce)):
+            if value:
+                fields[name] = value
+        timings['reduce'] = time.perf_counter() - started
+
+    timings['windows'] = len(windows)
+    timings['reduce_calls'] = len(to_reduce)
+    return fields, timings
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from django.conf import settings
+from django.core.files.storage import default_storage
+from case_brief.models import CaseBrief
+from transcription.models import Transcription
+
+# Bump when the way fields are extracted from a transcript changes, so existing briefs are re-extracted
+EXTRACTION_VERSION = 2
+# Bump when the PDF layout (render_brief_text / save_as_pdf) changes, so existing PDFs are re-rendered
+TEMPLATE_VERSION = 1
+
+# The brief fields printed in the ruling, in order, with their headings
+RULING_SECTIONS = [
+    ('charges', 'Charges'),
+    ('plea', 'Plea'),
+    ('verdict', 'Verdict'),
+    ('sentence', 'Sentence'),
+    ('mitigating_factors', 'Mitigating Factors'),
+    ('aggravating_factors', 'Aggravating Factors'),
+    ('legal_principles', 'Legal Principles'),
+    ('precedents_cited', 'Precedents Cited'),
+]
+BRIEF_FIELDS = [
+    'case_title', 'case_number', 'judge_name', 'accused_name', 'court_type', 'country', 'court_location',
+    'date', 'prosecutor_name', 'defense_counsel_name', *(name for name, _ in RULING_SECTIONS),
+]
+
+
+def source_digest(transcription_text):
+    """Hash of the inputs a brief's fields are extracted from."""
+    return hashlib.sha256(f"{EXTRACTION_VERSION}\n{transcription_text or ''}".encode()).hexdigest()
+
+
+def pdf_digest(case_brief):
+    """Hash of everything that ends up in a brief's PDF: its fields, the template and the logo."""
+    inputs = {
+        'template': TEMPLATE_VERSION,
+        'logo': settings.CASE_BRIEF_LOGO_PATH,
+        'fields': {name: getattr(case_brief, name) for name in BRIEF_FIELDS},
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _merge_extracted(case_brief, fields):
+    """Sets the extracted fields on the brief, except ones edited by hand since the last extraction."""
+    default = CaseBrief._meta.get_field('case_title').default
+    for name, value in fields.items():
+        current = getattr(case_brief, name)
+        if current in ('', default, case_brief.extracted_fields.get(name)):
+            setattr(case_brief, name, value)
+    case_brief.extracted_fields = fields
+
+
+def extract_case_brief(transcription, case_brief=None):
+    """Fills a CaseBrief for the transcription from its transcript (creating it if needed) and saves it."""
+    from api.backends import get_backend
+    from case_brief.extraction import extract_fields
+
+    case_brief = case_brief or CaseBrief(transcription=transcription)
+    if get_backend('llm').available:
+        started = time.perf_counter()
+        fields, timings = extract_fields(transcription)
+        _merge_extracted(case_brief, fields)
+        print(
+            f"Extracted {len(fields)} case brief fields for transcription {transcription.id} from "
+            f"{timings.get('windows', 0)} windows: split {timings['split']:.2f}s, map {timings.get('map', 0):.2f}s, "
+            f"reduce {timings.get('reduce', 0):.2f}s ({timings.get('reduce_calls', 0)} calls), "
+            f"total {time.perf_counter() - started:.2f}s"
+        )
+    else:
+        print(f"No LLM backend available: case brief fields of transcription {transcription.id} are not extracted")
+    # The recording's own case name and number take precedence over what was heard in it
+    case_brief.case_title = transcription.case_name or case_brief.case_title
+    case_brief.case_number = transcription.case_number or case_brief.case_number
+    case_brief.filtered_transcript = transcription.transcription_text or ''
+    case_brief.source_digest = source_digest(transcription.transcription_text)
+    case_brief.save()
+    return case_brief
+
+
+def render_brief_text(case_brief):
+    """Lays the brief fields out in the marked-up text `save_as_pdf` prints."""
+    header = [
+        f"THE REPUBLIC OF {case_brief.country}".upper(),
+        f"IN THE {case_brief.court_type} AT {case_brief.court_location}".upper(),
+        f"CASE NO. {case_brief.case_number}",
+        case_brief.case_title.upper(),
+        f"PROSECUTOR: {case_brief.prosecutor_name}",
+        f"DEFENCE COUNSEL: {case_brief.defense_counsel_name}",
+        f"ACCUSED: {case_brief.accused_name}",
+    ]
+    ruling = "\n".join(f"[b]{heading}[/b]\n{getattr(case_brief, name)}" for name, heading in RULING_SECTIONS)
+    footer = f"DATED, SIGNED AND DELIVERED {case_brief.date}\n\n{case_brief.judge_name}\nJUDGE"
+    return "\n".join(header) + "\nRULING ON SENTENCING\n" + ruling + "\n" + footer
+
+
+def pdf_name(digest):
+    return f"case_briefs/{digest}.pdf"
+
+
+def write_pdf(brief_text, name, overwrite=False):
+    """Renders marked-up brief text to the storage file `name`, unless it exists; returns whether it rendered."""
+    return write_pdf_file(brief_text, default_storage.path(name), settings.CASE_BRIEF_LOGO_PATH or None, overwrite)
+
+
+def write_pdf_file(brief_text, path, logo_path=None, overwrite=False):
+    """Renders marked-up brief text to the file at `path`, unless it exists; returns whether it rendered."""
+    from api import metrics
+    from api.utils import save_as_pdf
+
+    if not overwrite and os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Render to a temporary file first, so a concurrent reader never sees a partial PDF
+    fd, tmp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        with metrics.timed('pdf'):
+            save_as_pdf(brief_text, tmp_path, logo_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def record_pdf(case_brief, digest):
+    """Points the brief at the PDF rendered for `digest`."""
+    if case_brief.pdf_digest != digest:
+        CaseBrief.objects.filter(pk=case_brief.pk).update(pdf_file=pdf_name(digest), pdf_digest=digest)
+        case_brief.pdf_file, case_brief.pdf_digest = pdf_name(digest), digest
+    return case_brief
+
+
+def render_case_brief_pdf(case_brief):
+    """Renders the brief's PDF unless one for the same inputs exists, and records it on the brief.
+
+    PDFs are stored as case_briefs/<digest>.pdf, so identical briefs share a file and a brief whose
+    inputs haven't changed is never rendered twice.
+    """
+    digest = pdf_digest(case_brief)
+    write_pdf(render_brief_text(case_brief), pdf_name(digest))
+    return record_pdf(case_brief, digest)
+
+
+def latest_case_brief(transcription_id):
+    return CaseBrief.objects.filter(transcription_id=transcription_id).order_by('-created_at', '-id').first()
+
+
+def is_pdf_current(case_brief):
+    """Whether the brief has a rendered PDF matching its current fields."""
+    return bool(
+        case_brief and case_brief.pdf_file and case_brief.pdf_digest == pdf_digest(case_brief)
+        and default_storage.exists(case_brief.pdf_file.name)
+    )
+
+
+def generate_case_brief(transcription_id):
+    """Brings a transcription's case brief and its PDF up to date, doing only the steps whose inputs changed."""
+    transcription = Transcription.objects.get(id=transcription_id)
+    case_brief = latest_case_brief(transcription_id)
+    if case_brief is None or case_brief.source_digest != source_digest(transcription.transcription_text):
+        case_brief = extract_case_brief(transcription, case_brief)
+    if not is_pdf_current(case_brief):
+        render_case_brief_pdf(case_brief)
+    return case_brief
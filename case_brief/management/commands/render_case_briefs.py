@@ -0,0 +1,59 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from case_brief.batch import render_case_briefs, zip_case_brief_pdfs
+from case_brief.models import CaseBrief
+from transcription_chunks.benchmarks import latency_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the PDFs of case briefs across a pool of worker processes and reports how long each "
+        "document took. PDFs that are already up to date are skipped unless --force is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('case_brief_ids', nargs='*', type=int, help="Briefs to render (default: all).")
+        parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: one per CPU).")
+        parser.add_argument('--force', action='store_true', help="Re-render PDFs that already exist.")
+        parser.add_argument('--zip', dest='zip_path', help="Also write the PDFs, and their timings, to this ZIP file.")
+
+    def handle(self, *args, **options):
+        case_briefs = CaseBrief.objects.order_by('id')
+        if options['case_brief_ids']:
+            case_briefs = case_briefs.filter(id__in=options['case_brief_ids'])
+        case_briefs = list(case_briefs.defer('filtered_transcript', 'extracted_fields'))
+        if not case_briefs:
+            raise CommandError("No case briefs to render")
+
+        started = time.perf_counter()
+        timings = []
+
+        def report(rendered):
+            for case_brief, timing in rendered:
+                timings.append(timing)
+                state = f"failed: {timing['error']}" if timing['error'] else 'rendered' if timing['rendered'] else 'up to date'
+                self.stdout.write(f"Case brief {timing['id']}: {state} ({timing['seconds'] * 1000:.1f} ms)")
+                yield case_brief, timing
+
+        rendered = report(render_case_briefs(case_briefs, options['processes'], options['force']))
+        if options['zip_path']:
+            with open(options['zip_path'], 'wb') as zip_file:
+                for data in zip_case_brief_pdfs(rendered):
+                    zip_file.write(data)
+        else:
+            for _ in rendered:
+                pass
+        elapsed = time.perf_counter() - started
+
+        seconds = [timing['seconds'] for timing in timings if timing['rendered']]
+        summary = {
+            'documents': len(timings),
+            'rendered': len(seconds),
+            'failed': sum(bool(timing['error']) for timing in timings),
+            'seconds': round(elapsed, 2),
+            'documents_per_second': round(len(timings) / elapsed, 1),
+        }
+        if seconds:
+            summary['render_ms'] = latency_summary(seconds)
+        self.stdout.write(json.dumps(summary, indent=2))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('case_brief', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casebrief',
+            name='pdf_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='casebrief',
+            name='pdf_file',
+            field=models.FileField(blank=True, null=True, upload_to='case_briefs/'),
+        ),
+        migrations.AddField(
+            model_name='casebrief',
+            name='source_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
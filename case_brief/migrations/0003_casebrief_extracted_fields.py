@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('case_brief', '0002_casebrief_pdf_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casebrief',
+            name='extracted_fields',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -24,6 +24,16 @@ class CaseBrief(models.Model):
     legal_principles = models.TextField(blank=True, default=".......")
     precedents_cited = models.TextField(blank=True, default=".......")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Hash of the transcript (and extraction version) the fields were extracted from
+    source_digest = models.CharField(max_length=64, blank=True, default="")
+    # The field values the last extraction produced, so a re-extraction can tell them from hand edits
+    extracted_fields = models.JSONField(blank=True, default=dict)
+    # The rendered PDF, and the hash of the brief fields and template version it was rendered from
+    pdf_file = models.FileField(upload_to='case_briefs/', blank=True, null=True)
+    pdf_digest = models.CharField(max_length=64, blank=True, default="")
 
     def __str__(self):
+        # Don't query for the transcription just to print the brief (see AudioChunk.__str__)
+        if not CaseBrief.transcription.is_cached(self):
+            return f"Case Brief for Transcription {self.transcription_id}"
         return f"Case Brief for {self.transcription.case_name or 'Unknown Case'}"
@@ -0,0 +1,73 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import django
+from django.apps import apps
+from django.conf import settings
+
+# Imported by freshly spawned workers before Django is set up, so nothing here may import models at
+# module level; what the workers need from the rest of the project is imported after django.setup().
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def preload():
+    """Loads what every PDF needs (font metrics, the parsed logo) into this process, once."""
+    from fpdf import FPDF
+    from api.utils import _add_image
+
+    pdf = FPDF()
+    pdf.add_page()
+    for style in ('', 'B'):
+        for size in (12, 13, 14):
+            pdf.set_font("Times", style=style, size=size)
+    if settings.CASE_BRIEF_LOGO_PATH:
+        _add_image(pdf, settings.CASE_BRIEF_LOGO_PATH, x=0, y=0, w=40, h=40)
+
+
+def init_worker():
+    if not apps.ready:  # Workers are spawned: each starts from a fresh interpreter
+        django.setup()
+    preload()
+
+
+def render(task):
+    """Renders one PDF in a worker process; workers never touch the database."""
+    from case_brief.generation import write_pdf_file
+
+    digest, brief_text, path, logo_path, overwrite = task
+    started = time.perf_counter()
+    try:
+        rendered = write_pdf_file(brief_text, path, logo_path, overwrite)
+        error = None
+    except Exception as e:
+        rendered, error = False, str(e)
+    return {'digest': digest, 'rendered': rendered, 'seconds': time.perf_counter() - started, 'error': error}
+
+
+def new_pool(processes=None):
+    """Starts a pool of CASE_BRIEF_RENDER_PROCESSES (or `processes`) render workers.
+
+    Workers are spawned rather than forked: the web process runs request threads, and a fork
+    would copy whatever locks those threads held at that moment.
+    """
+    processes = processes or settings.CASE_BRIEF_RENDER_PROCESSES or os.cpu_count() or 1
+    return multiprocessing.get_context('spawn').Pool(processes, initializer=init_worker)
+
+
+def shared_pool():
+    """Returns this process's render pool, started on first use and shared by every request.
+
+    Concurrent batch downloads queue their documents on the same workers, so however many
+    requests arrive, at most CASE_BRIEF_RENDER_PROCESSES PDFs are rendered at once.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():  # A pool doesn't survive a fork of this process
+            _pool, _pool_pid = new_pool(), os.getpid()
+            atexit.register(_pool.terminate)
+        return _pool
@@ -1,3 +1,168 @@
-from django.test import TestCase
+import io
+import json
+import re
+import tempfile
+import zipfile
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from api.utils import save_as_pdf
+from case_brief.extraction import _reduce_field
+from case_brief.generation import extract_case_brief, generate_case_brief, is_pdf_current, latest_case_brief
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.queue import claim_next_job, run_job
 
-# Create your tests here.
+
+@override_settings(CASE_BRIEF_LOGO_PATH='')
+class CaseBriefGenerationTests(TestCase):
+    """Briefs and PDFs are generated by a queued job and only redone when their inputs change."""
+
+    def setUp(self):
+        media_root = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.transcription = Transcription.objects.create(
+            audio_file='audio_files/hearing.mp3', case_name='Uganda v. Okello', case_number='HCT-01',
+            status='completed', transcription_text='The accused pleaded guilty.', is_chunked=True,
+        )
+
+    def test_pdf_is_rendered_once_per_input(self):
+        with mock.patch('api.utils.save_as_pdf', wraps=save_as_pdf) as render:
+            first = generate_case_brief(self.transcription.id)
+            generate_case_brief(self.transcription.id)
+            self.assertEqual(render.call_count, 1)
+
+            first.verdict = 'Guilty'
+            first.save()
+            second = generate_case_brief(self.transcription.id)
+            self.assertEqual(render.call_count, 2)
+            self.assertEqual(second.id, first.id)
+            self.assertNotEqual(second.pdf_file.name, first.pdf_file.name)
+
+            Transcription.objects.filter(id=self.transcription.id).update(transcription_text='Amended transcript.')
+            third = generate_case_brief(self.transcription.id)
+            self.assertEqual(third.filtered_transcript, 'Amended transcript.')
+            self.assertEqual(third.verdict, 'Guilty')  # Fields filled in by hand are kept
+
+    def test_generation_job_and_download(self):
+        pdf_url = reverse('transcription-case-brief-pdf', args=[self.transcription.id])
+        self.assertEqual(self.client.get(pdf_url).status_code, 404)
+
+        response = self.client.post(reverse('transcription-case-brief', args=[self.transcription.id]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(pdf_url).status_code, 202)
+
+        self.assertTrue(run_job(claim_next_job('test-worker', ['brief'])))
+        response = self.client.get(pdf_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="case_brief_HCT-01.pdf"')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        response = self.client.post(reverse('transcription-case-brief', args=[self.transcription.id]))
+        self.assertEqual(response.json(), {'id': latest_case_brief(self.transcription.id).id, 'status': 'ready'})
+
+    def test_batch_render_streams_zip(self):
+        first = generate_case_brief(self.transcription.id)
+        other = Transcription.objects.create(
+            audio_file='audio_files/other.mp3', case_name='Uganda v. Mukasa', case_number='HCT-02', status='completed',
+        )
+        second = generate_case_brief(other.id)
+        second.verdict = 'Acquitted'  # Its PDF is now stale and is re-rendered by a worker process
+        second.save()
+
+        response = self.client.get(reverse('case-briefs-zip'), {'ids': f'{first.id},{second.id}'})
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            [f'case_brief_HCT-01_{first.id}.pdf', f'case_brief_HCT-02_{second.id}.pdf', 'timings.json'],
+        )
+        self.assertTrue(archive.read(f'case_brief_HCT-02_{second.id}.pdf').startswith(b'%PDF'))
+        timings = json.loads(archive.read('timings.json'))
+        self.assertEqual(timings['rendered'], 1)
+        second.refresh_from_db()
+        self.assertTrue(is_pdf_current(second))
+
+        second.verdict = 'Convicted'
+        second.save()
+        with mock.patch('case_brief.render_pool.new_pool', side_effect=AssertionError("started a second pool")):
+            response = self.client.get(reverse('case-briefs-zip'), {'ids': f'{second.id}'})
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))  # Rendered by the same workers
+        self.assertEqual(json.loads(archive.read('timings.json'))['rendered'], 1)
+
+
+@override_settings(OPENAI_API_KEY='test-key', LLM_WINDOW_TOKENS=20, CHUNK_OVERLAP_SECONDS=0, BACKEND_RATE_LIMITS={})
+class CaseBriefExtractionTests(TestCase):
+    """Long transcripts are split into windows whose partial results are merged into the brief."""
+
+    def setUp(self):
+        caches['pipeline'].clear()
+        self.transcription = Transcription.objects.create(
+            audio_file='audio_files/hearing.mp3', case_name='Uganda v. Okello', case_number='HCT-01',
+            status='completed', is_chunked=True,
+        )
+        turns = [
+            "Speaker 1: This is the High Court sitting at Gulu, Justice Namono presiding.",
+            "Speaker 2: The accused is charged with robbery under section 285.",
+            "Speaker 1: The accused pleads guilty to robbery.",
+            "Speaker 2: He is a first offender and remorseful.",
+            "Speaker 1: Justice Namono sentences him to five years.",
+        ]
+        for index, turn in enumerate(turns):
+            AudioChunk.objects.create(
+                transcription=self.transcription, chunk_index=index, status='diarized', diarization_data=f"{turn}\n\n",
+            )
+
+    def fake_completion(self, messages, **kwargs):
+        prompt, text = messages[0]['content'], messages[1]['content']
+        if 'Merge them' in prompt:  # reduce: join the notes
+            field = re.search(r'\{"(\w+)"', prompt).group(1)
+            answer = {field: " / ".join(text.split("\n\n"))}
+        else:
+            answer = {}
+            if 'Justice Namono' in text:
+                answer['judge_name'] = 'Namono'
+            if 'Gulu' in text:
+                answer.update(court_location='Gulu', judge_name='Justice Namono')
+            if 'robbery' in text:
+                answer['charges'] = 'Robbery' if 'charged' in text else 'Robbery, pleaded guilty'
+            if 'sentences' in text:
+                answer['sentence'] = 'Five years'
+        return {'choices': [{'message': {'content': json.dumps(answer)}}]}
+
+    def test_map_reduce_merges_partial_results(self):
+        with mock.patch('openai.ChatCompletion.create', side_effect=self.fake_completion) as create:
+            case_brief = extract_case_brief(self.transcription)
+        map_calls = sum('Merge them' not in call.kwargs['messages'][0]['content'] for call in create.call_args_list)
+        self.assertGreater(map_calls, 1)
+        self.assertEqual(create.call_count, map_calls + 1)  # Only charges is mentioned in several windows
+
+        case_brief.refresh_from_db()
+        self.assertEqual(case_brief.court_location, 'Gulu')
+        self.assertEqual(case_brief.sentence, 'Five years')
+        self.assertEqual(case_brief.charges, 'Robbery / Robbery, pleaded guilty')
+        self.assertEqual(case_brief.case_title, 'Uganda v. Okello')
+        self.assertEqual(case_brief.plea, '.......')  # Nothing found: the default stays
+
+        # A re-extraction (e.g. of an amended transcript) keeps hand edits and hits the result cache
+        case_brief.sentence = 'Five years and a fine'
+        case_brief.save()
+        with mock.patch('openai.ChatCompletion.create', side_effect=self.fake_completion) as create:
+            case_brief = extract_case_brief(self.transcription, case_brief)
+        self.assertEqual(create.call_count, 0)
+        self.assertEqual(case_brief.sentence, 'Five years and a fine')
+        self.assertEqual(case_brief.court_location, 'Gulu')
+
+    def test_reduce_stops_when_summaries_do_not_shrink(self):
+        notes = [f"The accused raised mitigating factor number {i} before the court." for i in range(6)]
+
+        def echo(prompt, text):
+            return {'mitigating_factors': text}  # A "summary" as long as its notes
+
+        with mock.patch('case_brief.extraction._complete_json', side_effect=echo) as complete:
+            merged = _reduce_field(('mitigating_factors', notes))
+        self.assertEqual(complete.call_count, 6)  # One round, not an endless loop
+        for note in notes:
+            self.assertIn(note, merged)
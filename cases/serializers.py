@@ -1,6 +1,6 @@
 # serializers.py
 
-from api import serializers
+from rest_framework import serializers
 from .models import Case
 
 class CaseSerializer(serializers.ModelSerializer):
@@ -2,11 +2,12 @@
 # views.py
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from .models import Case
+from stats.counters import transcribed_cases_count as read_transcribed_cases_count
 
 @api_view(['GET'])
 def transcribed_cases_count(request):
-    transcribed_cases_count = Case.objects.filter(is_transcribed=True).count()
+    # Maintained by the stats app instead of a COUNT(*) on every call
+    transcribed_cases_count = read_transcribed_cases_count()
     return Response({
         'success': True,
         'transcribed_cases': transcribed_cases_count
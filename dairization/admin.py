@@ -1,11 +1,15 @@
 from django.contrib import admin
 # from transcription_chunks.models import AudioChunk
+from api.admin import ChangeListDeferMixin
 from diarization.models import DiarizedSegment
 
 
 @admin.register(DiarizedSegment)
-class DiarizedSegmentAdmin(admin.ModelAdmin):
+class DiarizedSegmentAdmin(ChangeListDeferMixin, admin.ModelAdmin):
     list_display = ['transcription']  # Display the transcription and creation date
+    list_select_related = ['transcription']
+    raw_id_fields = ['transcription']
+    changelist_deferred_fields = ['diarization_data', 'transcription__transcription_text']
     search_fields = ['transcription__case_name', 'transcription__case_number']  # Search by transcription details
     readonly_fields = ['diarization_data']  # Make diarization_data read-only
 
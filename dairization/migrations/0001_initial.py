@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('transcription', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiarizedSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('diarization_data', models.TextField(blank=True, null=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('transcription', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='transcription.transcription')),
+            ],
+        ),
+    ]
@@ -12,4 +12,7 @@ class DiarizedSegment(models.Model):
     date_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
+        # Don't query for the transcription just to print the segment (see AudioChunk.__str__)
+        if not DiarizedSegment.transcription.is_cached(self):
+            return f"Diarized Segment for Transcription {self.transcription_id}"
         return f"Diarized Segment for {self.transcription.case_name or 'Audio'}"
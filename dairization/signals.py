@@ -12,12 +12,16 @@ def join_diarized_chunks(sender, instance, **kwargs):
     if instance.status == 'completed':
         try:
             with transaction.atomic():
-                # Fetch all completed and diarized chunks
-                chunks = AudioChunk.objects.filter(transcription=instance, status='diarized').order_by('chunk_index')
+                # Fetch the diarization of all diarized chunks, in one query and without the other columns
+                diarizations = list(
+                    AudioChunk.objects.filter(transcription=instance, status='diarized')
+                    .order_by('chunk_index')
+                    .values_list('diarization_data', flat=True)
+                )
 
-                if chunks.exists():
+                if diarizations:
                     # Join all diarized chunks together
-                    diarized_text = "\n".join(chunk.diarization_data for chunk in chunks)
+                    diarized_text = "\n".join(diarizations)
 
                     # Check if a DiarizedSegment already exists for this transcription
                     diarized_segment, created = DiarizedSegment.objects.get_or_create(
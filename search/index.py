@@ -0,0 +1,175 @@
+import re
+from django.db import connection, transaction
+from django.db.models import Q
+from transcription_chunks.models import AudioChunk
+
+SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS = '<mark>', '</mark>', '…'
+
+# The index lives in a raw table created by search/migrations/0001_search_index.py: search_chunk_fts
+# (an FTS5 table keyed by the chunk id) on SQLite, search_chunk_index (with a tsvector) on PostgreSQL
+
+
+class SearchNotSupported(Exception):
+    """Raised when the configured database has no full-text search backend here."""
+
+
+def _vendor():
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        raise SearchNotSupported(f"Full-text search is not available on {connection.vendor}")
+    return connection.vendor
+
+
+def indexable_chunks():
+    """Chunks that have text to search, whatever their status (a chunk whose diarization failed keeps its text)."""
+    return AudioChunk.objects.filter(Q(transcription_text__gt='') | Q(diarization_data__gt=''))
+
+
+def index_chunk(chunk_id):
+    """Adds a chunk to the search index, or refreshes it; chunks without text are removed instead."""
+    row = (
+        indexable_chunks().filter(pk=chunk_id)
+        .values_list('transcription_id', 'chunk_index', 'start_time', 'end_time', 'transcription__case_name',
+                     'transcription_text', 'diarization_data')
+        .first()
+    )
+    if row is None or not (row[5] or row[6]):
+        remove_chunks([chunk_id])
+        return False
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if _vendor() == 'sqlite':
+            # FTS5 has no upsert; replace the row in one transaction
+            cursor.execute("DELETE FROM search_chunk_fts WHERE rowid = %s", [chunk_id])
+            cursor.execute(
+                "INSERT INTO search_chunk_fts (rowid, transcription_id, chunk_index, start_time, end_time, case_name, "
+                "transcription_text, diarization_data) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                [chunk_id, *row],
+            )
+        else:
+            cursor.execute(
+                "INSERT INTO search_chunk_index (chunk_id, transcription_id, chunk_index, start_time, end_time, "
+                "case_name, transcription_text, diarization_data) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+                "ON CONFLICT (chunk_id) DO UPDATE SET transcription_id = EXCLUDED.transcription_id, "
+                "chunk_index = EXCLUDED.chunk_index, start_time = EXCLUDED.start_time, end_time = EXCLUDED.end_time, "
+                "case_name = EXCLUDED.case_name, transcription_text = EXCLUDED.transcription_text, "
+                "diarization_data = EXCLUDED.diarization_data",
+                [chunk_id, *row],
+            )
+    return True
+
+
+def reindex_transcription(transcription_id):
+    """Refreshes the indexed chunks of a transcription (e.g. after its case name changed); returns how many."""
+    return sum(
+        index_chunk(chunk_id)
+        for chunk_id in indexable_chunks().filter(transcription_id=transcription_id).values_list('id', flat=True)
+    )
+
+
+def remove_chunks(chunk_ids):
+    """Removes chunks from the search index."""
+    if not chunk_ids:
+        return
+    table, key = ('search_chunk_fts', 'rowid') if _vendor() == 'sqlite' else ('search_chunk_index', 'chunk_id')
+    placeholders = ', '.join(['%s'] * len(chunk_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", list(chunk_ids))
+
+
+def fts5_query(query):
+    """Turns what a user typed into an FTS5 query: quoted phrases stay phrases, every other word is
+    matched on its own (all of them must appear), and a trailing * makes a word a prefix."""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        text = phrase if phrase else word.rstrip('*')
+        text = text.replace('"', '').strip()
+        if text:
+            terms.append(f'"{text}"' + ('*' if word.endswith('*') else ''))
+    return ' '.join(terms)
+
+
+class SearchResults:
+    """Ranked chunk matches for a query, best first.
+
+    Supports len() and slicing so it can be handed to a paginator; each slice runs one query for just
+    that page, and snippets are only built for the rows on it.
+    """
+
+    def __init__(self, query, transcription_id=None):
+        self.vendor = _vendor()
+        self.query = fts5_query(query) if self.vendor == 'sqlite' else query
+        self.transcription_id = transcription_id
+        self._count = None
+
+    def _where(self):
+        if self.vendor == 'sqlite':
+            sql, params = "search_chunk_fts MATCH %s", [self.query]
+        else:
+            sql, params = "document @@ websearch_to_tsquery('english', %s)", [self.query]
+        if self.transcription_id is not None:
+            sql += " AND transcription_id = %s"
+            params.append(self.transcription_id)
+        return sql, params
+
+    def __len__(self):
+        if self._count is None:
+            if not self.query:
+                self._count = 0
+            else:
+                where, params = self._where()
+                table = 'search_chunk_fts' if self.vendor == 'sqlite' else 'search_chunk_index'
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, page):
+        if not isinstance(page, slice):
+            raise TypeError("SearchResults only supports slicing")
+        if not self.query:
+            return []
+        offset = page.start or 0
+        # Without an end, no LIMIT: -1 for SQLite, NULL (LIMIT ALL) for PostgreSQL
+        limit = page.stop - offset if page.stop is not None else (-1 if self.vendor == 'sqlite' else None)
+        where, params = self._where()
+
+        if self.vendor == 'sqlite':
+            # bm25() ranks better matches lower; a case name match counts most, diarization least
+            sql = (
+                "SELECT rowid, transcription_id, case_name, chunk_index, start_time, end_time, "
+                f"snippet(search_chunk_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '{SNIPPET_ELLIPSIS}', 16), "
+                "bm25(search_chunk_fts, 1.0, 0.5, 2.0) AS score "
+                f"FROM search_chunk_fts WHERE {where} ORDER BY score LIMIT %s OFFSET %s"
+            )
+        else:
+            sql = (
+                "SELECT chunk_id, transcription_id, case_name, chunk_index, start_time, end_time, "
+                "ts_headline('english', coalesce(transcription_text, diarization_data, ''), "
+                "websearch_to_tsquery('english', %s), "
+                f"'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, FragmentDelimiter={SNIPPET_ELLIPSIS}, "
+                "MaxFragments=2, MaxWords=16, MinWords=6'), score FROM ("
+                "SELECT *, ts_rank_cd(document, websearch_to_tsquery('english', %s)) AS score "
+                f"FROM search_chunk_index WHERE {where} ORDER BY score DESC LIMIT %s OFFSET %s"
+                ") page ORDER BY score DESC"
+            )
+            params = [self.query, self.query, *params]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit, offset])
+            rows = cursor.fetchall()
+
+        return [
+            {
+                'chunk_id': chunk_id,
+                'transcription_id': transcription_id,
+                'case_name': case_name,
+                'chunk_index': chunk_index,
+                'start_time': start_time,
+                'end_time': end_time,
+                'snippet': snippet,
+                'score': abs(score) if self.vendor == 'sqlite' else score,
+            }
+            for chunk_id, transcription_id, case_name, chunk_index, start_time, end_time, snippet, score in rows
+        ]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from search.index import index_chunk, indexable_chunks
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index from the transcribed chunks (e.g. for an existing archive)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'transcription_ids', nargs='*', type=int,
+            help="Only reindex the chunks of these transcriptions (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        chunks = indexable_chunks()
+        if options['transcription_ids']:
+            chunks = chunks.filter(transcription_id__in=options['transcription_ids'])
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM search_chunk_fts")
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute("TRUNCATE search_chunk_index")
+
+        indexed = 0
+        for chunk_id in chunks.values_list('id', flat=True).iterator(chunk_size=1000):
+            indexed += index_chunk(chunk_id)
+            if indexed and indexed % 1000 == 0:
+                self.stdout.write(f"Indexed {indexed} chunks...")
+        self.stdout.write(f"Indexed {indexed} chunks")
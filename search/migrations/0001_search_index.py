@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# The search index is a raw table rather than a model: an FTS5 virtual table on SQLite, keyed by the
+# chunk id (rowid) with the offsets stored alongside but not indexed; on PostgreSQL, a plain table whose
+# weighted tsvector is generated from the text columns and GIN-indexed. Other databases get no index.
+SCHEMA = {
+    'sqlite': (
+        [
+            """
+            CREATE VIRTUAL TABLE search_chunk_fts USING fts5(
+                transcription_text, diarization_data, case_name,
+                transcription_id UNINDEXED, chunk_index UNINDEXED, start_time UNINDEXED, end_time UNINDEXED,
+                tokenize = 'porter unicode61'
+            )
+            """,
+        ],
+        ["DROP TABLE IF EXISTS search_chunk_fts"],
+    ),
+    'postgresql': (
+        [
+            """
+            CREATE TABLE search_chunk_index (
+                chunk_id bigint PRIMARY KEY,
+                transcription_id bigint NOT NULL,
+                chunk_index integer NOT NULL,
+                start_time double precision,
+                end_time double precision,
+                case_name text,
+                transcription_text text,
+                diarization_data text,
+                document tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(case_name, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(transcription_text, '')), 'B') ||
+                    setweight(to_tsvector('english', coalesce(diarization_data, '')), 'C')
+                ) STORED
+            )
+            """,
+            "CREATE INDEX search_chunk_index_document ON search_chunk_index USING GIN (document)",
+            "CREATE INDEX search_chunk_index_transcription ON search_chunk_index (transcription_id)",
+        ],
+        ["DROP TABLE IF EXISTS search_chunk_index"],
+    ),
+}
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, SCHEMA.get(schema_editor.connection.vendor, ([], []))[0])
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, SCHEMA.get(schema_editor.connection.vendor, ([], []))[1])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,3 @@
+from django.db import models
+
+# The search index is not a model: see search/index.py (its table is created by search/migrations/0001).
@@ -0,0 +1,54 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.states import chunk_status_changed
+from search.index import SearchNotSupported, index_chunk, reindex_transcription, remove_chunks
+
+
+@receiver(chunk_status_changed, sender=AudioChunk)
+def index_transcribed_chunk(sender, chunk, new_status, **kwargs):
+    """Signal to add a chunk to the search index once it has text, and refresh it whenever its status changes.
+
+    A chunk that fails only in diarization keeps its transcript, so it stays searchable.
+    """
+    try:
+        index_chunk(chunk.id)
+    except SearchNotSupported:
+        pass
+    except Exception as e:
+        # The index can be rebuilt (`manage.py rebuild_search_index`); never fail the pipeline over it
+        print(f"Error indexing chunk {chunk.id} for search: {e}")
+
+
+@receiver(post_init, sender=Transcription)
+def remember_case_name(sender, instance, **kwargs):
+    """Remembers the case name a transcription was loaded with, to notice when a save changes it."""
+    instance._search_case_name = instance.__dict__.get('case_name', DEFERRED)
+
+
+@receiver(post_save, sender=Transcription)
+def reindex_renamed_transcription(sender, instance, created, update_fields=None, **kwargs):
+    """Signal to refresh a transcription's indexed chunks after its case name changed (it is stored with each chunk)."""
+    if update_fields is not None and 'case_name' not in update_fields:
+        return
+    previous = instance._search_case_name
+    instance._search_case_name = instance.__dict__.get('case_name', DEFERRED)
+    if created or previous is DEFERRED or previous == instance._search_case_name:
+        return
+    try:
+        reindex_transcription(instance.id)
+    except SearchNotSupported:
+        pass
+    except Exception as e:
+        print(f"Error reindexing transcription {instance.id} for search: {e}")
+
+
+@receiver(post_delete, sender=AudioChunk)
+def unindex_deleted_chunk(sender, instance, **kwargs):
+    """Signal to drop a deleted chunk from the search index."""
+    try:
+        remove_chunks([instance.id])
+    except SearchNotSupported:
+        pass
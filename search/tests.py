@@ -0,0 +1,61 @@
+from django.test import TestCase
+from django.urls import reverse
+from search.index import SearchResults, fts5_query
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.states import transition_chunk
+
+
+class SearchIndexTests(TestCase):
+    """Chunks are indexed as they complete and found by the /api/search/ endpoint."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3', case_name='Republic v. Okello')
+        self.chunks = [
+            AudioChunk.objects.create(transcription=self.transcription, chunk_index=i, start_time=i * 120.0, end_time=(i + 1) * 120.0)
+            for i in range(3)
+        ]
+
+    def complete(self, chunk, text, diarization=None):
+        transition_chunk(chunk, 'processing')
+        transition_chunk(chunk, 'completed', transcription_text=text)
+        if diarization:
+            transition_chunk(chunk, 'diarized', diarization_data=diarization)
+
+    def test_chunks_are_indexed_as_they_complete(self):
+        self.assertEqual(len(SearchResults('witness')), 0)
+        self.complete(self.chunks[0], "The court calls the first witness.")
+        self.complete(self.chunks[1], "The witness testified that the witness saw the accused.", "Speaker 1: The witness testified")
+        self.assertEqual(len(SearchResults('witness')), 2)
+        self.assertEqual(len(SearchResults('"first witness"')), 1)
+        self.assertEqual(len(SearchResults('testif*')), 1)
+        self.assertEqual(len(SearchResults('witness', transcription_id=self.transcription.id + 1)), 0)
+
+        transition_chunk(self.chunks[0], 'failed')  # Its diarization failed, but the transcript is still there
+        self.assertEqual(len(SearchResults('"first witness"')), 1)
+        self.chunks[0].delete()
+        self.assertEqual(len(SearchResults('witness')), 1)
+
+    def test_case_name_change_is_reindexed(self):
+        self.complete(self.chunks[0], "The court calls the first witness.")
+        self.assertEqual(len(SearchResults('okello')), 1)
+        transcription = Transcription.objects.get(pk=self.transcription.pk)
+        with self.assertNumQueries(1):  # Just the UPDATE: saving without a new case name doesn't reindex
+            transcription.save()
+        transcription.case_name = 'Republic v. Mugisha'
+        transcription.save()
+        self.assertEqual(len(SearchResults('okello')), 0)
+        self.assertEqual(len(SearchResults('mugisha')), 1)
+
+    def test_search_endpoint(self):
+        self.complete(self.chunks[2], "Counsel for the defence objected to the evidence.")
+        response = self.client.get(reverse('search'), {'q': 'objected'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        result = response.json()['results'][0]
+        self.assertEqual((result['chunk_index'], result['start_time'], result['end_time']), (2, 240.0, 360.0))
+        self.assertIn('<mark>objected</mark>', result['snippet'])
+        self.assertEqual(self.client.get(reverse('search')).status_code, 400)
+
+    def test_fts5_query(self):
+        self.assertEqual(fts5_query('okello "first witness" testif* a"b'), '"okello" "first witness" "testif"* "ab"')
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from stats.models import StatCounter
+
+
+@admin.register(StatCounter)
+class StatCounterAdmin(admin.ModelAdmin):
+    list_display = ('key', 'value')
+    search_fields = ('key',)
+    readonly_fields = ('key', 'value')  # Maintained by signals; fix drift with `manage.py rebuild_stats`
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from stats.models import StatCounter
+from transcription.models import Transcription
+
+DASHBOARD_CACHE_KEY = 'stats:dashboard'
+
+CHUNK_STATUSES = ['pending', 'processing', 'completed', 'diarized', 'failed']
+TRANSCRIPTION_STATUSES = [status for status, _ in Transcription.STATUS_CHOICES]
+
+
+def day_key(prefix, day=None):
+    """Key of a per-day counter, e.g. "failed_chunks:2024-10-01"."""
+    return f"{prefix}:{(day or timezone.localdate()).isoformat()}"
+
+
+def invalidate_dashboard():
+    """Drops the cached dashboard once the current transaction commits."""
+    transaction.on_commit(lambda: caches['stats'].delete(DASHBOARD_CACHE_KEY))
+
+
+def _increment(key, delta):
+    if StatCounter.objects.filter(key=key).update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            StatCounter.objects.create(key=key, value=delta)
+    except IntegrityError:  # Created by a concurrent writer in the meantime
+        StatCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def increment(changes):
+    """Adds each delta in `changes` ({key: delta}) to its counter with an atomic UPDATE ... SET value = value + delta."""
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    with transaction.atomic():
+        for key, delta in changes.items():
+            _increment(key, delta)
+    invalidate_dashboard()
+
+
+def read_counters(keys):
+    """Returns {key: value} for the given counters (missing ones are 0), in one primary-key lookup."""
+    values = dict(StatCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    return {key: values.get(key, 0) for key in keys}
+
+
+def _build_dashboard():
+    today = timezone.localdate()
+    days = [today - timedelta(days=n) for n in range(settings.STATS_FAILURE_DAYS)]
+    keys = [
+        'cases:transcribed',
+        'audio_ms:transcribed',
+        *(f"transcriptions:{status}" for status in TRANSCRIPTION_STATUSES),
+        *(f"chunks:{status}" for status in CHUNK_STATUSES),
+        *(day_key('failed_chunks', day) for day in days),
+        *(day_key('failed_transcriptions', day) for day in days),
+    ]
+    counters = read_counters(keys)
+    chunks = {status: counters[f"chunks:{status}"] for status in CHUNK_STATUSES}
+    return {
+        'transcribed_cases': counters['cases:transcribed'],
+        'hours_transcribed': round(counters['audio_ms:transcribed'] / 3_600_000, 2),
+        'transcriptions': {status: counters[f"transcriptions:{status}"] for status in TRANSCRIPTION_STATUSES},
+        'chunks': chunks,
+        'pending_chunks': chunks['pending'] + chunks['processing'],
+        'failures_by_day': [
+            {
+                'date': day.isoformat(),
+                'chunks': counters[day_key('failed_chunks', day)],
+                'transcriptions': counters[day_key('failed_transcriptions', day)],
+            }
+            for day in days
+        ],
+    }
+
+
+def dashboard():
+    """Returns the dashboard statistics, from the shared 'stats' cache when it is still valid.
+
+    A miss costs one indexed lookup of a fixed number of counters, however large the archive. Every
+    counter change invalidates the entry; STATS_CACHE_SECONDS bounds how stale it can get if a
+    rebuild races with an invalidation.
+    """
+    cache = caches['stats']
+    data = cache.get(DASHBOARD_CACHE_KEY)
+    if data is None:
+        data = _build_dashboard()
+        cache.set(DASHBOARD_CACHE_KEY, data, settings.STATS_CACHE_SECONDS)
+    return data
+
+
+def transcribed_cases_count():
+    """Returns the number of transcribed cases, from the dashboard counters."""
+    return dashboard()['transcribed_cases']
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import TruncDate
+from cases.models import Case
+from stats.counters import day_key, invalidate_dashboard
+from stats.models import StatCounter
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the dashboard counters from the tables. Run it once after installing the stats app, "
+        "and whenever rows were changed without signals (e.g. bulk updates)."
+    )
+
+    def handle(self, *args, **options):
+        counters = {'cases:transcribed': Case.objects.filter(is_transcribed=True).count()}
+        for status, count in Transcription.objects.values_list('status').annotate(n=Count('id')):
+            counters[f"transcriptions:{status}"] = count
+        for status, count in AudioChunk.objects.values_list('status').annotate(n=Count('id')):
+            counters[f"chunks:{status}"] = count
+
+        transcribed_seconds = AudioChunk.objects.filter(
+            status__in=['completed', 'diarized'], start_time__isnull=False, end_time__isnull=False,
+        ).aggregate(seconds=Sum(F('end_time') - F('start_time'), output_field=FloatField()))['seconds']
+        counters['audio_ms:transcribed'] = round((transcribed_seconds or 0) * 1000)
+
+        # Failure dates are not recorded, so per-day failures are rebuilt from when the row was last updated
+        # (transcriptions) or created (chunks)
+        for day, count in (
+            Transcription.objects.filter(status='failed').annotate(day=TruncDate('date_updated'))
+            .values_list('day').annotate(n=Count('id'))
+        ):
+            counters[day_key('failed_transcriptions', day)] = count
+        for day, count in (
+            AudioChunk.objects.filter(status='failed').annotate(day=TruncDate('created_at'))
+            .values_list('day').annotate(n=Count('id'))
+        ):
+            counters[day_key('failed_chunks', day)] = count
+
+        with transaction.atomic():
+            StatCounter.objects.all().delete()
+            StatCounter.objects.bulk_create(StatCounter(key=key, value=value) for key, value in counters.items())
+            invalidate_dashboard()
+        self.stdout.write(f"Rebuilt {len(counters)} counters")
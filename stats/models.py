@@ -0,0 +1,10 @@
+from django.db import models
+
+
+class StatCounter(models.Model):
+    """A dashboard counter, kept up to date by signals (see stats/signals.py) instead of COUNT(*) scans."""
+    key = models.CharField(max_length=100, primary_key=True)  # e.g. "chunks:failed" or "failed_chunks:2024-10-01"
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
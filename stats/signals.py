@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from cases.models import Case
+from stats.counters import day_key, increment
+from transcription.assembly import TRANSCRIBED_CHUNK_STATUSES
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.states import chunk_status_changed, transcription_status_changed
+
+# Status changes made through `transition_chunk` / `transition_transcription` are counted; a status
+# written any other way (e.g. a queryset update) is not, and `manage.py rebuild_stats` corrects it.
+
+
+@receiver(post_init, sender=Case)
+def remember_case_transcribed(sender, instance, **kwargs):
+    """Remembers whether a loaded case was transcribed, to count the change when it is saved."""
+    instance._stats_is_transcribed = instance.__dict__.get('is_transcribed')  # None if deferred
+
+
+@receiver(post_save, sender=Case)
+def count_transcribed_case(sender, instance, created, **kwargs):
+    """Signal to update the transcribed cases counter."""
+    previous = False if created else instance._stats_is_transcribed
+    if previous is not None and previous != instance.is_transcribed:
+        increment({'cases:transcribed': 1 if instance.is_transcribed else -1})
+    instance._stats_is_transcribed = instance.is_transcribed
+
+
+@receiver(post_delete, sender=Case)
+def uncount_deleted_case(sender, instance, **kwargs):
+    if instance.is_transcribed:
+        increment({'cases:transcribed': -1})
+
+
+@receiver(post_save, sender=Transcription)
+def count_new_transcription(sender, instance, created, **kwargs):
+    if created:
+        increment({f"transcriptions:{instance.status}": 1})
+
+
+@receiver(transcription_status_changed, sender=Transcription)
+def count_transcription_status(sender, transcription, old_status, new_status, **kwargs):
+    """Signal to move a transcription between the per-status counters."""
+    changes = {f"transcriptions:{old_status}": -1, f"transcriptions:{new_status}": 1}
+    if new_status == 'failed':
+        changes[day_key('failed_transcriptions')] = 1
+    increment(changes)
+
+
+@receiver(post_delete, sender=Transcription)
+def uncount_deleted_transcription(sender, instance, **kwargs):
+    increment({f"transcriptions:{instance.status}": -1})
+
+
+def _transcribed_ms(chunk, status):
+    """The audio a chunk adds to `audio_ms:transcribed` while it has `status` (as `rebuild_stats` counts it)."""
+    if status not in TRANSCRIBED_CHUNK_STATUSES or chunk.start_time is None or chunk.end_time is None:
+        return 0
+    return round((chunk.end_time - chunk.start_time) * 1000)
+
+
+@receiver(post_save, sender=AudioChunk)
+def count_new_chunk(sender, instance, created, **kwargs):
+    if created:
+        increment({f"chunks:{instance.status}": 1, 'audio_ms:transcribed': _transcribed_ms(instance, instance.status)})
+
+
+@receiver(chunk_status_changed, sender=AudioChunk)
+def count_chunk_status(sender, chunk, old_status, new_status, **kwargs):
+    """Signal to move a chunk between the per-status counters, and count failures and transcribed audio.
+
+    The transcribed audio follows the same status changes, so a chunk that fails after it was
+    transcribed (completed -> failed) takes its audio back out, and puts it back if it completes again.
+    """
+    changes = {
+        f"chunks:{old_status}": -1,
+        f"chunks:{new_status}": 1,
+        'audio_ms:transcribed': _transcribed_ms(chunk, new_status) - _transcribed_ms(chunk, old_status),
+    }
+    if new_status == 'failed':
+        changes[day_key('failed_chunks')] = 1
+    increment(changes)
+
+
+@receiver(post_delete, sender=AudioChunk)
+def uncount_deleted_chunk(sender, instance, **kwargs):
+    increment({f"chunks:{instance.status}": -1, 'audio_ms:transcribed': -_transcribed_ms(instance, instance.status)})
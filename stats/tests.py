@@ -0,0 +1,80 @@
+import io
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from cases.models import Case
+from stats.counters import dashboard
+from stats.models import StatCounter
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.states import transition_chunk, transition_transcription
+
+
+class DashboardStatsTests(TestCase):
+    """The counters follow the pipeline through signals and agree with a full recount."""
+
+    def setUp(self):
+        caches['stats'].clear()
+
+    def run_pipeline(self):
+        judge = get_user_model().objects.create_user('judge')
+        Case.objects.create(judge=judge, title='Uganda v. Okello', is_transcribed=True)
+        case = Case.objects.create(judge=judge, title='Uganda v. Mugisha')
+        case.is_transcribed = True
+        case.save()
+        Case.objects.create(judge=judge, title='Uganda v. Achieng')
+
+        transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3')
+        transition_transcription(transcription, 'chunking')
+        chunks = [
+            AudioChunk.objects.create(transcription=transcription, chunk_index=i, start_time=i * 90.0, end_time=(i + 1) * 90.0)
+            for i in range(4)
+        ]
+        transition_transcription(transcription, 'in_progress')
+        for chunk in chunks[:3]:
+            transition_chunk(chunk, 'processing')
+            transition_chunk(chunk, 'completed', transcription_text='text')
+        transition_chunk(chunks[0], 'diarized', diarization_data='Speaker 0: text')
+        transition_chunk(chunks[1], 'failed')
+        chunks[2].delete()
+
+    def transcribed_ms(self):
+        return StatCounter.objects.filter(key='audio_ms:transcribed').values_list('value', flat=True).first()
+
+    def test_counters_follow_the_pipeline(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_pipeline()
+        stats = dashboard()
+        self.assertEqual(stats['transcribed_cases'], 2)
+        self.assertEqual(stats['transcriptions']['in_progress'], 1)
+        self.assertEqual(stats['chunks'], {'pending': 1, 'processing': 0, 'completed': 0, 'diarized': 1, 'failed': 1})
+        self.assertEqual(stats['pending_chunks'], 1)
+        self.assertEqual(stats['hours_transcribed'], round(90 / 3600, 2))  # One failed, one deleted
+        self.assertEqual(stats['failures_by_day'][0]['chunks'], 1)
+
+        response = self.client.get(reverse('transcribed-cases'))
+        self.assertEqual(response.json()['transcribed_cases'], 2)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('dashboard-stats'))
+
+    def test_rebuild_matches_incremental_counts(self):
+        self.run_pipeline()
+        incremental = {key: value for key, value in StatCounter.objects.values_list('key', 'value') if value}
+        call_command('rebuild_stats', stdout=io.StringIO())
+        rebuilt = {key: value for key, value in StatCounter.objects.values_list('key', 'value') if value}
+        self.assertEqual(incremental, rebuilt)
+
+    def test_transcribed_audio_follows_failures(self):
+        transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3')
+        chunk = AudioChunk.objects.create(transcription=transcription, chunk_index=0, start_time=0.0, end_time=90.0)
+        transition_chunk(chunk, 'processing')
+        transition_chunk(chunk, 'completed', transcription_text='text')
+        self.assertEqual(self.transcribed_ms(), 90_000)
+        transition_chunk(chunk, 'failed')  # Diarization failed
+        self.assertEqual(self.transcribed_ms(), 0)
+        transition_chunk(chunk, 'completed')  # Retried
+        self.assertEqual(self.transcribed_ms(), 90_000)
+        transition_chunk(chunk, 'diarized', diarization_data='Speaker 1: text')
+        self.assertEqual(self.transcribed_ms(), 90_000)
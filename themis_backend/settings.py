@@ -10,7 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import json
+import os
 from pathlib import Path
+from dotenv import load_dotenv, find_dotenv
+
+# Loaded first, since the database settings below are read from the environment too
+ENV_FILE = find_dotenv()
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +51,8 @@ INSTALLED_APPS = [
     "case_brief.apps.CaseBriefConfig",
     "api",
     "cases",
+    "search.apps.SearchConfig",
+    "stats.apps.StatsConfig",
     "rest_framework",
     "corsheaders",
 ]
@@ -81,12 +91,43 @@ WSGI_APPLICATION = "themis_backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# db_engine=postgresql for production; the default SQLite mode is for a single box
+DB_ENGINE = os.getenv("db_engine", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("db_name", "themis"),
+            "USER": os.getenv("db_user", "postgres"),
+            "PASSWORD": os.getenv("db_password", ""),
+            "HOST": os.getenv("db_host", "localhost"),
+            "PORT": os.getenv("db_port", "5432"),
+            # Keep connections open across requests and jobs instead of reconnecting every time,
+            # and check them before reuse so a restarted server doesn't fail the next request
+            "CONN_MAX_AGE": int(os.getenv("db_conn_max_age", "600")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "connect_timeout": int(os.getenv("db_connect_timeout", "10")),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("db_name", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # WAL lets readers run alongside the single writer; with synchronous=NORMAL a commit
+                # doesn't wait for an fsync (still safe against corruption in WAL mode)
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+                # Take the write lock when a transaction starts, so concurrent writers queue on the
+                # busy timeout instead of failing with "database is locked" on lock upgrade
+                "transaction_mode": "IMMEDIATE",
+                "timeout": int(os.getenv("db_busy_timeout", "20")),  # Seconds to wait for the write lock
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -133,13 +174,151 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 
-import os
-from dotenv import load_dotenv, find_dotenv
-
-ENV_FILE = find_dotenv()
-if ENV_FILE:
-    load_dotenv(ENV_FILE)
-
 AAI_KEY = os.getenv("aai_key", "")
 HF_AUTH_TOKEN = os.getenv("hf_auth_token", "")
-OPENAI_API_KEY = os.getenv("openai_api_key", "")
\ No newline at end of file
+OPENAI_API_KEY = os.getenv("openai_api_key", "")
+
+# Background pipeline (see `manage.py run_pipeline_workers`)
+PIPELINE_WORKERS = int(os.getenv("pipeline_workers", "2"))
+PIPELINE_POLL_INTERVAL = float(os.getenv("pipeline_poll_interval", "2"))
+PIPELINE_JOB_MAX_ATTEMPTS = int(os.getenv("pipeline_job_max_attempts", "3"))
+PIPELINE_WORKER_THREADS = int(os.getenv("pipeline_worker_threads", "4"))
+
+# Whisper API limits: requests per minute across all workers (see BACKEND_RATE_LIMITS), and calls in
+# flight at once per worker process (0 disables a limit)
+WHISPER_REQUESTS_PER_MINUTE = int(os.getenv("whisper_requests_per_minute", "50"))
+WHISPER_MAX_CONCURRENT_REQUESTS = int(os.getenv("whisper_max_concurrent_requests", "8"))
+
+# Length of the audio chunks sent for transcription, in seconds
+CHUNK_SECONDS = int(os.getenv("chunk_seconds", "120"))
+# Cuts are moved to the closest pause within this many seconds of the target length (0 disables)
+CHUNK_SILENCE_WINDOW_SECONDS = float(os.getenv("chunk_silence_window_seconds", "15"))
+CHUNK_SILENCE_NOISE_DB = float(os.getenv("chunk_silence_noise_db", "-35"))
+CHUNK_MIN_SILENCE_SECONDS = float(os.getenv("chunk_min_silence_seconds", "0.4"))
+# Audio shared by consecutive chunks; repeated words are removed when the transcript is assembled
+CHUNK_OVERLAP_SECONDS = float(os.getenv("chunk_overlap_seconds", "0"))
+
+# pyannote pipeline used for speaker diarization, loaded lazily by `api.model_registry`
+DIARIZATION_MODEL = os.getenv("diarization_model", "pyannote/speaker-diarization-3.1")
+
+# Transcription and diarization results, keyed by a hash of the chunk audio (see `api.cache`).
+# The file cache is shared by the worker processes of a host and culled past MAX_ENTRIES.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "pipeline": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("pipeline_cache_dir", str(BASE_DIR / "cache" / "pipeline")),
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("pipeline_cache_max_entries", "20000")),
+            "CULL_FREQUENCY": 4,
+        },
+    },
+    # Progress version tokens and snapshots, shared by the web and pipeline worker processes
+    "progress": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("progress_cache_dir", str(BASE_DIR / "cache" / "progress")),
+        "TIMEOUT": 24 * 60 * 60,
+    },
+    # The dashboard statistics, invalidated by every counter change (see stats/counters.py)
+    "stats": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("stats_cache_dir", str(BASE_DIR / "cache" / "stats")),
+    },
+}
+
+# The tests swap these caches for in-memory ones (and METRICS_DIR for a temporary directory), so
+# running them never clears or writes to the ones on disk
+TEST_RUNNER = 'themis_backend.test_runner.TestRunner'
+
+# A running job whose worker has not sent a heartbeat for this long is considered abandoned and requeued
+PIPELINE_JOB_LEASE_SECONDS = int(os.getenv("pipeline_job_lease_seconds", "60"))
+
+# Encoding of the chunk files, used both for storage and for the Whisper upload: flac, opus or wav
+CHUNK_AUDIO_FORMAT = os.getenv("chunk_audio_format", "flac")
+CHUNK_SAMPLE_RATE = int(os.getenv("chunk_sample_rate", "16000"))
+CHUNK_CHANNELS = int(os.getenv("chunk_channels", "1"))
+
+# Resumable uploads: parts are streamed to disk in blocks of UPLOAD_BLOCK_SIZE bytes, and clients are
+# told to send parts of about UPLOAD_PART_SIZE bytes
+UPLOAD_PART_SIZE = int(os.getenv("upload_part_size", str(8 * 1024 * 1024)))
+UPLOAD_BLOCK_SIZE = int(os.getenv("upload_block_size", str(1024 * 1024)))
+# A part still being written after this long is taken to be abandoned, and another part may replace it
+UPLOAD_PART_TIMEOUT_SECONDS = int(os.getenv("upload_part_timeout_seconds", "600"))
+
+# Progress endpoints: how often a waiting request re-checks the version token, how long a long-poll
+# waits for a change, and how long an event stream stays open before the browser has to reconnect.
+# Waiting holds a worker thread, so each process lets at most PROGRESS_MAX_WAITERS requests wait at
+# once; the others are asked to retry after PROGRESS_BUSY_RETRY_SECONDS
+PROGRESS_POLL_INTERVAL = float(os.getenv("progress_poll_interval", "0.5"))
+PROGRESS_LONG_POLL_SECONDS = int(os.getenv("progress_long_poll_seconds", "25"))
+PROGRESS_STREAM_SECONDS = int(os.getenv("progress_stream_seconds", "300"))
+PROGRESS_MAX_WAITERS = int(os.getenv("progress_max_waiters", "16"))
+PROGRESS_BUSY_RETRY_SECONDS = int(os.getenv("progress_busy_retry_seconds", "5"))
+
+# Page size of the cursor-paginated list endpoints (clients may ask for up to API_MAX_PAGE_SIZE)
+API_PAGE_SIZE = int(os.getenv("api_page_size", "50"))
+API_MAX_PAGE_SIZE = int(os.getenv("api_max_page_size", "200"))
+
+# Dashboard statistics: how many days of failures to report, and how long a cached dashboard may live
+STATS_FAILURE_DAYS = int(os.getenv("stats_failure_days", "30"))
+STATS_CACHE_SECONDS = int(os.getenv("stats_cache_seconds", "60"))
+
+# Logo printed at the top of case brief PDFs (optional)
+CASE_BRIEF_LOGO_PATH = os.getenv("case_brief_logo_path", "")
+
+# Batch PDF rendering: worker processes (0 means one per CPU), and the most briefs one API request may ask for
+CASE_BRIEF_RENDER_PROCESSES = int(os.getenv("case_brief_render_processes", "0"))
+CASE_BRIEF_BATCH_LIMIT = int(os.getenv("case_brief_batch_limit", "200"))
+
+# Case brief extraction: the chat model, the prompt tokens of transcript per call (transcripts longer
+# than that are split and the partial results merged), and its API limits as for Whisper (0 disables a limit)
+LLM_MODEL = os.getenv("llm_model", "gpt-4o-mini")
+LLM_WINDOW_TOKENS = int(os.getenv("llm_window_tokens", "6000"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("llm_requests_per_minute", "60"))
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv("llm_max_concurrent_requests", "4"))
+
+# Implementations of the external services, see api/backends.py. Set e.g. asr_backend=api.backends.FakeASRBackend
+# and asr_backend_options='{"profile": "whisper", "seed": 1}' to run the pipeline offline.
+PIPELINE_BACKENDS = {
+    kind: {
+        'BACKEND': os.getenv(f"{kind}_backend", default),
+        'OPTIONS': json.loads(os.getenv(f"{kind}_backend_options", "{}")),
+    }
+    for kind, default in [
+        ('asr', 'api.backends.WhisperBackend'),
+        ('diarization', 'api.backends.PyannoteBackend'),
+        ('llm', 'api.backends.OpenAIChatBackend'),
+    ]
+}
+
+# /metrics: each process writes its counters and histograms to METRICS_DIR every METRICS_FLUSH_SECONDS
+METRICS_DIR = os.getenv("metrics_dir", str(BASE_DIR / "cache" / "metrics"))
+METRICS_FLUSH_SECONDS = float(os.getenv("metrics_flush_seconds", "5"))
+# A process file not rewritten for this long is treated as left by an exited process, and compacted
+METRICS_STALE_SECONDS = float(os.getenv("metrics_stale_seconds", "3600"))
+# Prometheus must send it as `Authorization: Bearer <token>`; while it is empty, /metrics answers 404
+METRICS_TOKEN = os.getenv("metrics_token", "")
+
+# Request budgets of the external backends, shared by every worker process through the database (see
+# api/ratelimit.py): requests per minute (0 disables the limit) and how many may be sent at once after
+# an idle spell. A call whose token frees up within RATE_LIMIT_MAX_WAIT_SECONDS waits for it; later
+# ones are requeued.
+BACKEND_RATE_LIMITS = {
+    'asr': {'per_minute': WHISPER_REQUESTS_PER_MINUTE, 'burst': int(os.getenv("whisper_burst", "5"))},
+    'diarization': {'per_minute': 0},  # A local model
+    'llm': {'per_minute': LLM_REQUESTS_PER_MINUTE, 'burst': int(os.getenv("llm_burst", "5"))},
+}
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("rate_limit_max_wait_seconds", "2"))
+
+# Failed calls are retried by requeueing the job after a random wait of up to RETRY_BASE_SECONDS * 2**attempt
+# (at most RETRY_MAX_SECONDS), or after the Retry-After of a rate-limited call
+RETRY_BASE_SECONDS = float(os.getenv("retry_base_seconds", "2"))
+RETRY_MAX_SECONDS = float(os.getenv("retry_max_seconds", "300"))
+
+# Circuit breaker: after this many failed calls in a row, calls to a backend (and the jobs making
+# them) are paused for CIRCUIT_COOLDOWN_SECONDS, then one probe call decides whether they resume
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("circuit_failure_threshold", "5"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("circuit_cooldown_seconds", "60"))
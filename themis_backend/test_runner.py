@@ -0,0 +1,32 @@
+import atexit
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests against in-memory caches and a temporary metrics directory, so the tests never
+    read, write or clear the cached results, progress, statistics and metrics on disk."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Metrics are flushed when the process exits, after the tests are torn down, so the temporary
+        # directory stays in place until then; worker processes spawned by the tests inherit it too
+        metrics_dir = tempfile.mkdtemp()
+        atexit.register(shutil.rmtree, metrics_dir, ignore_errors=True)
+        os.environ['metrics_dir'] = metrics_dir
+        settings.METRICS_DIR = metrics_dir
+
+        caches = {
+            alias: {**config, 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+            for alias, config in settings.CACHES.items()
+        }
+        self._caches = override_settings(CACHES=caches)
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
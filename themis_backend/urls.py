@@ -17,9 +17,11 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import include, path
+from api.views import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('', include('cases.urls')),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,8 +1,18 @@
 # admin.py in your app (e.g., transcription/admin.py)
 from django.contrib import admin
+from api.admin import ChangeListDeferMixin
 from .models import Transcription
 
 @admin.register(Transcription)
-class TranscriptionAdmin(admin.ModelAdmin):
+class TranscriptionAdmin(ChangeListDeferMixin, admin.ModelAdmin):
     list_display = ['case_name','case_number','status', 'audio_file', 'date_created']
+    changelist_deferred_fields = ['transcription_text']
     readonly_fields = ['transcription_text']  # Make transcription_text read-only
+
+from .models import TranscriptionUpload
+
+@admin.register(TranscriptionUpload)
+class TranscriptionUploadAdmin(admin.ModelAdmin):
+    list_display = ['id', 'filename', 'case_name', 'status', 'received_bytes', 'total_size', 'date_updated']
+    list_filter = ['status']
+    readonly_fields = ['sha256', 'received_bytes', 'transcription']
@@ -0,0 +1,77 @@
+import re
+from django.conf import settings
+
+
+def _normalize(word):
+    """Lower-cases a word and strips punctuation so the same word matches across chunks."""
+    return re.sub(r"[^\w']", "", word).lower()
+
+
+def drop_seam_overlap(previous_text, next_text, max_words=30, min_words=2, max_skip=2):
+    """Removes from the start of `next_text` the words that repeat the end of `previous_text`.
+
+    Looks for the longest run of (at least `min_words`) words that ends `previous_text` and starts
+    `next_text`, allowing up to `max_skip` leading words of `next_text` that Whisper may have
+    mangled because they were cut mid-word at the chunk boundary.
+    """
+    previous_words = [_normalize(word) for word in previous_text.split()[-max_words:]]
+    next_raw_words = next_text.split()
+    next_words = [_normalize(word) for word in next_raw_words[:max_words + max_skip]]
+
+    for size in range(min(len(previous_words), len(next_words), max_words), min_words - 1, -1):
+        tail = previous_words[-size:]
+        for skip in range(0, max_skip + 1):
+            if next_words[skip:skip + size] == tail:
+                return " ".join(next_raw_words[skip + size:])
+    return next_text
+
+
+def stitch_chunk_texts(texts, overlap_seconds=0):
+    """Joins chunk transcripts (in chunk order), de-duplicating words repeated on overlapping seams."""
+    stitched = []
+    previous = None
+    for text in texts:
+        if not text:
+            continue
+        if previous is not None and overlap_seconds:
+            # Roughly three words are spoken per second, leave some slack
+            text = drop_seam_overlap(previous, text, max_words=max(5, int(overlap_seconds * 4)))
+        if text:
+            stitched.append(text)
+            previous = text
+    return "\n".join(stitched)
+
+
+TRANSCRIBED_CHUNK_STATUSES = ['completed', 'diarized']
+
+
+def assemble_transcription_text(transcription):
+    """Builds the transcript of a recording from its chunk transcripts, in chunk order."""
+    from transcription_chunks.models import AudioChunk
+
+    texts = (
+        AudioChunk.objects
+        .filter(transcription=transcription)
+        .order_by('chunk_index')
+        .values_list('transcription_text', flat=True)
+    )
+    return stitch_chunk_texts(texts, settings.CHUNK_OVERLAP_SECONDS)
+
+
+def assemble_transcription_prefix(transcription):
+    """Builds the transcript of the leading run of transcribed chunks of a recording still in progress.
+
+    Chunks finish out of order, so only chunks 0..k-1 are included when chunk k is not transcribed
+    yet; the returned text only ever grows as more chunks complete. Returns `(text, chunk_count)`.
+    """
+    from transcription_chunks.models import AudioChunk
+
+    chunks = AudioChunk.objects.filter(transcription=transcription).order_by('chunk_index')
+    prefix_length = 0
+    for index, status in chunks.values_list('chunk_index', 'status'):
+        if index != prefix_length or status not in TRANSCRIBED_CHUNK_STATUSES:
+            break
+        prefix_length += 1
+
+    texts = chunks.filter(chunk_index__lt=prefix_length).values_list('transcription_text', flat=True)
+    return stitch_chunk_texts(texts, settings.CHUNK_OVERLAP_SECONDS), prefix_length
@@ -0,0 +1,211 @@
+import csv
+import io
+import re
+import ffmpeg
+from django.conf import settings
+
+
+SILENCE_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+# File extension and ffmpeg encoder options of each supported CHUNK_AUDIO_FORMAT
+CHUNK_FORMATS = {
+    'flac': ('flac', {'acodec': 'flac'}),
+    'opus': ('ogg', {'acodec': 'libopus', 'audio_bitrate': '32k', 'application': 'voip'}),
+    'wav': ('wav', {'acodec': 'pcm_s16le'}),
+}
+
+
+def chunk_extension():
+    """Returns the file extension of chunks in the configured CHUNK_AUDIO_FORMAT."""
+    return CHUNK_FORMATS[settings.CHUNK_AUDIO_FORMAT][0]
+
+
+def chunk_encoding():
+    """Returns the ffmpeg output options that encode chunks as configured.
+
+    Chunks are downmixed and resampled (16 kHz mono by default, what both Whisper and pyannote work
+    at internally), so they are much smaller than the upload to store and to send to the API.
+    """
+    _, codec = CHUNK_FORMATS[settings.CHUNK_AUDIO_FORMAT]
+    return {'ar': settings.CHUNK_SAMPLE_RATE, 'ac': settings.CHUNK_CHANNELS, **codec}
+
+
+def _input(source_path, start_at, length=None):
+    """Returns the ffmpeg input for a recording, seeking to `start_at` seconds and reading `length` seconds if given."""
+    options = {}
+    if start_at:
+        options['ss'] = start_at
+    if length:
+        options['t'] = length
+    return ffmpeg.input(source_path, **options)
+
+
+def detect_silences(source_path, noise_db, min_silence, start_at=0.0, length=None):
+    """Finds the silent stretches of a recording with ffmpeg's `silencedetect` filter.
+
+    Returns `(silences, duration)` where `silences` is a sorted list of `(start, end)` tuples in seconds
+    (from `start_at` on, for `length` seconds if given) and `duration` is the length of the whole
+    recording (None if ffmpeg cannot tell). The recording is decoded as a stream and only ffmpeg's
+    log is read, so memory use does not depend on its length.
+    """
+    process = (
+        _input(source_path, start_at, length)
+        .output('-', map='0:a:0', af=f'silencedetect=noise={noise_db}dB:d={min_silence}', f='null')
+        .global_args('-nostdin', '-nostats', '-loglevel', 'info')
+        .run_async(pipe_stderr=True)
+    )
+
+    silences = []
+    duration = None
+    silence_start = None
+    for line in io.TextIOWrapper(process.stderr, errors='replace'):
+        if duration is None:
+            match = DURATION_RE.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        match = SILENCE_START_RE.search(line)
+        if match:
+            silence_start = max(0.0, float(match.group(1))) + start_at
+            continue
+        match = SILENCE_END_RE.search(line)
+        if match and silence_start is not None:
+            silences.append((silence_start, float(match.group(1)) + start_at))
+            silence_start = None
+
+    return_code = process.wait()
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg exited with status {return_code} while detecting silences in {source_path}")
+
+    end = start_at + length if length else duration
+    if silence_start is not None and end:
+        silences.append((silence_start, min(end, duration or end)))  # The stretch read ends in silence
+    return silences, duration
+
+
+def recording_duration(source_path):
+    """Returns the length of a recording in seconds, read from its header (None if ffmpeg can't tell)."""
+    return detect_silences(source_path, settings.CHUNK_SILENCE_NOISE_DB, settings.CHUNK_MIN_SILENCE_SECONDS, 0.0, 0.1)[1]
+
+
+def choose_cut(position, silences, target_seconds, window_seconds, duration):
+    """Picks where the chunk starting at `position` ends: `target_seconds` later, snapped to the middle
+    of the closest silence within `window_seconds` (exactly on target if there is none nearby).
+
+    Returns None if the rest of the recording makes up the last chunk.
+    """
+    if duration - position <= target_seconds:
+        return None
+    ideal = position + target_seconds
+    low = max(ideal - window_seconds, position + 1.0)
+    high = min(ideal + window_seconds, duration)
+    midpoints = [(start + end) / 2 for start, end in silences if low <= (start + end) / 2 <= high]
+    cut = min(midpoints, key=lambda midpoint: abs(midpoint - ideal), default=ideal)
+    if duration - cut < 1.0:  # Don't leave a sliver of audio as the last chunk
+        return None
+    return cut
+
+
+def stream_segments(source_path, output_pattern, segment_seconds=None, cut_points=None, start_at=0.0, first_index=0):
+    """Splits an audio file into consecutive segments with ffmpeg, yielding each one as soon as it is written.
+
+    Segments are `segment_seconds` long, or end at the given `cut_points` (in seconds). Yields
+    `(index, path, start, end)` tuples, where `path` is `output_pattern % index` and `start`/`end`
+    are offsets in seconds into the source recording. ffmpeg decodes the input as a stream, so memory
+    use stays flat however long the recording is. `start_at` and `first_index` resume an interrupted
+    split after its last complete segment.
+    """
+    if cut_points:
+        # Segment times are relative to the (possibly seeked) output
+        split = {'segment_times': ','.join(f"{cut - start_at:.3f}" for cut in cut_points)}
+    else:
+        split = {'segment_time': segment_seconds}
+
+    process = (
+        _input(source_path, start_at)
+        .output(
+            output_pattern,
+            map='0:a:0',
+            f='segment',
+            reset_timestamps=1,
+            segment_list='pipe:1',  # ffmpeg writes one CSV line per finished segment to stdout
+            segment_list_type='csv',
+            segment_start_number=first_index,
+            **chunk_encoding(),
+            **split,
+        )
+        .global_args('-nostdin', '-loglevel', 'error')
+        .run_async(pipe_stdout=True)
+    )
+
+    index = first_index
+    try:
+        for row in csv.reader(io.TextIOWrapper(process.stdout)):
+            if not row:
+                continue
+            start, end = float(row[1]) + start_at, float(row[2]) + start_at
+            yield index, output_pattern % index, start, end
+            index += 1
+    finally:
+        process.stdout.close()
+        return_code = process.wait()
+
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg exited with status {return_code} while chunking {source_path}")
+
+
+def extract_segment(source_path, output_path, start, end):
+    """Writes the `start`-`end` stretch (in seconds) of a recording to `output_path`."""
+    (
+        ffmpeg
+        .input(source_path, ss=start, t=end - start)
+        .output(output_path, map='0:a:0', **chunk_encoding())
+        .global_args('-nostdin', '-loglevel', 'error')
+        .overwrite_output()
+        .run()
+    )
+
+
+def split_recording(source_path, output_pattern, start_at=0.0, first_index=0):
+    """Splits a recording into chunks according to the CHUNK_* settings.
+
+    Yields `(index, path, start, end)` tuples as each chunk file is written. With a silence window
+    configured, cuts are snapped to pauses in speech; with an overlap configured, consecutive chunks
+    share `CHUNK_OVERLAP_SECONDS` of audio, which the assembly step later de-duplicates. Chunking
+    starts at `start_at` seconds with chunk number `first_index`, to resume an interrupted split.
+    Without a window or an overlap, ffmpeg cuts the whole recording in one pass.
+    """
+    target, window = settings.CHUNK_SECONDS, settings.CHUNK_SILENCE_WINDOW_SECONDS
+    if not window and not settings.CHUNK_OVERLAP_SECONDS:
+        yield from stream_segments(source_path, output_pattern, target, start_at=start_at, first_index=first_index)
+        return
+
+    # Cuts are planned one chunk at a time, from the pauses around the next cut only, so the first
+    # chunk is written (and transcribed) after reading one window of audio, not the whole recording
+    position, index, duration = start_at, first_index, None
+    while True:
+        cut = None
+        if duration is None or duration - position > target:
+            if window:
+                low = position + max(1.0, target - window)
+                silences, duration = detect_silences(
+                    source_path, settings.CHUNK_SILENCE_NOISE_DB, settings.CHUNK_MIN_SILENCE_SECONDS,
+                    low, position + target + window - low,
+                )
+            else:  # Fixed-length cuts, overlapped: only the duration is needed
+                silences, duration = [], duration or recording_duration(source_path)
+            if not duration:
+                print(f"Unknown duration for {source_path}, falling back to fixed-length chunks")
+                yield from stream_segments(source_path, output_pattern, target, start_at=position, first_index=index)
+                return
+            cut = choose_cut(position, silences, target, window, duration)
+
+        end = duration if cut is None else min(cut + settings.CHUNK_OVERLAP_SECONDS, duration)
+        path = output_pattern % index
+        extract_segment(source_path, path, position, end)
+        yield index, path, position, end
+        if cut is None:
+            return
+        position, index = cut, index + 1
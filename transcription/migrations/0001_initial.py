@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transcription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audio_file', models.FileField(upload_to='audio_files/')),
+                ('transcription_text', models.TextField(blank=True, null=True)),
+                ('case_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('case_number', models.CharField(blank=True, max_length=10, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('chunking', 'Chunking'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=255)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('is_chunked', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('received_bytes', models.BigIntegerField(default=0)),
+                ('part_token', models.UUIDField(blank=True, null=True)),
+                ('part_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('case_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('case_number', models.CharField(blank=True, max_length=10, null=True)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('completed', 'Completed')], default='open', max_length=20)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('transcription', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='transcription.transcription')),
+            ],
+        ),
+    ]
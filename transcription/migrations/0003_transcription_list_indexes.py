@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0002_transcriptionupload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transcription',
+            index=models.Index(fields=['status', '-id'], name='transcription_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transcription',
+            index=models.Index(fields=['case_number', '-id'], name='transcription_case_idx'),
+        ),
+    ]
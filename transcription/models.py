@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 
 class Transcription(models.Model):
@@ -18,5 +19,38 @@ class Transcription(models.Model):
     date_updated = models.DateTimeField(auto_now=True)
     is_chunked = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # The list endpoint filters on these and pages by descending id
+            models.Index(fields=['status', '-id'], name='transcription_status_idx'),
+            models.Index(fields=['case_number', '-id'], name='transcription_case_idx'),
+        ]
+
     def __str__(self):
         return self.case_name or f"Transcription {self.id}"
+
+
+class TranscriptionUpload(models.Model):
+    """A resumable upload of a recording, sent in byte ranges; becomes a Transcription when finalized."""
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('completed', 'Completed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)  # Hex digest the client computed for the whole file
+    received_bytes = models.BigIntegerField(default=0)
+    # The part being written, if any: reserved while its body streams to disk, so no other part writes meanwhile
+    part_token = models.UUIDField(null=True, blank=True)
+    part_expires_at = models.DateTimeField(null=True, blank=True)
+    case_name = models.CharField(max_length=255, blank=True, null=True)
+    case_number = models.CharField(max_length=10, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    transcription = models.OneToOneField(Transcription, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload')
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.filename})"
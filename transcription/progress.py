@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from transcription.assembly import TRANSCRIBED_CHUNK_STATUSES
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+
+# Chunk statuses that still have transcription work ahead of them
+OPEN_CHUNK_STATUSES = ('pending', 'processing')
+
+# Requests of this process currently blocked in a long-poll or an event stream
+_waiters = 0
+_waiters_lock = threading.Lock()
+
+
+class TooManyWaiters(Exception):
+    """Raised when PROGRESS_MAX_WAITERS requests of this process are already waiting for progress."""
+
+
+@contextmanager
+def waiter_slot():
+    """Holds one of the PROGRESS_MAX_WAITERS slots while a request waits for progress.
+
+    Waiting sleeps on a worker thread, so the number of waiters is capped to leave threads free
+    for the rest of the API.
+    """
+    global _waiters
+    with _waiters_lock:
+        if _waiters >= settings.PROGRESS_MAX_WAITERS:
+            raise TooManyWaiters("Too many requests are waiting for progress; retry shortly.")
+        _waiters += 1
+    try:
+        yield
+    finally:
+        with _waiters_lock:
+            _waiters -= 1
+
+
+def _version_key(transcription_id):
+    return f"progress:{transcription_id}"
+
+
+def bump_progress(transcription_id):
+    """Gives a transcription a new progress version; called whenever it or one of its chunks changes.
+
+    The version lives in the shared 'progress' cache, so waiting requests notice a change made by a
+    pipeline worker without querying the database.
+    """
+    caches['progress'].set(_version_key(transcription_id), str(time.time_ns()))
+
+
+def progress_version(transcription_id):
+    """Returns the current progress version token of a transcription."""
+    cache = caches['progress']
+    version = cache.get(_version_key(transcription_id))
+    if version is None:  # Never bumped, or evicted: start a new version
+        cache.add(_version_key(transcription_id), str(time.time_ns()))
+        version = cache.get(_version_key(transcription_id))
+    return version
+
+
+def _build_snapshot(transcription_id, version):
+    """Reads the status of a transcription and its chunks, without any of the text columns."""
+    transcription = Transcription.objects.filter(pk=transcription_id).values('status', 'is_chunked').first()
+    if transcription is None:
+        return None
+    chunks = list(
+        AudioChunk.objects.filter(transcription_id=transcription_id)
+        .order_by('chunk_index')
+        .values_list('chunk_index', 'status', 'start_time', 'end_time')
+    )
+    counts = Counter(status for _, status, _, _ in chunks)
+    transcribed = sum(counts[status] for status in TRANSCRIBED_CHUNK_STATUSES)
+
+    if transcription['status'] == 'completed':
+        percent = 100.0
+    else:
+        # While still chunking, the total grows as chunks are cut, so the percentage can go down
+        percent = round(100 * transcribed / len(chunks), 1) if chunks else 0.0
+
+    return {
+        'id': transcription_id,
+        'version': version,
+        'status': transcription['status'],
+        'is_chunked': transcription['is_chunked'],
+        'percent_complete': percent,
+        'chunk_counts': dict(counts),
+        'chunks': [
+            {'index': index, 'status': status, 'start_time': start, 'end_time': end}
+            for index, status, start, end in chunks
+        ],
+        'done': transcription['status'] in ('completed', 'failed') and not any(counts[s] for s in OPEN_CHUNK_STATUSES),
+    }
+
+
+def progress_snapshot(transcription_id):
+    """Returns the progress of a transcription, or None if it doesn't exist.
+
+    Snapshots are cached per version, so any number of clients waiting on the same transcription
+    cost one pair of queries per change.
+    """
+    cache = caches['progress']
+    version = progress_version(transcription_id)
+    snapshot_key = f"{_version_key(transcription_id)}:{version}"
+    snapshot = cache.get(snapshot_key)
+    if snapshot is None:
+        snapshot = _build_snapshot(transcription_id, version)
+        if snapshot is not None:
+            cache.set(snapshot_key, snapshot, settings.PROGRESS_STREAM_SECONDS)
+    return snapshot
+
+
+def wait_for_change(transcription_id, version, timeout):
+    """Blocks until the progress version differs from `version` or `timeout` seconds have passed.
+
+    Raises TooManyWaiters if no waiter slot is free.
+    """
+    deadline = time.monotonic() + timeout
+    if progress_version(transcription_id) != version:
+        return True
+    with waiter_slot():
+        while progress_version(transcription_id) == version:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(settings.PROGRESS_POLL_INTERVAL)
+    return True
+
+
+def progress_events(transcription_id, last_version=None, keep_alive=15):
+    """Yields Server-Sent Events for each progress change until the transcription is done.
+
+    The stream closes after PROGRESS_STREAM_SECONDS; the browser's EventSource reconnects with the
+    last event id (the version), so nothing is sent twice. If no waiter slot is free, the stream
+    closes at once and tells the browser to reconnect after PROGRESS_BUSY_RETRY_SECONDS.
+    """
+    try:
+        with waiter_slot():
+            yield from _progress_events(transcription_id, last_version, keep_alive)
+    except TooManyWaiters:
+        yield f"retry: {settings.PROGRESS_BUSY_RETRY_SECONDS * 1000}\nevent: busy\ndata: {{}}\n\n"
+
+
+def _progress_events(transcription_id, last_version, keep_alive):
+    deadline = time.monotonic() + settings.PROGRESS_STREAM_SECONDS
+    last_sent = time.monotonic()
+    version = last_version
+    if version is not None and progress_version(transcription_id) == version:
+        snapshot = progress_snapshot(transcription_id)
+        if snapshot is None or snapshot['done']:  # Reconnected after the last event
+            yield "event: end\ndata: {}\n\n"
+            return
+    while time.monotonic() < deadline:
+        if progress_version(transcription_id) != version:
+            snapshot = progress_snapshot(transcription_id)
+            if snapshot is None:
+                return
+            version = snapshot['version']
+            yield f"id: {version}\nevent: progress\ndata: {json.dumps(snapshot)}\n\n"
+            last_sent = time.monotonic()
+            if snapshot['done']:
+                yield "event: end\ndata: {}\n\n"
+                return
+        elif time.monotonic() - last_sent >= keep_alive:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(settings.PROGRESS_POLL_INTERVAL)
@@ -1,3 +1,248 @@
-from django.test import TestCase
+import hashlib
+import io
+import math
+import os
+import shutil
+import struct
+import tempfile
+import uuid
+import wave
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from transcription.assembly import (
+    assemble_transcription_prefix, assemble_transcription_text, drop_seam_overlap, stitch_chunk_texts,
+)
+from transcription.chunking import chunk_extension, choose_cut, detect_silences, split_recording, stream_segments
+from transcription.models import Transcription, TranscriptionUpload
+from transcription.uploads import UploadError, UploadOffsetMismatch, append_part, finalize_upload, part_path
+from transcription_chunks.benchmarks import write_synthetic_recording
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.tasks import chunk_transcription
 
-# Create your tests here.
+# Chunking shells out to ffmpeg
+needs_ffmpeg = skipUnless(shutil.which('ffmpeg'), "ffmpeg is not installed")
+
+
+@needs_ffmpeg
+@override_settings(CHUNK_AUDIO_FORMAT='wav', CHUNK_SECONDS=10, CHUNK_SILENCE_WINDOW_SECONDS=0, CHUNK_OVERLAP_SECONDS=0)
+class ChunkingTests(SimpleTestCase):
+    """Recordings are split by ffmpeg, each chunk yielded as soon as it is written."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, 'hearing.wav')
+        write_synthetic_recording(self.source, 25)
+        self.pattern = os.path.join(self.directory, 'chunk_%d.wav')
+
+    def test_fixed_length_chunks(self):
+        segments = list(split_recording(self.source, self.pattern))
+        self.assertEqual([index for index, *_ in segments], [0, 1, 2])
+        self.assertEqual([round(start) for _, _, start, _ in segments], [0, 10, 20])
+        self.assertAlmostEqual(segments[-1][3], 25, delta=0.1)
+        for _, path, _, _ in segments:
+            self.assertTrue(os.path.getsize(path) > 0)
+
+    @override_settings(CHUNK_OVERLAP_SECONDS=1)
+    def test_fixed_length_chunks_overlap(self):
+        segments = list(split_recording(self.source, self.pattern))
+        self.assertEqual([(round(start), round(end)) for _, _, start, end in segments], [(0, 11), (10, 21), (20, 25)])
+
+    def test_resume_after_the_last_chunk(self):
+        segments = list(stream_segments(self.source, self.pattern, segment_seconds=10, start_at=10, first_index=1))
+        self.assertEqual([(index, round(start)) for index, _, start, _ in segments], [(1, 10), (2, 20)])
+        self.assertFalse(os.path.exists(self.pattern % 0))
+
+
+@override_settings(
+    CHUNK_AUDIO_FORMAT='wav', CHUNK_SECONDS=10, CHUNK_SILENCE_WINDOW_SECONDS=3, CHUNK_OVERLAP_SECONDS=1,
+    CHUNK_SILENCE_NOISE_DB=-35, CHUNK_MIN_SILENCE_SECONDS=0.2,
+)
+class SilenceAwareChunkingTests(SimpleTestCase):
+    """Cuts are snapped to pauses near the target length, and overlapping seams are de-duplicated."""
+
+    def test_choose_cut(self):
+        silences = [(8.0, 8.4), (10.6, 11.0), (30.0, 31.0)]
+        self.assertEqual(choose_cut(0, silences, 10, 3, 60), 10.8)  # The closest pause to 10 s
+        self.assertEqual(choose_cut(35, silences, 10, 3, 60), 45)  # No pause nearby: on target
+        self.assertEqual(choose_cut(20, [(30.0, 31.0)], 10, 3, 60), 30.5)
+        self.assertIsNone(choose_cut(50, silences, 10, 3, 60))  # The rest is the last chunk
+        self.assertIsNone(choose_cut(50, silences, 10, 3, 60.5))  # No sliver of a last chunk
+
+    @needs_ffmpeg
+    def test_cuts_fall_in_pauses(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'hearing.wav')
+        write_synthetic_recording(source, 35, seed=1)
+        silences, duration = detect_silences(source, -35, 0.2)
+
+        segments = list(split_recording(source, os.path.join(directory, 'chunk_%d.wav')))
+        self.assertGreater(len(segments), 2)
+        self.assertEqual(segments[0][2], 0)
+        self.assertAlmostEqual(segments[-1][3], duration, delta=0.1)
+        for (_, _, _, end), (_, _, start, _) in zip(segments, segments[1:]):
+            self.assertAlmostEqual(end, min(start + 1, duration))  # Overlaps the next chunk by a second
+            in_pause = any(silence_start <= start <= silence_end for silence_start, silence_end in silences)
+            self.assertTrue(in_pause or start in (0, 10, 20, 30), start)
+
+    def test_seam_overlap_is_dropped(self):
+        self.assertEqual(
+            drop_seam_overlap("the accused pleaded guilty to", "guilty to the charge of robbery"),
+            "the charge of robbery",
+        )
+        self.assertEqual(drop_seam_overlap("pleaded guilty to", "ilty to the charge"), "ilty to the charge")
+        self.assertEqual(drop_seam_overlap("pleaded guilty to", "xx guilty to the charge"), "the charge")
+        self.assertEqual(stitch_chunk_texts(["a b c d", "", "c d e f"], overlap_seconds=1), "a b c d\ne f")
+        self.assertEqual(stitch_chunk_texts(["a b c d", "c d e f"]), "a b c d\nc d e f")
+
+
+@needs_ffmpeg
+@override_settings(CHUNK_AUDIO_FORMAT='wav', CHUNK_SECONDS=10, CHUNK_SILENCE_WINDOW_SECONDS=0, CHUNK_OVERLAP_SECONDS=0)
+class ChunkTranscriptionTests(TestCase):
+    """The chunk job creates a chunk per segment, and resumes where an interrupted run stopped."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        media = override_settings(MEDIA_ROOT=directory)
+        media.enable()
+        self.addCleanup(media.disable)
+        os.makedirs(os.path.join(directory, 'audio_files'))
+        write_synthetic_recording(os.path.join(directory, 'audio_files', 'hearing.wav'), 25)
+        self.transcription = Transcription.objects.create(audio_file='audio_files/hearing.wav')
+
+    def test_chunks_without_times_are_cut_again(self):
+        legacy = AudioChunk.objects.create(  # Cut before chunks recorded their offsets
+            transcription=self.transcription, chunk_index=0, chunk_file='audio_chunks/legacy.wav',
+        )
+        chunk_transcription(self.transcription)
+        self.transcription.refresh_from_db()
+        self.assertEqual(self.transcription.status, 'in_progress')
+        self.assertFalse(AudioChunk.objects.filter(pk=legacy.pk).exists())
+        chunks = AudioChunk.objects.order_by('chunk_index').values_list('chunk_index', 'start_time')
+        self.assertEqual([(index, round(start)) for index, start in chunks], [(0, 0), (1, 10), (2, 20)])
+
+
+@override_settings(CHUNK_OVERLAP_SECONDS=0)
+class AssemblyTests(TestCase):
+    """The transcript is built in chunk order, whatever order the chunks finished in."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3', status='in_progress')
+        for index, status in [(2, 'completed'), (0, 'diarized'), (1, 'processing')]:  # Created out of order
+            AudioChunk.objects.create(
+                transcription=self.transcription, chunk_index=index, status=status, transcription_text=f"part {index}",
+            )
+
+    def test_chunk_order(self):
+        self.assertEqual(assemble_transcription_text(self.transcription), "part 0\npart 1\npart 2")
+
+    def test_prefix_only_grows(self):
+        self.assertEqual(assemble_transcription_prefix(self.transcription), ("part 0", 1))  # Chunk 1 isn't done
+        AudioChunk.objects.filter(chunk_index=1).update(status='completed')
+        self.assertEqual(assemble_transcription_prefix(self.transcription), ("part 0\npart 1\npart 2", 3))
+
+
+@needs_ffmpeg
+@override_settings(CHUNK_AUDIO_FORMAT='flac', CHUNK_SECONDS=10, CHUNK_SILENCE_WINDOW_SECONDS=0, CHUNK_OVERLAP_SECONDS=0)
+class ChunkEncodingTests(SimpleTestCase):
+    """Chunks are stored as 16 kHz mono FLAC, whatever the upload's sample rate and channels."""
+
+    def test_flac_chunks(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'hearing.wav')
+        with wave.open(source, 'wb') as audio:  # CD quality stereo
+            audio.setnchannels(2)
+            audio.setsampwidth(2)
+            audio.setframerate(44100)
+            second = struct.pack('<88200h', *(int(8000 * math.sin(i // 2 * 0.05)) for i in range(88200)))
+            audio.writeframes(second * 12)
+
+        self.assertEqual(chunk_extension(), 'flac')
+        segments = list(split_recording(source, os.path.join(directory, f'chunk_%d.{chunk_extension()}')))
+        self.assertEqual(len(segments), 2)
+        with open(segments[0][1], 'rb') as f:
+            header = f.read(21)
+        self.assertEqual(header[:4], b'fLaC')
+        self.assertEqual(int.from_bytes(header[18:21], 'big') >> 4, 16000)  # STREAMINFO sample rate
+        self.assertEqual((header[20] >> 1 & 7) + 1, 1)  # ... and channels
+        self.assertLess(os.path.getsize(segments[0][1]), os.path.getsize(source) / 12)
+
+
+class UploadTests(TestCase):
+    """Parts are appended at the stored offset, and a finalized upload must match its checksum."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        media = override_settings(MEDIA_ROOT=directory)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.data = b"0123456789" * 10
+        self.upload = TranscriptionUpload.objects.create(
+            filename='hearing.mp3', total_size=len(self.data), sha256=hashlib.sha256(self.data).hexdigest(),
+            case_name="State v. Doe",
+        )
+
+    def test_parts_and_finalize(self):
+        self.assertEqual(append_part(self.upload, io.BytesIO(self.data[:60]), 0, 60), 60)
+        with self.assertRaises(UploadOffsetMismatch) as raised:
+            append_part(self.upload, io.BytesIO(self.data[70:]), 70, 30)  # Skips bytes 60-69
+        self.assertEqual(raised.exception.offset, 60)
+
+        stale = TranscriptionUpload.objects.get(pk=self.upload.pk)
+        stale.received_bytes = 80
+        with self.assertRaises(UploadOffsetMismatch):  # The offset is checked against the stored row
+            append_part(stale, io.BytesIO(self.data[80:]), 80, 20)
+        self.assertEqual(append_part(self.upload, io.BytesIO(self.data[50:]), 50, 50), 100)  # Re-sends 50-59
+
+        transcription = finalize_upload(self.upload)
+        self.assertEqual(transcription.case_name, "State v. Doe")
+        with transcription.audio_file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(part_path(self.upload)))
+        with self.assertRaises(UploadError):
+            append_part(self.upload, io.BytesIO(b"x"), 99, 1)
+
+    def test_no_transaction_is_open_while_the_body_is_read(self):
+        savepoints = len(connection.savepoint_ids)
+        body = io.BytesIO(self.data[:50])
+
+        def read(size):
+            self.assertEqual(len(connection.savepoint_ids), savepoints)
+            stored = TranscriptionUpload.objects.get(pk=self.upload.pk)
+            self.assertIsNotNone(stored.part_token)  # Reserved meanwhile
+            return body.read(size)
+
+        self.assertEqual(append_part(self.upload, mock.Mock(read=read), 0, 50), 50)
+        self.assertIsNone(TranscriptionUpload.objects.get(pk=self.upload.pk).part_token)
+
+    def test_parts_in_flight(self):
+        TranscriptionUpload.objects.filter(pk=self.upload.pk).update(
+            part_token=uuid.uuid4(), part_expires_at=timezone.now() + timedelta(minutes=1),
+        )
+        with self.assertRaises(UploadOffsetMismatch):  # Another part is being written
+            append_part(self.upload, io.BytesIO(self.data), 0, 100)
+
+        TranscriptionUpload.objects.filter(pk=self.upload.pk).update(part_expires_at=timezone.now())
+        body = io.BytesIO(self.data)
+
+        def read(size):  # A stalled part is taken over while this one streams
+            TranscriptionUpload.objects.filter(pk=self.upload.pk).update(part_token=uuid.uuid4())
+            return body.read(size)
+
+        with self.assertRaises(UploadOffsetMismatch):
+            append_part(self.upload, mock.Mock(read=read), 0, 100)
+        self.assertEqual(TranscriptionUpload.objects.get(pk=self.upload.pk).received_bytes, 0)
+
+    def test_checksum_mismatch(self):
+        append_part(self.upload, io.BytesIO(self.data[:99] + b"!"), 0, 100)
+        with self.assertRaises(UploadError):
+            finalize_upload(self.upload)
+        self.assertEqual(TranscriptionUpload.objects.get(pk=self.upload.pk).status, 'open')
+        self.assertFalse(Transcription.objects.exists())
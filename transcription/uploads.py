@@ -0,0 +1,155 @@
+import os
+import re
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from api import metrics
+from api.cache import file_digest
+from transcription.models import Transcription, TranscriptionUpload
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadError(Exception):
+    """Raised when a part or a finalize request can't be applied to an upload."""
+
+
+class UploadOffsetMismatch(UploadError):
+    """Raised when a part doesn't start at (or before) the end of what has been received so far."""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+def part_path(upload):
+    """Returns the path of the file an upload's bytes are written to until it is finalized."""
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f"{upload.id}.part")
+
+
+def parse_content_range(header):
+    """Parses a `Content-Range: bytes start-end/total` header into (start, length)."""
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        raise UploadError("Expected a 'Content-Range: bytes <start>-<end>/<total>' header.")
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        raise UploadError("Content-Range end is before its start.")
+    return start, end - start + 1
+
+
+def append_part(upload, stream, start, length):
+    """Writes `length` bytes read from `stream` at offset `start` of the upload and returns the new offset.
+
+    The body is copied to disk in UPLOAD_BLOCK_SIZE blocks, so a part never has to fit in memory.
+    A part may start before the current offset (a retry of a part whose response was lost); the
+    file is truncated there first. If the client disconnects mid-part, the bytes that made it to
+    disk still count, and the client resumes from the offset it gets back from the status endpoint.
+
+    The part is reserved in a short transaction and the body streamed with none open, so a slow
+    client never holds a database lock; the new offset is only saved if the reservation still holds.
+    """
+    token = _reserve_part(upload, start, length)
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written, interrupted = 0, None
+    with metrics.timed('upload'), open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.truncate(start)
+        f.seek(start)
+        try:
+            while written < length:
+                block = stream.read(min(settings.UPLOAD_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+        except OSError as e:  # The client went away; keep what was written
+            interrupted = e
+        f.flush()
+
+    saved = TranscriptionUpload.objects.filter(pk=upload.pk, part_token=token, received_bytes=start).update(
+        received_bytes=start + written, part_token=None, part_expires_at=None,
+    )
+    if not saved:  # Another part took over after this one's reservation expired
+        received_bytes = TranscriptionUpload.objects.values_list('received_bytes', flat=True).get(pk=upload.pk)
+        raise UploadOffsetMismatch("Another part replaced this one while it was being written.", received_bytes)
+    upload.received_bytes = start + written
+
+    if interrupted is not None:
+        raise UploadError(f"The request body was interrupted after {written} of {length} bytes.") from interrupted
+    if written < length:
+        raise UploadError(f"The request body ended after {written} of {length} bytes.")
+    return upload.received_bytes
+
+
+def _reserve_part(upload, start, length):
+    """Checks a part against the stored upload and marks it as being written; returns its token.
+
+    The offset moves back to `start`, where the file is about to be truncated.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        locked = TranscriptionUpload.objects.select_for_update().get(pk=upload.pk)
+        upload.status, upload.received_bytes = locked.status, locked.received_bytes
+        if upload.status != 'open':
+            raise UploadError("This upload has already been finalized.")
+        if locked.part_token is not None and locked.part_expires_at > now:
+            raise UploadOffsetMismatch("Another part of this upload is still being written.", upload.received_bytes)
+        if start > upload.received_bytes:
+            raise UploadOffsetMismatch(f"Expected a part starting at byte {upload.received_bytes}.", upload.received_bytes)
+        if start + length > upload.total_size:
+            raise UploadError(f"The part ends past the declared size of {upload.total_size} bytes.")
+
+        token = uuid.uuid4()
+        TranscriptionUpload.objects.filter(pk=upload.pk).update(
+            part_token=token,
+            part_expires_at=now + timedelta(seconds=settings.UPLOAD_PART_TIMEOUT_SECONDS),
+            received_bytes=start,
+        )
+    upload.received_bytes = start
+    return token
+
+
+def finalize_upload(upload):
+    """Verifies a fully received upload against its checksum and creates its Transcription.
+
+    The part file is moved (not copied) into the audio_files/ storage; creating the Transcription
+    queues chunking as for a regular upload.
+    """
+    with metrics.timed('upload_finalize'):
+        return _finalize_upload(upload)
+
+
+def _finalize_upload(upload):
+    if upload.status != 'open':
+        raise UploadError("This upload has already been finalized.")
+    if upload.received_bytes != upload.total_size:
+        raise UploadOffsetMismatch(
+            f"Only {upload.received_bytes} of {upload.total_size} bytes have been received.", upload.received_bytes
+        )
+
+    path = part_path(upload)
+    if file_digest(path, settings.UPLOAD_BLOCK_SIZE) != upload.sha256.lower():
+        raise UploadError("The SHA-256 checksum of the received file does not match; re-send it from byte 0.")
+
+    name = default_storage.get_available_name(
+        default_storage.generate_filename(f"audio_files/{os.path.basename(upload.filename)}")
+    )
+    with transaction.atomic():
+        # Only one finalize request wins; a concurrent one sees the upload as already finalized
+        if not TranscriptionUpload.objects.filter(pk=upload.pk, status='open').update(status='completed'):
+            raise UploadError("This upload has already been finalized.")
+        transcription = Transcription.objects.create(
+            audio_file=name,
+            case_name=upload.case_name,
+            case_number=upload.case_number,
+        )
+        os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+        os.replace(path, default_storage.path(name))
+        TranscriptionUpload.objects.filter(pk=upload.pk).update(transcription=transcription)
+
+    upload.status, upload.transcription = 'completed', transcription
+    return transcription
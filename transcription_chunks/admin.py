@@ -11,11 +11,18 @@
 
 
 from django.contrib import admin
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from api.admin import ChangeListDeferMixin
 from transcription_chunks.models import AudioChunk
 
 @admin.register(AudioChunk)
-class AudioChunkAdmin(admin.ModelAdmin):
+class AudioChunkAdmin(ChangeListDeferMixin, admin.ModelAdmin):
     list_display = ('transcription', 'chunk_index', 'status', 'has_diarization', 'created_at')  # Show diarization status
+    list_select_related = ('transcription',)  # Transcription.__str__ is shown on every row
+    raw_id_fields = ('transcription',)  # Don't render every Transcription into a <select> on the form
+    changelist_deferred_fields = (
+        'transcription_text', 'transcription_words', 'diarization_data', 'transcription__transcription_text',
+    )
     list_filter = ('status', 'created_at')  # Filter by status and creation date
     search_fields = ('transcription__case_name', 'transcription__case_number', 'chunk_index')  # Search by transcription and chunk index
     ordering = ('-created_at',)  # Order by latest
@@ -24,8 +31,29 @@ class AudioChunkAdmin(admin.ModelAdmin):
     fields = ('transcription', 'chunk_file', 'chunk_index', 'transcription_text', 'diarization_data', 'status', 'created_at')
     readonly_fields = ('created_at', 'transcription_text', 'diarization_data')  # Make fields read-only in the form
 
+    def get_queryset(self, request):
+        # Computed in the query, since diarization_data itself is deferred on the change list
+        return super().get_queryset(request).annotate(has_diarization_data=ExpressionWrapper(
+            Q(diarization_data__isnull=False) & ~Q(diarization_data=''), output_field=BooleanField(),
+        ))
+
     # Method to display whether diarization is available
     def has_diarization(self, obj):
-        return bool(obj.diarization_data)
+        return obj.has_diarization_data
     has_diarization.boolean = True  # Display as a boolean icon
-    has_diarization.short_description = 'Diarized'
\ No newline at end of file
+    has_diarization.short_description = 'Diarized'
+
+from transcription_chunks.models import PipelineJob
+
+@admin.register(PipelineJob)
+class PipelineJobAdmin(ChangeListDeferMixin, admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'transcription', 'chunk', 'attempts', 'worker', 'available_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    list_select_related = ('transcription', 'chunk__transcription')
+    raw_id_fields = ('transcription', 'chunk')
+    changelist_deferred_fields = (
+        'last_error', 'transcription__transcription_text', 'chunk__transcription_text', 'chunk__transcription_words',
+        'chunk__diarization_data', 'chunk__transcription__transcription_text',
+    )
+    search_fields = ('transcription__case_name', 'transcription__case_number')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
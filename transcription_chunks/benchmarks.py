@@ -0,0 +1,60 @@
+import math
+import random
+import resource
+import statistics
+import struct
+import wave
+
+
+def latency_summary(seconds):
+    """Summarises latencies given in seconds as p50/p95/p99/max milliseconds."""
+    if not seconds:
+        return None
+    seconds = sorted(seconds)
+    quantiles = statistics.quantiles(seconds, n=100, method='inclusive') if len(seconds) > 1 else seconds * 99
+    return {
+        'p50': round(quantiles[49] * 1000, 2),
+        'p95': round(quantiles[94] * 1000, 2),
+        'p99': round(quantiles[98] * 1000, 2),
+        'max': round(seconds[-1] * 1000, 2),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its finished children (e.g. ffmpeg), in MB."""
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def write_synthetic_recording(path, seconds, speakers=2, seed=0, sample_rate=16000):
+    """Writes a mono WAV "hearing" of `seconds`: speakers take turns of 2-15 s, each a tone of its own
+    pitch, separated by pauses of silence for the chunker to cut at. Returns the number of turns."""
+    rng = random.Random(seed)
+    block = sample_rate // 10  # Sound is written in 0.1 s blocks
+    tones = [
+        struct.pack(f'<{block}h', *(
+            int(8000 * math.sin(2 * math.pi * (150 + 60 * speaker) * i / sample_rate)) for i in range(block)
+        ))
+        for speaker in range(max(1, speakers))
+    ]
+    silence = b'\0\0' * block
+
+    turns, written, total = 0, 0, int(seconds * 10)
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(sample_rate)
+        speaker = 0
+        while written < total:
+            turn = min(total - written, rng.randint(20, 150))
+            audio.writeframes(tones[speaker] * turn)
+            pause = min(total - written - turn, rng.randint(3, 12))
+            audio.writeframes(silence * pause)
+            written += turn + pause
+            turns += 1
+            if len(tones) > 1:
+                speaker = (speaker + rng.randrange(1, len(tones))) % len(tones)
+    return turns
@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from transcription.models import Transcription
+from transcription_chunks.benchmarks import latency_summary
+from transcription_chunks.models import AudioChunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures concurrent-writer throughput of the configured database: each writer thread updates "
+        "the status and text of its own chunks the way pipeline workers do. Run it once per database "
+        "mode (e.g. db_engine=sqlite and db_engine=postgresql) to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Concurrent writer threads.")
+        parser.add_argument('--seconds', type=float, default=10, help="How long to write for.")
+        parser.add_argument('--chunks', type=int, default=20, help="Chunks owned by each writer.")
+        parser.add_argument('--text-bytes', type=int, default=4000, help="Size of the transcription_text written.")
+
+    def handle(self, *args, **options):
+        writers, chunks_per_writer = max(1, options['writers']), max(1, options['chunks'])
+        text = 'x' * options['text_bytes']
+
+        # An already chunked transcription and chunks that are not pending stay out of the pipeline queue
+        transcription = Transcription.objects.create(
+            audio_file='bench/bench.flac', case_name='bench_db_writes', status='in_progress', is_chunked=True,
+        )
+        chunk_ids = [
+            AudioChunk.objects.create(transcription=transcription, chunk_index=i, status='processing').id
+            for i in range(writers * chunks_per_writer)
+        ]
+        results = [{'latencies': [], 'errors': 0} for _ in range(writers)]
+        deadline = time.monotonic() + options['seconds']
+
+        def write(number):
+            own = chunk_ids[number::writers]
+            result = results[number]
+            try:
+                i = 0
+                while time.monotonic() < deadline:
+                    chunk_id = own[i % len(own)]
+                    i += 1
+                    started = time.perf_counter()
+                    try:
+                        # One pipeline step: read the chunk, then write its status and text (the status is
+                        # left unchanged, so the stats counters still match when the rows are deleted)
+                        with transaction.atomic():
+                            AudioChunk.objects.filter(pk=chunk_id).values_list('status', flat=True).first()
+                            AudioChunk.objects.filter(pk=chunk_id).update(status='processing', transcription_text=text)
+                    except OperationalError as e:  # e.g. "database is locked"
+                        result['errors'] += 1
+                        result.setdefault('error', str(e))
+                        continue
+                    result['latencies'].append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(number,)) for number in range(writers)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        transcription.delete()  # Removes the benchmark chunks too
+
+        latencies = sorted(latency for result in results for latency in result['latencies'])
+        report = {
+            'vendor': connection.vendor,
+            'settings': {
+                key: str(value) for key, value in connection.settings_dict.items()
+                if key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')
+            },
+            'writers': writers,
+            'seconds': round(elapsed, 2),
+            'commits': len(latencies),
+            'commits_per_second': round(len(latencies) / elapsed, 1),
+            'errors': sum(result['errors'] for result in results),
+            'first_error': next((result['error'] for result in results if 'error' in result), None),
+        }
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                report['journal_mode'] = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        if latencies:
+            report['latency_ms'] = latency_summary(latencies)
+        self.stdout.write(json.dumps(report, indent=2))
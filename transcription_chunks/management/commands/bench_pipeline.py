@@ -0,0 +1,182 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from transcription.assembly import assemble_transcription_text
+from transcription.models import Transcription
+from transcription_chunks import tasks
+from transcription_chunks.benchmarks import latency_summary, peak_rss_mb, write_synthetic_recording
+from transcription_chunks.models import AudioChunk, PipelineJob
+from transcription_chunks.queue import OPEN_STATUSES, enqueue, run_worker
+
+STAGES = ['chunk', 'transcribe', 'diarize', 'brief']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the whole pipeline (chunk -> transcribe -> diarize -> assemble -> brief) on synthetic "
+        "recordings, with the stand-in backends of api/backends.py, and prints a JSON report of throughput, "
+        "per-stage latency, peak memory and database queries. Runs against the configured database, whose "
+        "queue should be idle: its other jobs would be run (and timed) too."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recordings', type=int, default=3, help="Synthetic recordings to process.")
+        parser.add_argument('--seconds', type=float, default=600, help="Length of each recording.")
+        parser.add_argument('--speakers', type=int, default=3, help="Speakers taking turns in each recording.")
+        parser.add_argument('--threads', type=int, default=settings.PIPELINE_WORKER_THREADS, help="Worker threads.")
+        parser.add_argument(
+            '--profile', choices=['instant', 'realistic'], default='realistic',
+            help="Backend latency and failures: none, or the whisper/pyannote-cpu/openai-chat profiles.",
+        )
+        parser.add_argument('--time-scale', type=float, default=0.1, help="Multiplier of the simulated latencies.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-seconds', type=int, default=settings.CHUNK_SECONDS)
+        parser.add_argument('--output', help="Also write the report to this file.")
+        parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output.")
+
+    def handle(self, *args, **options):
+        realistic = options['profile'] == 'realistic'
+        common = {'seed': options['seed'], 'time_scale': options['time_scale']}
+        backends = {
+            'asr': {'BACKEND': 'api.backends.FakeASRBackend', 'OPTIONS': {
+                **common, 'profile': 'whisper' if realistic else 'instant',
+            }},
+            'diarization': {'BACKEND': 'api.backends.FakeDiarizationBackend', 'OPTIONS': {
+                **common, 'profile': 'pyannote-cpu' if realistic else 'instant', 'speakers': options['speakers'],
+            }},
+            'llm': {'BACKEND': 'api.backends.FakeLLMBackend', 'OPTIONS': {
+                **common, 'profile': 'openai-chat' if realistic else 'instant',
+            }},
+        }
+        media_root = tempfile.mkdtemp(prefix='bench_pipeline_')
+        bench_settings = override_settings(
+            PIPELINE_BACKENDS=backends,
+            MEDIA_ROOT=media_root,
+            CHUNK_AUDIO_FORMAT='wav',  # The fakes read the duration of WAV chunks from their header
+            CHUNK_SECONDS=options['chunk_seconds'],
+            BACKEND_RATE_LIMITS={},  # Measure the pipeline, not our own request budgets
+            # Results must be computed, not served from an earlier run's cache
+            CACHES={**settings.CACHES, 'pipeline': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}},
+        )
+        output = contextlib.nullcontext() if options['verbose'] else contextlib.redirect_stdout(io.StringIO())
+        try:
+            with bench_settings:
+                report = self.run_benchmark(options, media_root, output)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        report['backends'] = {kind: config['OPTIONS'] for kind, config in backends.items()}
+        report['peak_rss_mb'] = peak_rss_mb()
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text)
+        self.stdout.write(text)
+
+    def run_benchmark(self, options, media_root, output):
+        timings = {stage: [] for stage in STAGES}
+        queries = {stage: 0 for stage in STAGES}
+        lock = threading.Lock()
+
+        def instrumented(stage, handler):
+            def run(job):
+                counted = [0]
+
+                def count(execute, sql, params, many, context):
+                    counted[0] += 1
+                    return execute(sql, params, many, context)
+
+                started = time.perf_counter()
+                try:
+                    with connection.execute_wrapper(count):  # The connection of this job's thread
+                        return handler(job)
+                finally:
+                    with lock:
+                        timings[stage].append(time.perf_counter() - started)
+                        queries[stage] += counted[0]
+            return run
+
+        os.makedirs(os.path.join(media_root, 'audio_files'))
+        recordings = []
+        for number in range(options['recordings']):
+            name = f"audio_files/bench_{number}.wav"
+            write_synthetic_recording(
+                os.path.join(media_root, name), options['seconds'], options['speakers'], options['seed'] + number,
+            )
+            recordings.append(name)
+
+        handlers = dict(tasks.JOB_HANDLERS)
+        tasks.JOB_HANDLERS.update({stage: instrumented(stage, handlers[stage]) for stage in STAGES})
+        transcription_ids = []
+        try:
+            with output:
+                started = time.perf_counter()
+                for number, name in enumerate(recordings):
+                    transcription_ids.append(Transcription.objects.create(
+                        audio_file=name, case_name=f"bench_pipeline {number}", case_number=f"BENCH-{number}",
+                    ).id)  # Queues its chunk job
+                self.drain(options['threads'], transcription_ids)
+                transcribed = time.perf_counter() - started
+
+                for transcription_id in transcription_ids:
+                    enqueue('brief', transcription_id)
+                self.drain(options['threads'], transcription_ids)
+                elapsed = time.perf_counter() - started
+
+                # Assembly runs inside the last transcribe job; time it on its own on the finished recordings
+                assemble = []
+                for transcription in Transcription.objects.filter(id__in=transcription_ids):
+                    assemble_started = time.perf_counter()
+                    assemble_transcription_text(transcription)
+                    assemble.append(time.perf_counter() - assemble_started)
+
+                jobs = PipelineJob.objects.filter(transcription_id__in=transcription_ids)
+                chunks = AudioChunk.objects.filter(transcription_id__in=transcription_ids)
+                report = {
+                    'vendor': connection.vendor,
+                    'recordings': len(recordings),
+                    'audio_seconds': options['seconds'] * len(recordings),
+                    'chunks': chunks.count(),
+                    'threads': options['threads'],
+                    'wall_seconds': round(elapsed, 2),
+                    'transcription_seconds': round(transcribed, 2),
+                    'throughput': {
+                        'audio_seconds_per_second': round(options['seconds'] * len(recordings) / elapsed, 2),
+                        'chunks_per_second': round(chunks.count() / elapsed, 2),
+                        'recordings_per_hour': round(len(recordings) * 3600 / elapsed, 1),
+                    },
+                    'stages': {
+                        stage: {
+                            'jobs': len(timings[stage]),
+                            'latency_ms': latency_summary(timings[stage]),
+                            'queries': queries[stage],
+                            'queries_per_job': round(queries[stage] / len(timings[stage]), 1) if timings[stage] else None,
+                        }
+                        for stage in STAGES
+                    },
+                    'retried_jobs': jobs.filter(attempts__gt=1).count(),
+                    'failed_jobs': jobs.filter(status='failed').count(),
+                    'failed_chunks': chunks.filter(status='failed').count(),
+                    'completed_recordings': Transcription.objects.filter(id__in=transcription_ids, status='completed').count(),
+                }
+                report['stages']['assemble'] = {'jobs': len(assemble), 'latency_ms': latency_summary(assemble)}
+        finally:
+            tasks.JOB_HANDLERS.update(handlers)
+            with output:
+                Transcription.objects.filter(id__in=transcription_ids).delete()  # Removes the chunks and jobs too
+        return report
+
+    def drain(self, threads, transcription_ids):
+        """Runs the queue until no job of the benchmark is left, including jobs waiting out a retry backoff."""
+        while PipelineJob.objects.filter(transcription_id__in=transcription_ids, status__in=OPEN_STATUSES).exists():
+            run_worker(worker_id='bench_pipeline', threads=threads, burst=True, poll_interval=0.05)
+            time.sleep(0.05)
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk, PipelineJob
+from transcription_chunks.queue import OPEN_STATUSES, enqueue, requeue_expired_jobs
+from transcription_chunks.states import transition_chunk, transition_transcription
+from transcription_chunks.tasks import update_transcription_status
+
+
+class Command(BaseCommand):
+    help = (
+        "Resumes interrupted transcription pipelines: requeues jobs abandoned by dead workers and "
+        "queues the unfinished steps of every unfinished transcription, without redoing finished chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all-running', action='store_true',
+            help="Treat every running job as abandoned (use when no worker is running, e.g. right after a restart).",
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help="Also send failed chunks and transcriptions back into the pipeline.",
+        )
+        parser.add_argument(
+            'transcription_ids', nargs='*', type=int,
+            help="Only resume these transcriptions (default: all unfinished ones).",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_expired_jobs(force=options['all_running'])
+        self.stdout.write(f"Requeued {requeued} abandoned jobs")
+
+        # Unfinished transcriptions, plus completed ones whose chunks still await diarization
+        unfinished = Q(status__in=['pending', 'chunking', 'in_progress']) | Q(status='completed', audiochunk__status='completed')
+        if options['retry_failed']:
+            unfinished |= Q(status='failed') | Q(audiochunk__status='failed')
+        transcriptions = Transcription.objects.filter(unfinished).distinct()
+        if options['transcription_ids']:
+            transcriptions = transcriptions.filter(id__in=options['transcription_ids'])
+
+        for transcription in transcriptions.only('id', 'status', 'is_chunked'):
+            queued = self.resume_transcription(transcription, options['retry_failed'])
+            if queued:
+                self.stdout.write(f"Transcription {transcription.id}: queued {queued} jobs")
+
+    def resume_transcription(self, transcription, retry_failed):
+        """Queues the unfinished work of one transcription and returns the number of jobs queued."""
+        open_jobs = set(
+            PipelineJob.objects
+            .filter(transcription=transcription, status__in=OPEN_STATUSES)
+            .values_list('kind', 'chunk_id')
+        )
+        chunks = AudioChunk.objects.filter(transcription=transcription).only(
+            'id', 'transcription_id', 'chunk_index', 'chunk_file', 'status', 'transcription_text',
+        )
+
+        if retry_failed:
+            reopened = 0
+            for chunk in chunks.filter(status='failed'):
+                # Chunks that failed in diarization keep their transcript and only need diarizing again
+                reopened += transition_chunk(chunk, 'completed' if chunk.transcription_text else 'pending')
+            if transcription.is_chunked and (transcription.status == 'failed' or (transcription.status == 'completed' and reopened)):
+                transition_transcription(transcription, 'in_progress')
+
+        queued = 0
+        if not transcription.is_chunked and ('chunk', None) not in open_jobs:
+            if transcription.status != 'failed' or retry_failed:
+                # The chunk job resumes after the last chunk that was written
+                enqueue('chunk', transcription.id)
+                queued += 1
+
+        for chunk in chunks.filter(status__in=['pending', 'processing', 'completed']):
+            kind = 'diarize' if chunk.status == 'completed' else 'transcribe'
+            if (kind, chunk.id) in open_jobs:
+                continue
+            if chunk.status == 'processing':
+                # No job owns this chunk any more, its worker died mid-transcription
+                transition_chunk(chunk, 'pending')
+            enqueue(kind, transcription.id, chunk_id=chunk.id)
+            queued += 1
+
+        if transcription.is_chunked:
+            # Completes transcriptions whose last chunk finished just before the crash
+            update_transcription_status(transcription)
+        return queued
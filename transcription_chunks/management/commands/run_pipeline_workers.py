@@ -0,0 +1,75 @@
+import multiprocessing
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from transcription_chunks.models import PipelineJob
+from transcription_chunks.queue import run_worker
+
+
+def _worker_main(kinds, poll_interval, burst, threads, warm_up):
+    """Entry point of a forked worker process."""
+    # Never share the parent's database connections with a child process
+    connections.close_all()
+    run_worker(kinds=kinds, poll_interval=poll_interval, burst=burst, threads=threads, warm_up=warm_up)
+
+
+class Command(BaseCommand):
+    help = "Runs background workers that transcribe and diarize queued audio chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.PIPELINE_WORKERS,
+            help="Number of worker processes to start (default: PIPELINE_WORKERS).",
+        )
+        parser.add_argument(
+            '--threads', type=int, default=settings.PIPELINE_WORKER_THREADS,
+            help="Jobs run concurrently by each worker process (default: PIPELINE_WORKER_THREADS).",
+        )
+        parser.add_argument(
+            '--kind', action='append', dest='kinds', choices=[kind for kind, _ in PipelineJob.KIND_CHOICES],
+            help="Only run jobs of this kind. May be given several times (default: all kinds).",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.PIPELINE_POLL_INTERVAL,
+            help="Seconds to sleep when the queue is empty.",
+        )
+        parser.add_argument(
+            '--warm-up', action='store_true',
+            help="Load the diarization model in each worker process before claiming jobs "
+                 "(use with --kind diarize for dedicated diarization workers).",
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once the queue is drained instead of waiting for new jobs.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        kinds = options['kinds']
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+        threads = max(1, options['threads'])
+        warm_up = options['warm_up']
+
+        if workers == 1:
+            run_worker(kinds=kinds, poll_interval=poll_interval, burst=burst, threads=threads, warm_up=warm_up)
+            return
+
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_worker_main, args=(kinds, poll_interval, burst, threads, warm_up), daemon=True)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {workers} pipeline workers with {threads} threads each")
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping pipeline workers...")
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
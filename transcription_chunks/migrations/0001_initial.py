@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('transcription', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_file', models.FileField(upload_to='audio_chunks/')),
+                ('chunk_index', models.IntegerField()),
+                ('transcription_text', models.TextField(blank=True, null=True)),
+                ('diarization_data', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transcription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transcription.transcription')),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0001_initial'),
+        ('transcription_chunks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('transcribe', 'Transcribe chunk'), ('diarize', 'Diarize chunk')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('worker', models.CharField(blank=True, default='', max_length=255)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('chunk', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='transcription_chunks.audiochunk')),
+                ('transcription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pipeline_jobs', to='transcription.transcription')),
+            ],
+            options={
+                'ordering': ['available_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='pipelinejob_claim_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription_chunks', '0002_pipelinejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiochunk',
+            name='end_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiochunk',
+            name='start_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pipelinejob',
+            name='kind',
+            field=models.CharField(choices=[('chunk', 'Chunk recording'), ('transcribe', 'Transcribe chunk'), ('diarize', 'Diarize chunk')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription_chunks', '0003_audiochunk_start_end_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiochunk',
+            name='transcription_words',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
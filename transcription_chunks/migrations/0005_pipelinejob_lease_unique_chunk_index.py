@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0001_initial'),
+        ('transcription_chunks', '0004_audiochunk_transcription_words'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pipelinejob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='audiochunk',
+            constraint=models.UniqueConstraint(fields=('transcription', 'chunk_index'), name='unique_chunk_index'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription_chunks', '0005_pipelinejob_lease_unique_chunk_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pipelinejob',
+            name='kind',
+            field=models.CharField(choices=[('chunk', 'Chunk recording'), ('transcribe', 'Transcribe chunk'), ('diarize', 'Diarize chunk'), ('brief', 'Generate case brief')], max_length=20),
+        ),
+    ]
@@ -15,16 +15,67 @@
 
 
 from django.db import models
+from django.utils import timezone
 from transcription.models import Transcription
 
 class AudioChunk(models.Model):
     transcription = models.ForeignKey(Transcription, on_delete=models.CASCADE)
     chunk_file = models.FileField(upload_to='audio_chunks/')
     chunk_index = models.IntegerField()
+    start_time = models.FloatField(blank=True, null=True)  # Offset of the chunk in the recording, in seconds
+    end_time = models.FloatField(blank=True, null=True)
     transcription_text = models.TextField(blank=True, null=True)
+    transcription_words = models.JSONField(blank=True, null=True)  # Whisper word timings: [{'word', 'start', 'end'}]
     diarization_data = models.TextField(blank=True, null=True)  # Store diarization data here
-    status = models.CharField(max_length=20, default='pending')  # pending, completed, failed, diarized
+    status = models.CharField(max_length=20, default='pending')  # pending, processing, completed, diarized, failed (see states.py)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transcription', 'chunk_index'], name='unique_chunk_index'),
+        ]
+
+    def __str__(self):
+        # Only name the transcription if it was loaded along with the chunk (select_related), so
+        # printing a list of chunks doesn't cost a query per chunk
+        if AudioChunk.transcription.is_cached(self):
+            return f"Chunk {self.chunk_index} for {self.transcription}"
+        return f"Chunk {self.chunk_index} for Transcription {self.transcription_id}"
+
+
+class PipelineJob(models.Model):
+    """A unit of background pipeline work, claimed and executed by `run_pipeline_workers`."""
+    KIND_CHOICES = [
+        ('chunk', 'Chunk recording'),
+        ('transcribe', 'Transcribe chunk'),
+        ('diarize', 'Diarize chunk'),
+        ('brief', 'Generate case brief'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    transcription = models.ForeignKey(Transcription, on_delete=models.CASCADE, related_name='pipeline_jobs')
+    chunk = models.ForeignKey(AudioChunk, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # Job is not claimed before this time
+    worker = models.CharField(max_length=255, blank=True, default='')  # Worker currently (or last) running the job
+    lease_expires_at = models.DateTimeField(null=True, blank=True)  # Extended by the worker's heartbeat while running
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='pipelinejob_claim_idx'),
+        ]
+
     def __str__(self):
-        return f"Chunk {self.chunk_index} for {self.transcription}"
+        return f"{self.kind} job {self.id} ({self.status})"
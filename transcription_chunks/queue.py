@@ -0,0 +1,240 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from transcription_chunks.models import PipelineJob
+
+
+OPEN_STATUSES = ['queued', 'running']
+
+# The external backend each kind of job calls; its jobs aren't claimed while the backend's circuit is open
+JOB_BACKENDS = {'transcribe': 'asr', 'diarize': 'diarization', 'brief': 'llm'}
+
+
+def default_worker_id():
+    """Returns an identifier for the current worker process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(kind, transcription_id, chunk_id=None, delay=0):
+    """Queues a pipeline job, reusing an identical job that is already queued or running."""
+    existing = PipelineJob.objects.filter(
+        kind=kind,
+        transcription_id=transcription_id,
+        chunk_id=chunk_id,
+        status__in=OPEN_STATUSES,
+    ).first()
+    if existing:
+        return existing
+
+    job = PipelineJob.objects.create(
+        kind=kind,
+        transcription_id=transcription_id,
+        chunk_id=chunk_id,
+        available_at=timezone.now() + timedelta(seconds=delay),
+    )
+    print(f"Queued {kind} job {job.id} for transcription {transcription_id}")
+    return job
+
+
+def _lease_expiry():
+    """Returns when a lease taken or renewed now expires."""
+    return timezone.now() + timedelta(seconds=settings.PIPELINE_JOB_LEASE_SECONDS)
+
+
+def claim_next_job(worker_id, kinds=None):
+    """Atomically claims the oldest runnable job, or returns None if the queue is empty.
+
+    Jobs calling a backend whose circuit breaker is open are left queued until it closes.
+    """
+    from api.ratelimit import open_circuits
+
+    now = timezone.now()
+    candidates = PipelineJob.objects.filter(status='queued', available_at__lte=now)
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+    paused = open_circuits()
+    if paused:
+        candidates = candidates.exclude(kind__in=[kind for kind, name in JOB_BACKENDS.items() if name in paused])
+
+    for job_id in candidates.values_list('id', flat=True)[:10]:
+        # Conditional update so that only one worker can win a given job
+        claimed = PipelineJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            worker=worker_id,
+            started_at=now,
+            lease_expires_at=_lease_expiry(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return PipelineJob.objects.get(id=job_id)
+    return None
+
+
+def extend_leases(worker_id):
+    """Heartbeat: extends the leases of every job the given worker is running."""
+    return PipelineJob.objects.filter(worker=worker_id, status='running').update(lease_expires_at=_lease_expiry())
+
+
+def requeue_expired_jobs(force=False):
+    """Requeues running jobs whose worker stopped heartbeating (or every running job, with `force`).
+
+    Chunks left `processing` by those jobs go back to `pending`, so the requeued job transcribes them
+    again. Jobs that already used all their attempts are marked failed instead.
+    """
+    from transcription_chunks.models import AudioChunk
+    from transcription_chunks.states import transition_chunk
+
+    expired = PipelineJob.objects.filter(status='running')
+    if not force:
+        expired = expired.filter(lease_expires_at__lt=timezone.now())
+
+    requeued = 0
+    for job in expired.select_related('chunk'):
+        retry = job.attempts < settings.PIPELINE_JOB_MAX_ATTEMPTS
+        if not PipelineJob.objects.filter(pk=job.pk, status='running', worker=job.worker).update(
+            status='queued' if retry else 'failed',
+            available_at=timezone.now(),
+            last_error=f"Lease of worker {job.worker} expired",
+        ):
+            continue  # The worker finished the job in the meantime
+
+        print(f"Requeued abandoned {job.kind} job {job.id} of worker {job.worker}" if retry else
+              f"Abandoned {job.kind} job {job.id} failed after {job.attempts} attempts")
+        if job.kind == 'transcribe' and job.chunk and job.chunk.status == 'processing':
+            transition_chunk(job.chunk, 'pending' if retry else 'failed')
+        requeued += 1
+    return requeued
+
+
+def _finish_job(job, **fields):
+    """Records the outcome of a job, unless its lease expired and it was handed to another worker."""
+    if not PipelineJob.objects.filter(pk=job.pk, status='running', worker=job.worker).update(**fields):
+        print(f"{job.kind} job {job.id} was taken over by another worker, discarding its outcome")
+        return
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run_job(job):
+    """Executes a claimed job and records its outcome, requeueing it with backoff on error.
+
+    A job whose handler raises RetryLater is requeued for the delay it asks for; one that was only told
+    to wait (rate limits, an open circuit) gets that attempt back.
+    """
+    from api import metrics
+    from api.ratelimit import RetryLater, backoff_delay
+    from transcription_chunks.tasks import JOB_HANDLERS
+
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        print(f"Error running {job.kind} job {job.id} (attempt {job.attempts}): {e}")
+        retry_later = isinstance(e, RetryLater)
+        outcome = {'status': 'queued'}
+        if retry_later and not e.counts:
+            outcome['attempts'] = job.attempts - 1
+            label = 'deferred'
+        elif job.attempts < settings.PIPELINE_JOB_MAX_ATTEMPTS:
+            label = 'retried'
+        else:
+            outcome['status'] = label = 'failed'
+        if outcome['status'] == 'queued':
+            delay = e.delay if retry_later and e.delay is not None else backoff_delay(job.attempts)
+            outcome['available_at'] = timezone.now() + timedelta(seconds=delay)
+            print(f"Retrying {job.kind} job {job.id} in {delay:.1f}s")
+            if retry_later and job.kind in JOB_BACKENDS:
+                metrics.inc('themis_backend_retries_total', backend=JOB_BACKENDS[job.kind])
+        metrics.inc('themis_jobs_total', kind=job.kind, outcome=label)
+        _finish_job(job, last_error=repr(e), finished_at=timezone.now(), **outcome)
+        return False
+
+    metrics.inc('themis_jobs_total', kind=job.kind, outcome='done')
+    _finish_job(job, status='done', finished_at=timezone.now())
+    return True
+
+
+def _heartbeat(worker_id, stop):
+    """Keeps the leases of this worker's running jobs alive until `stop` is set."""
+    interval = settings.PIPELINE_JOB_LEASE_SECONDS / 3
+    while not stop.wait(interval):
+        try:
+            extend_leases(worker_id)
+        except Exception as e:
+            print(f"Heartbeat of worker {worker_id} failed: {e}")
+        finally:
+            close_old_connections()  # Keeps a persistent (CONN_MAX_AGE) connection, drops a broken one
+
+
+def _run_job_in_thread(job, slots):
+    """Runs a job on a pool thread, releasing its slot (and an expired or broken connection) afterwards."""
+    try:
+        run_job(job)
+    finally:
+        close_old_connections()
+        slots.release()
+
+
+def run_worker(worker_id=None, kinds=None, poll_interval=None, burst=False, threads=None, warm_up=False):
+    """Claims and runs jobs until stopped; with `burst`, returns once the queue is drained.
+
+    With `threads` > 1 the worker runs that many jobs at once, so the chunks of one recording are
+    transcribed in parallel (external calls are still bounded by the limiters in `api.utils`).
+    With `warm_up`, the diarization model is loaded before the first job is claimed.
+    """
+    worker_id = worker_id or default_worker_id()
+    if warm_up:
+        from api.model_registry import warm_up as warm_up_models
+        warm_up_models()
+
+    if poll_interval is None:
+        poll_interval = settings.PIPELINE_POLL_INTERVAL
+    threads = max(1, threads or settings.PIPELINE_WORKER_THREADS)
+
+    print(f"Pipeline worker {worker_id} started with {threads} threads (kinds: {', '.join(kinds) if kinds else 'all'})")
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(worker_id, stop_heartbeat), daemon=True).start()
+
+    slots = threading.BoundedSemaphore(threads)
+    processed = 0
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='pipeline') as executor:
+        while True:
+            slots.acquire()  # Only claim a job once a thread is free to run it
+            close_old_connections()
+            job = claim_next_job(worker_id, kinds)
+            if job is None:
+                slots.release()
+                requeue_expired_jobs()  # Pick up the work of crashed workers while idle
+                if burst and _all_slots_free(slots, threads):
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            if threads == 1:
+                try:
+                    run_job(job)
+                finally:
+                    slots.release()
+            else:
+                executor.submit(_run_job_in_thread, job, slots)
+            processed += 1
+
+    stop_heartbeat.set()
+    print(f"Pipeline worker {worker_id} stopped after {processed} jobs")
+    return processed
+
+
+def _all_slots_free(slots, threads):
+    """Returns True if no job is running on any thread, i.e. no job can enqueue follow-up work."""
+    acquired = 0
+    while acquired < threads and slots.acquire(blocking=False):
+        acquired += 1
+    for _ in range(acquired):
+        slots.release()
+    return acquired == threads
@@ -0,0 +1,93 @@
+from django.db import router
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.utils import timezone
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+
+
+# Allowed status changes of an AudioChunk. A chunk left `processing` by a dead worker goes back to
+# `pending`, and `resume_pipelines --retry-failed` sends failed chunks back into the pipeline.
+CHUNK_TRANSITIONS = {
+    'pending': {'processing'},
+    'processing': {'completed', 'failed', 'pending'},
+    'completed': {'diarized', 'failed'},
+    'diarized': set(),
+    'failed': {'pending', 'completed'},
+}
+
+# Allowed status changes of a Transcription. Completed or failed ones are reopened by `resume_pipelines`.
+TRANSCRIPTION_TRANSITIONS = {
+    'pending': {'chunking', 'failed'},
+    'chunking': {'in_progress', 'failed'},
+    'in_progress': {'completed', 'failed'},
+    'completed': {'in_progress'},
+    'failed': {'chunking', 'in_progress'},
+}
+
+# Sent with `chunk`, `old_status` and `new_status` after a chunk changed status through `transition_chunk`
+chunk_status_changed = Signal()
+
+# Sent with `transcription`, `old_status` and `new_status` after a `transition_transcription`
+transcription_status_changed = Signal()
+
+
+class InvalidTransition(Exception):
+    """Raised when a status change is not allowed by the pipeline state machine."""
+
+
+def transition_chunk(chunk, new_status, **fields):
+    """Moves a chunk from its current status to `new_status`, saving `fields` along with it.
+
+    The change is a conditional UPDATE on the status the chunk had when it was loaded, so when two
+    workers race for the same chunk exactly one wins. Returns False (and leaves `chunk` untouched)
+    if the chunk's status was changed in the meantime.
+    """
+    old_status = chunk.status
+    if new_status not in CHUNK_TRANSITIONS.get(old_status, set()):
+        raise InvalidTransition(f"Chunk {chunk.id} cannot go from {old_status} to {new_status}")
+
+    updated = AudioChunk.objects.filter(pk=chunk.pk, status=old_status).update(status=new_status, **fields)
+    if not updated:
+        print(f"Chunk {chunk.chunk_index} of transcription {chunk.transcription_id} is no longer {old_status}")
+        return False
+
+    chunk.status = new_status
+    for name, value in fields.items():
+        setattr(chunk, name, value)
+    chunk_status_changed.send(sender=AudioChunk, chunk=chunk, old_status=old_status, new_status=new_status)
+    return True
+
+
+def transition_transcription(transcription, new_status, **fields):
+    """Moves a transcription to `new_status` with a conditional UPDATE, like `transition_chunk`.
+
+    `post_save` is sent on success, as the receivers listening for a completed Transcription
+    (e.g. joining the diarized chunks) expect.
+    """
+    old_status = transcription.status
+    if new_status not in TRANSCRIPTION_TRANSITIONS.get(old_status, set()):
+        raise InvalidTransition(f"Transcription {transcription.id} cannot go from {old_status} to {new_status}")
+
+    fields['date_updated'] = timezone.now()
+    updated = Transcription.objects.filter(pk=transcription.pk, status=old_status).update(status=new_status, **fields)
+    if not updated:
+        transcription.refresh_from_db(fields=['status'])
+        print(f"Transcription {transcription.id} is now {transcription.status}, not {old_status}")
+        return False
+
+    transcription.status = new_status
+    for name, value in fields.items():
+        setattr(transcription, name, value)
+    transcription_status_changed.send(
+        sender=Transcription, transcription=transcription, old_status=old_status, new_status=new_status,
+    )
+    post_save.send(
+        sender=Transcription,
+        instance=transcription,
+        created=False,
+        update_fields=frozenset(['status', *fields]),
+        raw=False,
+        using=router.db_for_write(Transcription),
+    )
+    return True
@@ -0,0 +1,198 @@
+import os
+from django.conf import settings
+from transcription.models import Transcription
+from transcription.assembly import assemble_transcription_text
+from transcription.chunking import chunk_extension, split_recording
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.states import transition_chunk, transition_transcription
+from api import metrics
+from api.ratelimit import RetryLater
+from api.utils import transcribe_audio_with_retry, diarize_audio_with_retry, format_diarization
+
+
+def chunk_transcription(transcription):
+    """Splits the uploaded recording into chunks, creating each AudioChunk as soon as its file is written.
+
+    Every new chunk queues its own transcription job, so the first chunks are being transcribed while
+    the rest of the recording is still being chunked. If a previous run was interrupted, chunking
+    resumes after the last chunk it created.
+    """
+    try:
+        if transcription.status != 'chunking' and not transition_transcription(transcription, 'chunking'):
+            return
+
+        # Resume after the last chunk written by an interrupted run, if any
+        last_chunk = AudioChunk.objects.filter(transcription=transcription).order_by('-chunk_index').first()
+        first_index, start_at = 0, 0.0
+        if last_chunk and (last_chunk.start_time is None or last_chunk.end_time is None):
+            # Cut before chunks recorded their offsets: there is no telling where that run stopped
+            print(f"Chunks of transcription {transcription.id} have no start/end times; chunking it again from the start")
+            for chunk in AudioChunk.objects.filter(transcription=transcription):
+                chunk.chunk_file.delete(save=False)
+                chunk.delete()
+        elif last_chunk:
+            first_index = last_chunk.chunk_index + 1
+            start_at = max(last_chunk.start_time, last_chunk.end_time - settings.CHUNK_OVERLAP_SECONDS)
+            print(f"Resuming chunking of transcription {transcription.id} at chunk {first_index} ({start_at:.1f}s)")
+
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'audio_chunks'), exist_ok=True)
+        chunk_name_pattern = f"audio_chunks/{transcription.id}_chunk_%d.{chunk_extension()}"
+
+        segments = split_recording(
+            transcription.audio_file.path,
+            os.path.join(settings.MEDIA_ROOT, chunk_name_pattern),
+            start_at=start_at,
+            first_index=first_index,
+        )
+        with metrics.timed('chunking'):
+            for index, _, start, end in segments:
+                AudioChunk.objects.create(
+                    transcription=transcription,
+                    chunk_file=chunk_name_pattern % index,
+                    chunk_index=index,
+                    start_time=start,
+                    end_time=end,
+                )
+                print(f"Created chunk {index} for transcription {transcription.id}")  # Debugging line
+
+        # Update transcription status
+        transition_transcription(transcription, 'in_progress', is_chunked=True)
+
+    except Exception as e:
+        transition_transcription(transcription, 'failed')
+        print(f"Error chunking audio file for transcription {transcription.id}: {e}")
+        return
+
+    # All chunks may already have been transcribed while the last ones were being cut
+    update_transcription_status(transcription)
+
+
+def update_transcription_status(transcription):
+    """Marks the parent Transcription completed once it is fully chunked and no chunk is left to transcribe."""
+    transcription.refresh_from_db(fields=['status', 'is_chunked'])
+    if transcription.status != 'in_progress':
+        print(f"Transcription {transcription.id} is {transcription.status}.")
+        return
+
+    incomplete_chunks = AudioChunk.objects.filter(transcription=transcription, status__in=['pending', 'processing']).exists()
+    if not incomplete_chunks:
+        # The transcript is written once, in chunk order, removing words repeated on overlapping chunk seams
+        with metrics.timed('assembly'):
+            transcription_text = assemble_transcription_text(transcription)
+        if transition_transcription(transcription, 'completed', transcription_text=transcription_text):
+            print(f"Transcription {transcription.id} marked as completed.")
+    else:
+        print(f"Transcription {transcription.id} is still in progress.")
+
+
+# Function to transcribe individual chunks
+def transcribe_chunk(chunk, last_attempt=False):
+    """Transcribe a single chunk and update parent Transcription model.
+
+    When the call has to be retried, the chunk goes back to `pending` and RetryLater is raised for the
+    queue to requeue the job; on the job's `last_attempt` (or a failure that isn't retried) the chunk fails.
+    """
+    print(f"Attempting to transcribe chunk {chunk.chunk_index}")  # Debugging line
+
+    if chunk.chunk_file and chunk.status == 'pending' and transition_chunk(chunk, 'processing'):
+        try:
+            print(f"Processing chunk {chunk.chunk_index}")  # Debugging line
+
+            # Transcribe the chunk (outside of any transaction, this can take minutes)
+            result = transcribe_audio_with_retry(chunk.chunk_file.path)
+            transcription_text = result['text'] if result else None
+
+            if transcription_text:
+                transition_chunk(
+                    chunk, 'completed', transcription_text=transcription_text, transcription_words=result['words'],
+                )
+                print(f"Transcription successful for chunk {chunk.chunk_index}")  # Debugging line
+            else:
+                transition_chunk(chunk, 'failed')
+                print(f"Transcription failed for chunk {chunk.chunk_index}")  # Debugging line
+
+        except RetryLater as e:
+            if e.counts and last_attempt:
+                transition_chunk(chunk, 'failed')
+                print(f"Transcription failed for chunk {chunk.chunk_index} after its last attempt: {e}")
+            else:
+                transition_chunk(chunk, 'pending')  # Picked up again by the requeued job
+                raise
+
+        except Exception as e:
+            transition_chunk(chunk, 'failed')
+            print(f"Error processing audio chunk {chunk.chunk_index}: {e}")
+
+    update_transcription_status(chunk.transcription)
+
+
+def diarize_chunk(chunk, last_attempt=False):
+    """Diarize a transcribed chunk and store the formatted speaker text on it.
+
+    Raises RetryLater for the queue to requeue the job when the call has to be retried, except on its
+    `last_attempt`, where the chunk fails.
+    """
+    if chunk.status != 'completed' or not chunk.chunk_file:  # Diarize only if transcription is completed
+        print(f"Skipping diarization for chunk {chunk.chunk_index} with status: {chunk.status}")
+        return
+
+    try:
+        print(f"Performing diarization for chunk {chunk.chunk_index} of transcription {chunk.transcription_id}")
+
+        diarization_data = diarize_audio_with_retry(
+            chunk.chunk_file.path, chunk.transcription_text, chunk.transcription_words,
+        )
+
+        if diarization_data:
+            formatted_data = format_diarization(diarization_data)
+            transition_chunk(chunk, 'diarized', diarization_data=formatted_data)
+            print(f"Diarization completed for chunk {chunk.chunk_index}")
+        else:
+            transition_chunk(chunk, 'failed')
+            print(f"Diarization failed for chunk {chunk.chunk_index}")
+
+    except RetryLater as e:
+        if not (e.counts and last_attempt):
+            raise
+        transition_chunk(chunk, 'failed')
+        print(f"Diarization failed for chunk {chunk.chunk_index} after its last attempt: {e}")
+
+    except Exception as e:
+        transition_chunk(chunk, 'failed')
+        print(f"Error during diarization for chunk {chunk.chunk_index}: {e}")
+
+
+def chunk_transcription_task(job):
+    """Queue handler for `chunk` jobs."""
+    transcription = Transcription.objects.get(id=job.transcription_id)
+    if transcription.is_chunked:
+        print(f"Transcription {transcription.id} is already chunked")
+        return
+    chunk_transcription(transcription)
+
+
+def transcribe_chunk_task(job):
+    """Queue handler for `transcribe` jobs."""
+    chunk = AudioChunk.objects.select_related('transcription').get(id=job.chunk_id)
+    transcribe_chunk(chunk, last_attempt=job.attempts >= settings.PIPELINE_JOB_MAX_ATTEMPTS)
+
+
+def diarize_chunk_task(job):
+    """Queue handler for `diarize` jobs."""
+    chunk = AudioChunk.objects.get(id=job.chunk_id)
+    diarize_chunk(chunk, last_attempt=job.attempts >= settings.PIPELINE_JOB_MAX_ATTEMPTS)
+
+
+def generate_case_brief_task(job):
+    """Queue handler for `brief` jobs."""
+    from case_brief.generation import generate_case_brief
+    case_brief = generate_case_brief(job.transcription_id)
+    print(f"Case brief {case_brief.id} of transcription {job.transcription_id} is up to date: {case_brief.pdf_file.name}")
+
+
+JOB_HANDLERS = {
+    'chunk': chunk_transcription_task,
+    'transcribe': transcribe_chunk_task,
+    'diarize': diarize_chunk_task,
+    'brief': generate_case_brief_task,
+}
@@ -1,3 +1,161 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk, PipelineJob
+from transcription_chunks.queue import claim_next_job, enqueue, extend_leases, requeue_expired_jobs, run_job
+from transcription_chunks.states import InvalidTransition, transition_chunk, transition_transcription
+from transcription_chunks.tasks import update_transcription_status
 
-# Create your tests here.
+
+@override_settings(PIPELINE_JOB_MAX_ATTEMPTS=2)
+class PipelineQueueTests(TestCase):
+    """Jobs are claimed by one worker at a time and retried with backoff until they run out of attempts."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(audio_file='audio_files/hearing.mp3')  # Queues a chunk job
+        self.job = PipelineJob.objects.get(transcription=self.transcription)
+
+    def test_enqueue_reuses_an_open_job(self):
+        self.assertEqual(self.job.kind, 'chunk')
+        self.assertEqual(enqueue('chunk', self.transcription.id), self.job)
+        self.assertEqual(PipelineJob.objects.count(), 1)
+
+    def test_claim(self):
+        job = claim_next_job('worker-1')
+        self.assertEqual(job, self.job)
+        self.assertEqual((job.status, job.worker, job.attempts), ('running', 'worker-1', 1))
+        self.assertIsNone(claim_next_job('worker-2'))  # Nothing else is queued
+
+        PipelineJob.objects.filter(pk=job.pk).update(status='queued', available_at=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(claim_next_job('worker-2'))  # Not available yet
+
+    def test_failed_jobs_are_retried_then_fail(self):
+        with mock.patch.dict('transcription_chunks.tasks.JOB_HANDLERS', {'chunk': mock.Mock(side_effect=ValueError)}):
+            self.assertFalse(run_job(claim_next_job('worker-1')))
+            self.job.refresh_from_db()
+            self.assertEqual((self.job.status, self.job.attempts), ('queued', 1))
+            self.assertIn('ValueError', self.job.last_error)
+
+            PipelineJob.objects.filter(pk=self.job.pk).update(available_at=timezone.now())
+            self.assertFalse(run_job(claim_next_job('worker-1')))
+            self.job.refresh_from_db()
+            self.assertEqual((self.job.status, self.job.attempts), ('failed', 2))
+
+    def test_successful_job(self):
+        handler = mock.Mock()
+        with mock.patch.dict('transcription_chunks.tasks.JOB_HANDLERS', {'chunk': handler}):
+            self.assertTrue(run_job(claim_next_job('worker-1')))
+        handler.assert_called_once()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'done')
+
+
+class TranscriptionStatusTests(TestCase):
+    """A transcription completes once every chunk is done, and is never moved back from completed."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(
+            audio_file='audio_files/hearing.mp3', status='in_progress', is_chunked=True,
+        )
+        self.chunks = [
+            AudioChunk.objects.create(
+                transcription=self.transcription, chunk_index=i, status='completed', transcription_text=f"part {i}",
+            )
+            for i in range(2)
+        ]
+
+    def test_completes_when_no_chunk_is_left(self):
+        AudioChunk.objects.filter(pk=self.chunks[1].pk).update(status='processing')
+        update_transcription_status(self.transcription)
+        self.assertEqual(self.transcription.status, 'in_progress')
+
+        AudioChunk.objects.filter(pk=self.chunks[1].pk).update(status='completed')
+        update_transcription_status(self.transcription)
+        self.transcription.refresh_from_db()
+        self.assertEqual(self.transcription.status, 'completed')
+        self.assertEqual(self.transcription.transcription_text, "part 0\npart 1")
+
+    def test_completed_transcription_stays_completed(self):
+        Transcription.objects.filter(pk=self.transcription.pk).update(status='completed')
+        AudioChunk.objects.filter(pk=self.chunks[1].pk).update(status='processing')  # A late, stale chunk
+        update_transcription_status(self.transcription)
+        self.transcription.refresh_from_db()
+        self.assertEqual(self.transcription.status, 'completed')
+
+
+@override_settings(PIPELINE_JOB_MAX_ATTEMPTS=2)
+class ResumablePipelineTests(TestCase):
+    """Status changes follow the state machine, and the work of dead workers is picked up again."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(
+            audio_file='audio_files/hearing.mp3', status='in_progress', is_chunked=True,
+        )
+        PipelineJob.objects.all().delete()
+        self.chunk = AudioChunk.objects.create(
+            transcription=self.transcription, chunk_index=0, chunk_file='audio_chunks/0.flac',
+        )
+
+    def test_chunk_transitions(self):
+        with self.assertRaises(InvalidTransition):
+            transition_chunk(self.chunk, 'diarized')
+        self.assertTrue(transition_chunk(self.chunk, 'processing'))
+
+        stale = AudioChunk.objects.get(pk=self.chunk.pk)
+        self.assertTrue(transition_chunk(self.chunk, 'completed', transcription_text="hello"))
+        stale.status = 'processing'
+        self.assertFalse(transition_chunk(stale, 'failed'))  # Lost the race: the chunk is no longer processing
+        self.chunk.refresh_from_db()
+        self.assertEqual((self.chunk.status, self.chunk.transcription_text), ('completed', "hello"))
+        self.assertTrue(PipelineJob.objects.filter(kind='diarize', chunk=self.chunk).exists())
+
+    def test_transcription_transitions(self):
+        with self.assertRaises(InvalidTransition):
+            transition_transcription(self.transcription, 'chunking')
+        self.assertTrue(transition_transcription(self.transcription, 'completed'))
+        self.assertTrue(transition_transcription(self.transcription, 'in_progress'))  # Reopened by resume_pipelines
+
+    def test_expired_leases_are_requeued(self):
+        job = claim_next_job('dead-worker')
+        transition_chunk(self.chunk, 'processing')
+        self.assertEqual(extend_leases('dead-worker'), 1)
+        self.assertEqual(requeue_expired_jobs(), 0)  # The lease is still valid
+
+        PipelineJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(requeue_expired_jobs(), 1)
+        job.refresh_from_db()
+        self.chunk.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, self.chunk.status), ('queued', 1, 'pending'))
+
+        claim_next_job('dead-worker')  # Its last attempt
+        transition_chunk(self.chunk, 'processing')
+        self.assertEqual(requeue_expired_jobs(force=True), 1)
+        job.refresh_from_db()
+        self.chunk.refresh_from_db()
+        self.assertEqual((job.status, self.chunk.status), ('failed', 'failed'))
+
+    def test_resume_pipelines(self):
+        AudioChunk.objects.filter(pk=self.chunk.pk).update(status='processing')  # Its worker died
+        done = AudioChunk.objects.create(
+            transcription=self.transcription, chunk_index=1, status='diarized', transcription_text="done",
+        )
+        failed = AudioChunk.objects.create(
+            transcription=self.transcription, chunk_index=2, status='failed', transcription_text="diarization failed",
+        )
+        PipelineJob.objects.all().delete()
+
+        call_command('resume_pipelines', stdout=io.StringIO())
+        self.assertEqual(set(PipelineJob.objects.values_list('kind', 'chunk_id')), {('transcribe', self.chunk.id)})
+        self.chunk.refresh_from_db()
+        self.assertEqual(self.chunk.status, 'pending')
+
+        call_command('resume_pipelines', '--retry-failed', stdout=io.StringIO())
+        self.assertEqual(
+            set(PipelineJob.objects.values_list('kind', 'chunk_id')),
+            {('transcribe', self.chunk.id), ('diarize', failed.id)},  # Only needs diarizing again
+        )
+        self.assertFalse(PipelineJob.objects.filter(chunk=done).exists())